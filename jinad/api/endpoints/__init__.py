@@ -1,8 +1,12 @@
 from jina import __version__ as jina_version
 from jina.logging import JinaLogger
 from fastapi import status, APIRouter
+from fastapi.responses import PlainTextResponse
 
 from jinad.config import server_config
+from jinad.metrics import registry, loop_lag_monitor
+from jinad.workers import worker_server
+from jinad.resources import resource_sampler
 
 logger = JinaLogger(context='👻 JINAD')
 common_router = APIRouter()
@@ -12,6 +16,16 @@ common_router = APIRouter()
 async def startup():
     logger.success(f'Uvicorn + FastAPI running on {server_config.HOST}:{server_config.PORT}')
     logger.success('Welcome to Jina daemon - the remote manager for jina!')
+    if server_config.WORKERS > 1:
+        await worker_server.start()
+    resource_sampler.start()
+
+
+@common_router.on_event('shutdown')
+async def shutdown():
+    loop_lag_monitor.stop()
+    resource_sampler.stop()
+    await worker_server.stop()
 
 
 @common_router.get(
@@ -28,3 +42,21 @@ async def _status():
         'status_code': status.HTTP_200_OK,
         'jina_version': jina_version
     }
+
+
+@common_router.get(
+    path='/metrics',
+    summary='Get metrics of jinad in Prometheus format',
+    response_class=PlainTextResponse
+)
+async def _metrics():
+    """
+    Used by Prometheus to scrape latencies & failures of creating / deleting Flows, Pods & Peas,
+    sizes of the stores, bytes uploaded, number of log streams, the lag of the event loop & the resources
+    used by every Flow / Pod / Pea.
+
+    Metrics are computed on demand, the event loop lag gets sampled once `/metrics` got scraped.
+    """
+    loop_lag_monitor.start()
+    return PlainTextResponse(content=registry.render(),
+                             media_type='text/plain; version=0.0.4; charset=utf-8')
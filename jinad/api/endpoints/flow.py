@@ -1,32 +1,109 @@
 import json
 import uuid
-from typing import List, Union
-
-from fastapi import status, APIRouter, Body, Response, File, UploadFile
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import status, APIRouter, Body, Header, Query, Request, Response, File, UploadFile, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from google.protobuf.json_format import MessageToDict
+from starlette.requests import ClientDisconnect
+from jina.clients.request import _build_doc
+from jina.enums import DataInputType
 from jina.parsers import set_client_cli_parser
 from jina.helper import ArgNamespace
 from jina.logging import JinaLogger
 from jina.clients import Client
 
 from jinad.store import flow_store
+from jinad.workers import delete_from_owner
+from jinad.pool import flow_pool
+from jinad.probe import gateway_probe
+from jinad.proxy import flow_proxy, ProxyException
+from jinad.ingest import INGEST_FORMATS, Ingest, ingest_hub
+from jinad.cache import request_hash, result_cache
+from jinad.resources import resource_sampler
 from jinad.models import SinglePodModel
-from jinad.excepts import FlowYamlParseException, FlowCreationException, FlowStartException, \
-    HTTPException
+from jinad.config import ingest_config
+from jinad.helper import check_upload_size, get_spec_hash, get_upload_digests
+from jinad.metrics import stage, current_stages
+from jinad.excepts import HTTPException, UploadTooLargeException
 
 logger = JinaLogger(context='👻 FLOWAPI')
 router = APIRouter()
 
 
+async def _submit_flow(config: Union[str, List[SinglePodModel]],
+                       files: List[UploadFile],
+                       idempotency_key: Optional[str],
+                       reuse: bool) -> Dict:
+    """ Reuses the Flow created with the same Idempotency-Key (or the same spec & files if `reuse` is set),
+    hands out an idle one from the warm pool or queues the creation of a new one """
+    spec_hash = None
+    if reuse or (flow_pool.registered and isinstance(config, str)):
+        spec = config if isinstance(config, str) else \
+            json.dumps([pod.dict() for pod in config], sort_keys=True, default=str)
+        with stage('hash'):
+            spec_hash = get_spec_hash(config=spec,
+                                      digests=await run_in_threadpool(get_upload_digests, files))
+    keys = [f'key:{idempotency_key}'] if idempotency_key else []
+    if reuse:
+        keys.append(f'spec:{spec_hash}')
+
+    def acquire():
+        with stage('pool'):
+            return flow_pool.acquire(key=spec_hash)
+
+    with flow_store._session():
+        flow_id, result = flow_store._find_or_reserve(
+            keys=keys, acquire=acquire if flow_pool.registered and isinstance(config, str) else None)
+        if result == 'reused':
+            flow_status = flow_store._get_status(flow_id=flow_id)
+            return {
+                'status_code': status.HTTP_202_ACCEPTED,
+                'flow_id': flow_id,
+                'status': flow_status['status'],
+                'reused': True,
+                **{k: flow_status[k] for k in ('host', 'port') if k in flow_status},
+                'stages': current_stages()
+            }
+
+        if result == 'acquired':
+            flow_status = 'started'
+        else:
+            try:
+                with stage('submit'):
+                    flow_id = await run_in_threadpool(flow_store._submit, config=config, files=files,
+                                                      flow_id=flow_id)
+            except Exception:
+                flow_store._forget(flow_id)
+                raise
+            flow_status = 'pending'
+    return {
+        'status_code': status.HTTP_202_ACCEPTED,
+        'flow_id': flow_id,
+        'status': flow_status,
+        'stages': current_stages()
+    }
+
+
 @router.put(
     path='/flow/pods',
     summary='Build & start a Flow using Pods',
+    status_code=status.HTTP_202_ACCEPTED
 )
 async def _create_from_pods(
     pods: Union[List[SinglePodModel]] = Body(...,
-                                             example=json.loads(SinglePodModel().json()))
+                                             example=json.loads(SinglePodModel().json())),
+    idempotency_key: Optional[str] = Header(None),
+    reuse: bool = False
 ):
     """
-    Build a Flow using a list of `PodModel`
+    Build a Flow using a list of `PodModel`. Flow gets started in the background,
+    use `/flow/{flow_id}/status` to know when it is ready.
+
+    Requests retried with the same `Idempotency-Key` header get the Flow created by the first one,
+    with `reuse` set a running Flow built from identical Pods gets sent instead of a new one.
 
         [
             {
@@ -41,36 +118,31 @@ async def _create_from_pods(
             }
         ]
     """
-    with flow_store._session():
-        try:
-            flow_id, host, port_expose = flow_store._create(config=pods)
-        except FlowCreationException:
-            raise HTTPException(status_code=404,
-                                detail=f'Bad pods args')
-        except FlowStartException:
-            raise HTTPException(status_code=404,
-                                detail=f'Flow couldn\'t get started')
-    return {
-        'status_code': status.HTTP_200_OK,
-        'flow_id': flow_id,
-        'host': host,
-        'port': port_expose,
-        'status': 'started'
-    }
+    return await _submit_flow(config=pods, files=[], idempotency_key=idempotency_key, reuse=reuse)
 
 
 @router.put(
     path='/flow/yaml',
     summary='Build & start a Flow using YAML',
+    status_code=status.HTTP_202_ACCEPTED
 )
 async def _create_from_yaml(
     yamlspec: UploadFile = File(...),
     uses_files: List[UploadFile] = File(()),
-    pymodules_files: List[UploadFile] = File(())
+    pymodules_files: List[UploadFile] = File(()),
+    idempotency_key: Optional[str] = Header(None),
+    reuse: bool = False
 ):
     """
     Build a flow using [Flow YAML](https://docs.jina.ai/chapters/yaml/yaml.html#flow-yaml-sytanx)
 
+    Flow gets started in the background, use `/flow/{flow_id}/status` to know when it is ready.
+    If the yamlspec & files match a template registered via `/flow/pool`, an idle Flow of the
+    warm pool gets handed out already `started`.
+
+    Requests retried with the same `Idempotency-Key` header get the Flow created by the first one,
+    with `reuse` set a running Flow with identical yamlspec & files gets sent instead of a new one.
+
     > Upload Flow yamlspec (`yamlspec`)
 
     > Yamls that Pods use (`uses_files`) (Optional)
@@ -137,24 +209,113 @@ async def _create_from_yaml(
                 ...
 
     """
+    try:
+        with stage('check_size'):
+            check_upload_size([yamlspec, *uses_files, *pymodules_files])
+    except UploadTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=str(e))
+
+    return await _submit_flow(config=yamlspec.file.read().decode(),
+                              files=list(uses_files) + list(pymodules_files),
+                              idempotency_key=idempotency_key,
+                              reuse=reuse)
+
+
+@router.put(
+    path='/flow/pool',
+    summary='Register a Flow template in the warm pool',
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def _create_pool(
+    yamlspec: UploadFile = File(...),
+    uses_files: List[UploadFile] = File(()),
+    pymodules_files: List[UploadFile] = File(()),
+    size: int = Query(1, ge=1)
+):
+    """
+    Keep `size` Flows of the template (yamlspec & files, same as `/flow/yaml`) started & idle.
 
-    with flow_store._session():
-        try:
-            flow_id, host, port_expose = flow_store._create(config=yamlspec.file,
-                                                            files=list(uses_files) + list(pymodules_files))
-        except FlowYamlParseException:
-            raise HTTPException(status_code=404,
-                                detail=f'Invalid yaml file.')
-        except FlowStartException as e:
-            raise HTTPException(status_code=404,
-                                detail=f'Flow couldn\'t get started:  {repr(e)}')
+    Flows created via `/flow/yaml` with the same yamlspec & files get handed out from the pool,
+    which gets refilled in the background. Registering a template again changes its size.
+    """
+    try:
+        check_upload_size([yamlspec, *uses_files, *pymodules_files])
+    except UploadTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=str(e))
+
+    template = await run_in_threadpool(flow_pool.register, yamlspec.file.read().decode(),
+                                       list(uses_files) + list(pymodules_files), size)
+    return {
+        'status_code': status.HTTP_202_ACCEPTED,
+        'template': template,
+        **flow_pool.templates()[template]
+    }
 
+
+@router.get(
+    path='/flow/pool',
+    summary='Get templates of the warm pool',
+)
+async def _fetch_pool():
+    """
+    Get size, number of idle Flows, whether it is being filled & files of every template in the warm pool
+    """
+    return {
+        'status_code': status.HTTP_200_OK,
+        'templates': flow_pool.templates()
+    }
+
+
+@router.delete(
+    path='/flow/pool',
+    summary='Remove a template from the warm pool',
+)
+async def _delete_pool(
+    template: str
+):
+    """
+    Close the idle Flows of the template, Flows already handed out keep running
+    """
+    try:
+        await run_in_threadpool(flow_pool.unregister, template)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f'Template {template} not found in the pool')
+    return {
+        'status_code': status.HTTP_200_OK
+    }
+
+
+@router.get(
+    path='/flow/{flow_id}/status',
+    summary='Get status of Flow creation',
+)
+async def _fetch_status(
+    flow_id: uuid.UUID
+):
+    """
+    Get status of Flow creation using `flow_id`.
+
+    Status is one of `pending`, `starting`, `started`, `failed` or `deleting`, along with
+    the time at which each of them got reached. Once `started`, gateway host & port are sent.
+
+    With `JINAD_PARALLEL_START` set, `pods` carries the level, start & end offsets of every Pod.
+
+    Once `started` or `failed`, `stages` carries the secs spent in the queue & in each stage of creation
+    e.g. `load`, `workspace`, `start`.
+    """
+    try:
+        with flow_store._session():
+            flow_status = flow_store._get_status(flow_id=flow_id)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f'Flow ID {flow_id} not found! Please create a new Flow')
     return {
         'status_code': status.HTTP_200_OK,
         'flow_id': flow_id,
-        'host': host,
-        'port': port_expose,
-        'status': 'started'
+        **flow_status
     }
 
 
@@ -193,19 +354,245 @@ async def _fetch(
                             detail=f'Flow ID {flow_id} not found! Please create a new Flow')
 
 
+@router.get(
+    path='/flow/{flow_id}/resources',
+    summary='Get resources used by the Flow',
+)
+async def _fetch_resources(
+    flow_id: uuid.UUID
+):
+    """
+    Get CPU%, RSS (bytes), threads & open fds of every process (`pid`) of the Flow's Peas & their `total`.
+
+    Processes are sampled from `/proc` every `JINAD_RESOURCE_INTERVAL` secs (then also exposed in `/metrics`),
+    `sampled_at` tells when. CPU% is `null` till a process got sampled twice.
+    """
+    try:
+        with flow_store._session():
+            resources = await run_in_threadpool(resource_sampler.get, 'flow', flow_id)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f'Flow ID {flow_id} not found! Please create a new Flow')
+    return {
+        'status_code': status.HTTP_200_OK,
+        'flow_id': flow_id,
+        **resources
+    }
+
+
+def _get_gateway(flow_id: uuid.UUID):
+    """ Returns host & port of the gateway of a started Flow """
+    try:
+        with flow_store._session():
+            gateway = flow_store._get(flow_id=flow_id)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f'Flow ID {flow_id} not found! Please create a new Flow')
+    if gateway is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f'Flow ID {flow_id} is not started yet, check `/flow/{flow_id}/status`')
+    host, port_expose, _ = gateway
+    return host, port_expose
+
+
+async def _forward(flow_id: uuid.UUID, mode: str, data: List[Any], top_k: Optional[int], mime_type: Optional[str]):
+    """ Sends the docs built from `data` through the Flow via the proxy """
+    host, port_expose = _get_gateway(flow_id)
+    try:
+        docs = [_build_doc(d, DataInputType.AUTO, mime_type=mime_type)[0].as_pb_object for d in data]
+    except TypeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f'Cannot build documents: {e!r}')
+    if not docs:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='No documents to send')
+    cache_key = None
+    if mode == 'search' and result_cache.enabled:
+        cache_key = request_hash(mode=mode, docs=docs, top_k=top_k)
+        cached = result_cache.get(flow_id=flow_id, key=cache_key)
+        if cached is not None:
+            for doc, request_doc in zip(cached, docs):
+                doc.id = request_doc.id
+            return {
+                'status_code': status.HTTP_200_OK,
+                'flow_id': flow_id,
+                'docs': [MessageToDict(d) for d in cached],
+                'cached': True
+            }
+        generation = result_cache.generation(flow_id)
+    elif mode != 'search':
+        result_cache.invalidate(flow_id)
+    try:
+        docs = await flow_proxy.send(host=host, port=port_expose, mode=mode, docs=docs, top_k=top_k)
+    except ProxyException as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY,
+                            detail=str(e))
+    finally:
+        if mode != 'search':
+            # searches answered while the docs got indexed are not cached either
+            result_cache.invalidate(flow_id)
+    if cache_key:
+        result_cache.put(flow_id=flow_id, key=cache_key, docs=docs, generation=generation)
+    return {
+        'status_code': status.HTTP_200_OK,
+        'flow_id': flow_id,
+        'docs': [MessageToDict(d) for d in docs],
+        'cached': False
+    }
+
+
+@router.post(
+    path='/flow/{flow_id}/search',
+    summary='Search via the Flow',
+)
+async def _search(
+    flow_id: uuid.UUID,
+    data: List[Any] = Body(..., embed=True, example=['hello world']),
+    top_k: Optional[int] = None,
+    mime_type: Optional[str] = None
+):
+    """
+    Send `data` (document contents or documents as dicts) as a search request to the Flow's gateway,
+    the docs of the response are sent back with their `top_k` matches.
+
+    Requests for the same Flow & `top_k` arriving within `JINAD_PROXY_BATCH_LATENCY` secs are sent to the
+    gateway together, over a gRPC channel kept open per Flow.
+
+    With `JINAD_RESULT_CACHE` set, the docs answered to identical requests (same `data`, `top_k` & `mime_type`)
+    are sent from the cache till the Flow indexes docs via jinad, gets deleted or `JINAD_RESULT_CACHE_TTL` secs
+    passed, with `cached` set.
+
+        {
+            "data": ["hello world", {"text": "hello jina"}]
+        }
+    """
+    return await _forward(flow_id=flow_id, mode='search', data=data, top_k=top_k, mime_type=mime_type)
+
+
+@router.post(
+    path='/flow/{flow_id}/index',
+    summary='Index via the Flow',
+)
+async def _index(
+    flow_id: uuid.UUID,
+    data: List[Any] = Body(..., embed=True, example=['hello world']),
+    mime_type: Optional[str] = None
+):
+    """
+    Send `data` (document contents or documents as dicts) as an index request to the Flow's gateway,
+    batched with concurrent requests for the same Flow like `/flow/{flow_id}/search`.
+    """
+    return await _forward(flow_id=flow_id, mode='index', data=data, top_k=None, mime_type=mime_type)
+
+
+@router.post(
+    path='/flow/{flow_id}/ingest',
+    summary='Stream docs to index into the Flow',
+)
+async def _ingest(
+    flow_id: uuid.UUID,
+    request: Request,
+    format: Optional[str] = None,
+    ingest_id: Optional[uuid.UUID] = None
+):
+    """
+    Index the docs of a streamed body, one per line, e.g. `curl -T docs.ndjson -H 'Content-Type:
+    application/x-ndjson' -X POST .../flow/{flow_id}/ingest`.
+
+    With `format` `ndjson` (default for `application/x-ndjson` & `application/jsonl` bodies) every line is a doc
+    as json or its content, with `lines` every line is the text of a doc.
+
+    The body is parsed while it arrives & sent to the gateway in batches of `JINAD_INGEST_BATCH_SIZE` docs,
+    at most `JINAD_INGEST_MAX_INFLIGHT` of them at a time. Pass an `ingest_id` to stream the progress
+    via the websocket `/flow/{flow_id}/ingest/{ingest_id}` while the body gets sent.
+    """
+    host, port_expose = _get_gateway(flow_id)
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    format = format or ('ndjson' if content_type in ('application/x-ndjson', 'application/jsonl') else 'lines')
+    if format not in INGEST_FORMATS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f'format must be one of {INGEST_FORMATS}')
+    ingest = Ingest(ingest_id=ingest_id or uuid.uuid4(), flow_id=flow_id)
+    try:
+        ingest_hub.register(ingest)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f'Ingest ID {ingest_id} already exists')
+    result_cache.invalidate(flow_id)
+    try:
+        await ingest.run(chunks=request.stream(), fmt=format, host=host, port=port_expose)
+    except ClientDisconnect:
+        # nobody is left to get the response, the progress of the ingest shows it `failed`
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f'Client disconnected after {ingest.docs} docs')
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f'Cannot build documents after {ingest.docs} docs: {e!r}')
+    except ProxyException as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY,
+                            detail=f'{e} after {ingest.docs} docs')
+    finally:
+        result_cache.invalidate(flow_id)
+    return {
+        'status_code': status.HTTP_200_OK,
+        **ingest.progress()
+    }
+
+
+@router.websocket(
+    path='/flow/{flow_id}/ingest/{ingest_id}'
+)
+async def _ingest_progress(
+    websocket: WebSocket,
+    flow_id: uuid.UUID,
+    ingest_id: uuid.UUID,
+    timeout: float = 5
+):
+    """
+    Stream the progress (`docs`, `docs_per_sec`, ...) of an ingest every `JINAD_INGEST_PROGRESS_INTERVAL` secs,
+    the last frame has the `status` `finished` or `failed`. Waits up to `timeout` secs for the ingest to start,
+    closes with code 4001 if it does not.
+    """
+    await websocket.accept()
+    ingest = await ingest_hub.wait(ingest_id, timeout=timeout)
+    if ingest is None or ingest.flow_id != flow_id:
+        await websocket.close(code=4001)
+        return
+    async for progress in ingest.updates(interval=ingest_config.INGEST_PROGRESS_INTERVAL):
+        await websocket.send_json(jsonable_encoder(progress))
+    await websocket.close()
+
+
 @router.get(
     path='/ping',
     summary='Connect to Flow gateway',
 )
 async def _ping(
     host: str,
-    port: int
+    port: int,
+    probe: bool = False
 ):
     """
     Ping to check if we can connect to gateway via gRPC `host:port`
 
+    By default a document gets indexed via a new client. With `probe` set, a gRPC health check gets sent
+    over a channel kept open per gateway instead, nothing goes through the Flow. Its result is cached for
+    `JINAD_PING_TTL` secs & the round trip `latency` in secs is sent along.
+
     Note: Make sure Flow is running
     """
+    if probe:
+        result = await run_in_threadpool(gateway_probe.probe, host, port)
+        if not result['connected']:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f'Cannot connect to GRPC Server on {host}:{port}')
+        return {
+            'status_code': status.HTTP_200_OK,
+            'detail': 'connected',
+            'latency': result['latency'],
+            'cached': result['cached']
+        }
+
     kwargs = {'port_expose': port, 'host': host}
     _, args, _ = ArgNamespace.get_parsed_args(kwargs, set_client_cli_parser())
     client = Client(args)
@@ -225,23 +612,47 @@ async def _ping(
     summary='Close Flow context',
 )
 async def _delete(
-    flow_id: uuid.UUID
+    flow_id: uuid.UUID,
+    wait: bool = True
 ):
     """
     Close Flow context
+
+    Pods get closed gracefully within `JINAD_CLOSE_TIMEOUT` secs, their processes get terminated & killed after.
+    With `wait` unset the Flow gets closed in the background & its status is `deleting` till it is gone.
     """
     with flow_store._session():
         try:
-            flow_store._delete(flow_id=flow_id)
-            return {
-                'status_code': status.HTTP_200_OK
-            }
+            if wait:
+                await run_in_threadpool(flow_store._delete, flow_id=flow_id)
+            else:
+                flow_store._submit_delete(flow_id=flow_id)
         except KeyError:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                                detail=f'Flow ID {flow_id} not found! Please create a new Flow')
+            if not await delete_from_owner(store=flow_store, entity_id=flow_id):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                    detail=f'Flow ID {flow_id} not found! Please create a new Flow')
+            wait = True
+    if not wait:
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED,
+                            content={'status_code': status.HTTP_202_ACCEPTED,
+                                     'flow_id': str(flow_id),
+                                     'status': 'deleting'})
+    return {
+        'status_code': status.HTTP_200_OK,
+        'stages': current_stages()
+    }
+
+
+@router.on_event('startup')
+def _startup():
+    with flow_store._session():
+        flow_store._recover()
 
 
 @router.on_event('shutdown')
 def _shutdown():
+    # records are kept, flows get recovered on the next start if the store backend is durable
     with flow_store._session():
-        flow_store._delete_all()
+        flow_store._delete_all(forget=False)
+    gateway_probe.close()
+    flow_proxy.close()
@@ -1,39 +1,29 @@
-import time
-import asyncio
+import json
+import zlib
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, Optional
 from urllib.parse import parse_qsl
 
 from jina.logging import JinaLogger
-from fastapi import APIRouter, WebSocket
+from fastapi import status, APIRouter, Query, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from starlette.endpoints import WebSocketEndpoint
 from starlette.types import Receive, Scope, Send
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 from jinad.config import log_config
-from jinad.excepts import NoSuchFileException
+from jinad.tailer import LogFilter, log_hub, get_line_index, parse_log_time, tail
+from jinad.excepts import HTTPException, NoSuchFileException
 
 
 logger = JinaLogger(context='👻 LOGS')
 router = APIRouter()
 
 
-async def tail(file_handler, line_num_from=0, timeout=5):
-    """ asynchronous tail file """
-    line_number = 0
-    last_log_time = time.time()
-    while time.time() - last_log_time < timeout:
-        for line in file_handler:
-            line_number += 1
-            if line_number < line_num_from:
-                continue
-            yield line_number, line
-            last_log_time = time.time()
-            await asyncio.sleep(0.01)
-    else:
-        logger.debug(f'File tailer timed-out!')
-        yield None, None
-
-
 class LogStreamingEndpoint(WebSocketEndpoint):
     """
     WebSocket based streaming for FluentD logs written by remote Peas/Pods/Flows.
@@ -41,10 +31,15 @@ class LogStreamingEndpoint(WebSocketEndpoint):
     - URL - ws://{server}:{port}/logstream/{log_id}/?timeout={timeout}
     - Mandatory param - {log_id} (If a folder with {log__id} doesn't exist, it disconnects the client with code = 1006)
     - Optional param - {timeout} (Defaults to DEFAULT_TIMEOUT)
+    - Optional params - {level}, {regex}, {name}, {since}, {until} to only stream the matching lines (see `LogFilter`)
+    - Optional subprotocol - `json` or `msgpack` (if installed) to receive batches of log lines per frame
 
     Server
-        1. Waits for the client to send a json `{'from': line_number}`.
-        2. Tails file & streams one log line at a time in a loop.
+        1. Waits for the client to send a json `{'from': line_number}`, which can also override the filter params.
+           Sends {'code': BAD_FILTER_ERROR_CODE, 'detail': ...} for invalid filters.
+        2. Streams `{line_number: line}` from the tailer of the file shared by all clients in a loop, one line per frame if no subprotocol got negotiated.
+           Otherwise frames are batched by `BATCH_LINES`, `BATCH_BYTES` & `BATCH_LATENCY` & encoded as per
+           the subprotocol.
         3. Waits max `timeout` secs b/w 2 suucessive log lines.
         4. In case of timeout, sends {'code': TIMEOUT_ERROR_CODE} & waits step 1.
 
@@ -60,6 +55,8 @@ class LogStreamingEndpoint(WebSocketEndpoint):
     DEFAULT_TIMEOUT = 5
     TIMEOUT_ERROR_CODE = 4000
     NO_FILE_ERROR_CODE = 4001
+    BAD_FILTER_ERROR_CODE = 4002
+    SUBPROTOCOLS = ['msgpack', 'json'] if msgpack else ['json']
 
     def __init__(self, scope: Scope, receive: Receive, send: Send) -> None:
         super().__init__(scope, receive, send)
@@ -69,12 +66,15 @@ class LogStreamingEndpoint(WebSocketEndpoint):
         self.log_id = self.scope.get('path').split('/')[-1]
         self.filepath = log_config.PATH % self.log_id
         query_string = self.scope.get('query_string').decode()
-        self.timeout = float(dict(parse_qsl(query_string)).get('timeout', self.DEFAULT_TIMEOUT))
+        self.query_params = dict(parse_qsl(query_string))
+        self.timeout = float(self.query_params.get('timeout', self.DEFAULT_TIMEOUT))
+        self.subprotocol = next((subprotocol for subprotocol in self.scope.get('subprotocols', [])
+                                 if subprotocol in self.SUBPROTOCOLS), None)
 
         self.active_clients = []
 
     async def on_connect(self, websocket: WebSocket) -> None:
-        await websocket.accept()
+        await websocket.accept(subprotocol=self.subprotocol)
         # FastAPI & Starlette still don't have a generic WebSocketException
         # https://github.com/encode/starlette/pull/527
         # The following `raise` raises `websockets.exceptions.ConnectionClosedError` (code = 1006)
@@ -82,6 +82,8 @@ class LogStreamingEndpoint(WebSocketEndpoint):
         if not Path(self.filepath).is_file():
             raise NoSuchFileException(f'File {self.filepath} not found locally')
 
+        # all clients of a log file share a single tailer
+        self.subscriber = log_hub.subscribe(self.filepath)
         self.active_clients.append(websocket)
         self.client_details = f'{websocket.client.host}:{websocket.client.port}'
         logger.info(f'Client {self.client_details} got connected to stream Fluentd logs!')
@@ -91,21 +93,120 @@ class LogStreamingEndpoint(WebSocketEndpoint):
             raise NoSuchFileException(f'File {self.filepath} not found locally')
 
         line_num_from = int(data.get('from', 0))
-        with open(self.filepath) as fp:
-            logs_to_be_sent = {}
-            async for line_number, line in tail(file_handler=fp, line_num_from=line_num_from, timeout=self.timeout):
-                if not line_number:
-                    await websocket.send_json({"code": self.TIMEOUT_ERROR_CODE})
+        try:
+            log_filter = LogFilter.from_params({**self.query_params, **data})
+        except ValueError as e:
+            await self._send(websocket, {'code': self.BAD_FILTER_ERROR_CODE, 'detail': str(e)})
+            return
+        batch_args = {'max_lines': log_config.BATCH_LINES,
+                      'max_bytes': log_config.BATCH_BYTES} if self.subprotocol else {}
+        frames = self.subscriber.frames(line_num_from=line_num_from, timeout=self.timeout, log_filter=log_filter,
+                                        **batch_args)
+        try:
+            async for lines in frames:
+                if lines is None:
+                    await self._send(websocket, {'code': self.TIMEOUT_ERROR_CODE})
                     break
-                logs_to_be_sent[line_number] = line
-                logger.info(f'Sending logs {logs_to_be_sent}')
-                await websocket.send_json(logs_to_be_sent)
-                logs_to_be_sent = {}
+                await self._send(websocket, dict(lines))
+        finally:
+            await frames.aclose()
+
+    async def _send(self, websocket: WebSocket, data: Dict) -> None:
+        if self.subprotocol == 'msgpack':
+            await websocket.send_bytes(msgpack.packb(data))
+        else:
+            await websocket.send_json(data)
 
     async def on_disconnect(self, websocket: WebSocket, close_code: int) -> None:
+        log_hub.unsubscribe(self.subscriber)
         self.active_clients.remove(websocket)
         logger.info(f'Client {self.client_details} got disconnected!')
 
 
+async def _read_page(path: str, log_id: str, from_line: int, limit: int, from_ts: Optional[float],
+                     compress: bool):
+    """ Streams `{"log_id": ..., "lines": {line_number: line}, "next_line": ...}`, gzip compressed if asked for """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    def _encode(content: str) -> bytes:
+        return compressor.compress(content.encode()) if compressor else content.encode()
+
+    with open(path, 'rb') as fp:
+        if from_ts is not None:
+            line_index = get_line_index(path)
+            await run_in_threadpool(line_index.update)
+            checkpoint_line = line_index.bisect(fp, before=lambda line: (parse_log_time(line) or 0) < from_ts)
+            from_line = max(from_line, checkpoint_line)
+
+        yield _encode(f'{{"log_id": {json.dumps(log_id)}, "lines": {{')
+        count, next_line = 0, from_line
+        async for lines in tail(file_handler=fp, line_num_from=from_line, max_lines=log_config.BATCH_LINES,
+                                max_bytes=log_config.BATCH_BYTES, follow=False):
+            if from_ts is not None:
+                # lines are sorted by time, only the ones before the first line at/after `from_ts` are skipped
+                next_line = lines[-1][0] + 1
+                lines = [line for line in lines if (parse_log_time(line[1]) or 0) >= from_ts]
+                if not lines:
+                    continue
+                from_ts = None
+            lines = lines[:limit - count]
+            yield _encode(('' if not count else ', ') +
+                          ', '.join(f'"{line_number}": {json.dumps(line)}' for line_number, line in lines))
+            count += len(lines)
+            next_line = lines[-1][0] + 1
+            if count >= limit:
+                break
+        yield _encode(f'}}, "next_line": {next_line}}}')
+    if compressor:
+        yield compressor.flush()
+
+
+@router.get(
+    path='/logs/{log_id}',
+    summary='Get a page of log lines'
+)
+async def _fetch_logs(
+    request: Request,
+    log_id: str,
+    from_line: int = Query(1, ge=1),
+    limit: int = Query(1000, ge=1, le=100000),
+    from_ts: Optional[str] = None
+):
+    """
+    Fetch `limit` log lines starting at line `from_line` or at the first line logged at/after `from_ts`
+    (unix timestamp or ISO 8601). Lines are reached via the line index of the log file, use `next_line` of the
+    response as `from_line` for the next page. Responses are gzip compressed if the client accepts it.
+    """
+    path = log_config.PATH % log_id
+    if not Path(path).is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f'No logs found for {log_id}')
+    try:
+        from_ts = LogFilter.to_timestamp(from_ts)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=str(e))
+
+    compress = 'gzip' in request.headers.get('accept-encoding', '')
+    return StreamingResponse(_read_page(path=path, log_id=log_id, from_line=from_line, limit=limit,
+                                        from_ts=from_ts, compress=compress),
+                             media_type='application/json',
+                             headers={'Content-Encoding': 'gzip'} if compress else None)
+
+
+@router.get(
+    path='/logstream',
+    summary='Get number of log tailers & their subscribers'
+)
+async def _logstream_stats():
+    """
+    Every log file being streamed has one tailer, shared by all the clients (subscribers) streaming it
+    """
+    return {
+        'status_code': status.HTTP_200_OK,
+        **log_hub.stats()
+    }
+
+
 router.add_websocket_route(path='/logstream/{log_id}',
                            endpoint=LogStreamingEndpoint)
@@ -1,13 +1,16 @@
 import uuid
 from typing import List
 
-from fastapi import status, APIRouter, File, UploadFile
+from fastapi import status, APIRouter, File, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from jina.logging import JinaLogger
 
 from jinad.store import pea_store
+from jinad.workers import delete_from_owner
 from jinad.models import PeaModel
-from jinad.excepts import HTTPException, PeaStartException
-from jinad.helper import pea_to_namespace, create_meta_files_from_upload
+from jinad.metrics import stage, current_stages
+from jinad.excepts import HTTPException, PeaStartException, UploadTooLargeException
+from jinad.helper import pea_to_namespace, create_meta_files_from_upload, check_upload_size
 
 logger = JinaLogger(context='👻 PEAAPI')
 router = APIRouter()
@@ -24,14 +27,24 @@ async def _upload(
     """
     """
     # TODO: This is repetitive code. needs refactoring
+    try:
+        check_upload_size(list(uses_files) + list(pymodules_files))
+    except UploadTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=str(e))
+
+    # copying the files blocks, hence kept out of the event loop
     upload_status = 'nothing to upload'
-    if uses_files:
-        [create_meta_files_from_upload(current_file) for current_file in uses_files]
-        upload_status = 'uploaded'
+    with stage('upload'):
+        if uses_files:
+            for current_file in uses_files:
+                await run_in_threadpool(create_meta_files_from_upload, current_file)
+            upload_status = 'uploaded'
 
-    if pymodules_files:
-        [create_meta_files_from_upload(current_file) for current_file in pymodules_files]
-        upload_status = 'uploaded'
+        if pymodules_files:
+            for current_file in pymodules_files:
+                await run_in_threadpool(create_meta_files_from_upload, current_file)
+            upload_status = 'uploaded'
 
     return {
         'status_code': status.HTTP_200_OK,
@@ -49,11 +62,12 @@ async def _create(
     """
     Used to create a Remote Pea
     """
-    pea_arguments = pea_to_namespace(args=pea_arguments)
+    with stage('parse'):
+        pea_arguments = pea_to_namespace(args=pea_arguments)
 
     with pea_store._session():
         try:
-            pea_id = pea_store._create(pea_arguments=pea_arguments)
+            pea_id = await run_in_threadpool(pea_store._create, pea_arguments=pea_arguments)
         except PeaStartException as e:
             raise HTTPException(status_code=404,
                                 detail=f'Pea couldn\'t get started:  {repr(e)}')
@@ -64,7 +78,8 @@ async def _create(
     return {
         'status_code': status.HTTP_200_OK,
         'pea_id': pea_id,
-        'status': 'started'
+        'status': 'started',
+        'stages': current_stages()
     }
 
 
@@ -79,16 +94,83 @@ async def _delete(
     """
     with pea_store._session():
         try:
-            pea_store._delete(pea_id=pea_id)
-            return {
-                'status_code': status.HTTP_200_OK
-            }
+            await run_in_threadpool(pea_store._delete, pea_id=pea_id)
         except KeyError:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                                detail=f'Pea ID {pea_id} not found! Please create a new Pea')
+            if not await delete_from_owner(store=pea_store, entity_id=pea_id):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                    detail=f'Pea ID {pea_id} not found! Please create a new Pea')
+    return {
+        'status_code': status.HTTP_200_OK,
+        'stages': current_stages()
+    }
+
+
+@router.put(
+    path='/peas',
+    summary='Create many Peas',
+)
+async def _create_many(
+    pea_arguments: List[PeaModel]
+):
+    """
+    Used to create many Remote Peas at once, they get started concurrently
+
+    Results are sent per Pea in order, either `started` with the `pea_id` or `failed` with the `detail`,
+    Peas whose arguments can't get parsed fail without affecting the others
+    """
+    results, namespaces = [], []
+    with stage('parse'):
+        for args in pea_arguments:
+            try:
+                namespaces.append(pea_to_namespace(args=args))
+                results.append(None)
+            except Exception as e:
+                results.append({'status': 'failed', 'detail': repr(e)})
+
+    with pea_store._session():
+        with stage('start'):
+            started = iter(await run_in_threadpool(pea_store._create_many, namespaces))
+    results = [result or next(started) for result in results]
+    return {
+        'status_code': status.HTTP_200_OK,
+        'peas': results,
+        'stages': current_stages()
+    }
+
+
+@router.delete(
+    path='/peas',
+    summary='Close many Peas',
+)
+async def _delete_many(
+    pea_ids: List[uuid.UUID] = Query(...)
+):
+    """
+    Close many Pea contexts at once, they get closed concurrently
+
+    Results are sent per Pea in order, one of `deleted`, `not_found` or `failed` with the `detail`
+    """
+    with pea_store._session():
+        with stage('close'):
+            results = await run_in_threadpool(pea_store._delete_many, pea_ids)
+        for pea_id, result in zip(pea_ids, results):
+            if result['status'] == 'not_found' and await delete_from_owner(store=pea_store, entity_id=pea_id):
+                result['status'] = 'deleted'
+    return {
+        'status_code': status.HTTP_200_OK,
+        'peas': [{'pea_id': pea_id, **result} for pea_id, result in zip(pea_ids, results)],
+        'stages': current_stages()
+    }
+
+
+@router.on_event('startup')
+def _startup():
+    with pea_store._session():
+        pea_store._recover()
 
 
 @router.on_event('shutdown')
 def _shutdown():
+    # records are kept, peas get recovered on the next start if the store backend is durable
     with pea_store._session():
-        pea_store._delete_all()
+        pea_store._delete_all(forget=False)
@@ -1,13 +1,16 @@
 import uuid
 from typing import Dict, List, Union
 
-from fastapi import status, APIRouter, File, UploadFile
+from fastapi import status, APIRouter, File, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from jina.logging import JinaLogger
 
 from jinad.store import pod_store
+from jinad.workers import delete_from_owner
 from jinad.models import SinglePodModel, ParallelPodModel
-from jinad.excepts import HTTPException, PodStartException
-from jinad.helper import pod_to_namespace, create_meta_files_from_upload
+from jinad.metrics import stage, current_stages
+from jinad.excepts import HTTPException, PodStartException, UploadTooLargeException
+from jinad.helper import pod_to_namespace, create_meta_files_from_upload, check_upload_size
 
 logger = JinaLogger(context='👻 PODAPI')
 router = APIRouter()
@@ -24,14 +27,24 @@ async def _upload(
     """
 
     """
+    try:
+        check_upload_size(list(uses_files) + list(pymodules_files))
+    except UploadTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=str(e))
+
+    # copying the files blocks, hence kept out of the event loop
     upload_status = 'nothing to upload'
-    if uses_files:
-        [create_meta_files_from_upload(current_file) for current_file in uses_files]
-        upload_status = 'uploaded'
+    with stage('upload'):
+        if uses_files:
+            for current_file in uses_files:
+                await run_in_threadpool(create_meta_files_from_upload, current_file)
+            upload_status = 'uploaded'
 
-    if pymodules_files:
-        [create_meta_files_from_upload(current_file) for current_file in pymodules_files]
-        upload_status = 'uploaded'
+        if pymodules_files:
+            for current_file in pymodules_files:
+                await run_in_threadpool(create_meta_files_from_upload, current_file)
+            upload_status = 'uploaded'
 
     return {
         'status_code': status.HTTP_200_OK,
@@ -50,11 +63,12 @@ async def _create(
 
     Args: pod_arguments (SinglePodModel or RemotePodModel)
     """
-    pod_arguments = pod_to_namespace(args=pod_arguments)
+    with stage('parse'):
+        pod_arguments = pod_to_namespace(args=pod_arguments)
 
     with pod_store._session():
         try:
-            pod_id = pod_store._create(pod_arguments=pod_arguments)
+            pod_id = await run_in_threadpool(pod_store._create, pod_arguments=pod_arguments)
         except PodStartException as e:
             raise HTTPException(status_code=404,
                                 detail=f'Pod couldn\'t get started: {repr(e)}')
@@ -65,7 +79,8 @@ async def _create(
     return {
         'status_code': status.HTTP_200_OK,
         'pod_id': pod_id,
-        'status': 'started'
+        'status': 'started',
+        'stages': current_stages()
     }
 
 
@@ -80,16 +95,83 @@ async def _delete(
     """
     with pod_store._session():
         try:
-            pod_store._delete(pod_id=pod_id)
-            return {
-                'status_code': status.HTTP_200_OK
-            }
+            await run_in_threadpool(pod_store._delete, pod_id=pod_id)
         except KeyError:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                                detail=f'Pod ID {pod_id} not found! Please create a new Pod')
+            if not await delete_from_owner(store=pod_store, entity_id=pod_id):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                    detail=f'Pod ID {pod_id} not found! Please create a new Pod')
+    return {
+        'status_code': status.HTTP_200_OK,
+        'stages': current_stages()
+    }
+
+
+@router.put(
+    path='/pods',
+    summary='Create many Pods',
+)
+async def _create_many(
+    pod_arguments: List[Union[SinglePodModel, ParallelPodModel]]
+):
+    """
+    Used to create many Remote Pods at once, they get started concurrently
+
+    Results are sent per Pod in order, either `started` with the `pod_id` or `failed` with the `detail`,
+    Pods whose arguments can't get parsed fail without affecting the others
+    """
+    results, namespaces = [], []
+    with stage('parse'):
+        for args in pod_arguments:
+            try:
+                namespaces.append(pod_to_namespace(args=args))
+                results.append(None)
+            except Exception as e:
+                results.append({'status': 'failed', 'detail': repr(e)})
+
+    with pod_store._session():
+        with stage('start'):
+            started = iter(await run_in_threadpool(pod_store._create_many, namespaces))
+    results = [result or next(started) for result in results]
+    return {
+        'status_code': status.HTTP_200_OK,
+        'pods': results,
+        'stages': current_stages()
+    }
+
+
+@router.delete(
+    path='/pods',
+    summary='Close many Pods',
+)
+async def _delete_many(
+    pod_ids: List[uuid.UUID] = Query(...)
+):
+    """
+    Close many Pod contexts at once, they get closed concurrently
+
+    Results are sent per Pod in order, one of `deleted`, `not_found` or `failed` with the `detail`
+    """
+    with pod_store._session():
+        with stage('close'):
+            results = await run_in_threadpool(pod_store._delete_many, pod_ids)
+        for pod_id, result in zip(pod_ids, results):
+            if result['status'] == 'not_found' and await delete_from_owner(store=pod_store, entity_id=pod_id):
+                result['status'] = 'deleted'
+    return {
+        'status_code': status.HTTP_200_OK,
+        'pods': [{'pod_id': pod_id, **result} for pod_id, result in zip(pod_ids, results)],
+        'stages': current_stages()
+    }
+
+
+@router.on_event('startup')
+def _startup():
+    with pod_store._session():
+        pod_store._recover()
 
 
 @router.on_event('shutdown')
 def _shutdown():
+    # records are kept, pods get recovered on the next start if the store backend is durable
     with pod_store._session():
-        pod_store._delete_all()
+        pod_store._delete_all(forget=False)
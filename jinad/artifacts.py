@@ -0,0 +1,198 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+
+from fastapi import UploadFile
+from jina.logging import JinaLogger
+
+from jinad.config import server_config, store_config, upload_config
+from jinad.backend import StoreBackend, get_backend
+from jinad.excepts import UploadTooLargeException
+from jinad.metrics import Counter, track
+
+
+class ArtifactStore:
+    """ Content-addressed store for uploaded `uses` & `py_modules` files
+
+    Every file gets written once under its sha256 digest in `blobs/`. Each owner (e.g. a Flow) gets a workspace
+    in `workspaces/{owner}/`, which links the blobs under the uploaded filenames. Blobs are reference counted
+    & removed when the last owner using them gets released.
+
+    With a `backend` shared by the API workers of a multi-worker jinad, the references get recorded in it too &
+    a blob gets removed once the last owner of any of the workers got released.
+    """
+    #: prefix of the owners of the files uploaded into `cwd`, one owner per filename
+    CWD = 'cwd'
+    logger = JinaLogger(context='📦 ARTIFACTS')
+
+    def __init__(self, root: str, backend: StoreBackend = None):
+        self.blobs_path = os.path.join(root, 'blobs')
+        self.workspaces_path = os.path.join(root, 'workspaces')
+        self._owners = {}  # type: Dict[str, set]
+        self._digests = {}  # type: Dict[str, set]
+        self._lock = threading.Lock()
+        self._backend = backend
+        self.uploads = {'files': 0, 'bytes': 0, 'seconds': 0.0}
+
+    @track('put')
+    def put(self, current_file: UploadFile, owner: str) -> str:
+        """ Adds a reference from `owner` to the upload, keeps it only if no file with same content exists
+
+        The upload gets hashed first & copied to a temp file only if its blob doesn't exist yet, both in
+        `CHUNK_SIZE` chunks, hence never gets read in memory as a whole. This blocks, use it in a threadpool
+        from the event loop.
+        """
+        os.makedirs(self.blobs_path, exist_ok=True)
+        start_time = time.time()
+        digest, size = self._hash(current_file)
+        temp_path = os.path.join(self.blobs_path, f'.{uuid.uuid4().hex}.tmp')
+        try:
+            with self._locked():
+                # once referenced, the blob can't get removed by the release of another owner
+                stored = os.path.isfile(self.blob_path(digest))
+                if stored:
+                    self._add_reference(digest=digest, owner=owner)
+            if not stored:
+                current_file.file.seek(0)
+                with open(temp_path, 'wb') as f:
+                    shutil.copyfileobj(current_file.file, f, upload_config.CHUNK_SIZE)
+                with self._locked():
+                    os.replace(temp_path, self.blob_path(digest))
+                    self._add_reference(digest=digest, owner=owner)
+
+            with self._lock:
+                elapsed = time.time() - start_time
+                self.uploads['files'] += 1
+                self.uploads['bytes'] += size
+                self.uploads['seconds'] += elapsed
+        finally:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+
+        self.logger.debug(f'Stored {current_file.filename} as {digest}, {size} bytes in {elapsed:.3f} secs')
+        return digest
+
+    @staticmethod
+    def _hash(current_file: UploadFile):
+        """ sha256 & size of the upload, raises `UploadTooLargeException` beyond `MAX_FILE_SIZE` bytes """
+        sha256 = hashlib.sha256()
+        size = 0
+        current_file.file.seek(0)
+        for chunk in iter(lambda: current_file.file.read(upload_config.CHUNK_SIZE), b''):
+            size += len(chunk)
+            if size > upload_config.MAX_FILE_SIZE:
+                raise UploadTooLargeException(f'{current_file.filename} exceeds the max allowed size of '
+                                              f'{upload_config.MAX_FILE_SIZE} bytes')
+            sha256.update(chunk)
+        return sha256.hexdigest(), size
+
+    @staticmethod
+    def digest(current_file: UploadFile) -> str:
+        """ sha256 of the upload without storing it, read in `CHUNK_SIZE` chunks """
+        sha256 = hashlib.sha256()
+        current_file.file.seek(0)
+        for chunk in iter(lambda: current_file.file.read(upload_config.CHUNK_SIZE), b''):
+            sha256.update(chunk)
+        current_file.file.seek(0)
+        return sha256.hexdigest()
+
+    def put_digest(self, digest: str, owner: str):
+        """ Adds a reference from `owner` to an already stored blob """
+        with self._lock:
+            if digest not in self._owners:
+                raise KeyError(f'{digest} not found in artifact store')
+            self._add_reference(digest=digest, owner=owner)
+
+    def restore(self, digest: str, owner: str):
+        """ Adds a reference from `owner` to a blob stored by a previous jinad process """
+        with self._locked():
+            if not os.path.isfile(self.blob_path(digest)):
+                raise KeyError(f'{digest} not found in artifact store')
+            self._add_reference(digest=digest, owner=owner)
+
+    @contextmanager
+    def _locked(self):
+        """ Holds the lock of the blobs, across the workers sharing the backend if any """
+        with self._lock:
+            if self._backend is None:
+                yield
+                return
+            with self._backend.lock(name='artifacts'):
+                yield
+
+    def _add_reference(self, digest: str, owner: str):
+        self._owners.setdefault(digest, set()).add(str(owner))
+        self._digests.setdefault(str(owner), set()).add(digest)
+        if self._backend is not None:
+            self._backend.put(kind=f'reference:{digest}', entity_id=str(owner), record={})
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blobs_path, digest)
+
+    def link(self, digest: str, path: str):
+        """ Links the blob to `path`, the caller must hold a reference to it """
+        if os.path.lexists(path):
+            os.remove(path)
+        os.symlink(self.blob_path(digest), path)
+
+    def unlink(self, digest: str, path: str):
+        """ Removes `path` if it is a link to the blob """
+        if os.path.islink(path) and os.readlink(path) == self.blob_path(digest):
+            os.remove(path)
+
+    def owns(self, owner: str) -> bool:
+        """ Whether `owner` holds a reference to any blob """
+        return str(owner) in self._digests
+
+    def workspace(self, owner: str, files: Dict[str, str]) -> str:
+        """ Creates the workspace of `owner` with `{filename: digest}` linked in it & returns its path """
+        workspace = os.path.join(self.workspaces_path, str(owner))
+        os.makedirs(workspace, exist_ok=True)
+        for filename, digest in files.items():
+            self.link(digest=digest,
+                      path=os.path.join(workspace, os.path.basename(filename)))
+        return workspace
+
+    def release(self, owner: str) -> List[str]:
+        """ Removes the workspace of `owner` & every blob it was the last owner of """
+        removed = []
+        with self._locked():
+            for digest in self._digests.pop(str(owner), ()):
+                self._owners[digest].discard(str(owner))
+                if not self._owners[digest]:
+                    self._owners.pop(digest)
+                if self._backend is not None:
+                    self._backend.delete(kind=f'reference:{digest}', entity_id=str(owner))
+                if self.references(digest):
+                    continue
+                if os.path.isfile(self.blob_path(digest)):
+                    os.remove(self.blob_path(digest))
+                removed.append(digest)
+        shutil.rmtree(os.path.join(self.workspaces_path, str(owner)), ignore_errors=True)
+        return removed
+
+    def throughput(self) -> float:
+        """ Average upload throughput in bytes/sec since the start """
+        return self.uploads['bytes'] / self.uploads['seconds'] if self.uploads['seconds'] else 0.0
+
+    def references(self, digest: str) -> int:
+        """ Number of owners using the blob, of all the workers sharing the backend if any """
+        if self._backend is not None:
+            return len(self._backend.load(kind=f'reference:{digest}'))
+        return len(self._owners.get(digest, ()))
+
+
+# the API workers of a multi-worker jinad share the blobs & their references via the sqlite backend
+artifact_store = ArtifactStore(root=store_config.WORKSPACE,
+                               backend=get_backend() if server_config.WORKERS > 1 else None)
+Counter('jinad_upload_files_total', 'Number of files stored by the artifact store',
+        callback=lambda: {(): artifact_store.uploads['files']})
+Counter('jinad_upload_bytes_total', 'Bytes of the files stored by the artifact store',
+        callback=lambda: {(): artifact_store.uploads['bytes']})
+Counter('jinad_upload_seconds_total', 'Time spent in storing uploaded files',
+        callback=lambda: {(): artifact_store.uploads['seconds']})
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import signal
+import fcntl
+import sqlite3
+import threading
+from enum import Enum
+from argparse import Namespace
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+from jinad.config import server_config, store_config
+from jinad.models.custom import _decode_enum, _type_to_str
+
+
+def _encode(value):
+    # IntEnum is an int for `json` & Namespaces aren't serializable, hence both are encoded before dumping
+    if isinstance(value, Enum):
+        return {'__enum__': _type_to_str(type(value)), 'name': value.name}
+    if isinstance(value, Namespace):
+        return {'__namespace__': _encode(vars(value))}
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value: Dict):
+    if '__namespace__' in value:
+        return Namespace(**value['__namespace__'])
+    return _decode_enum(value)
+
+
+def dumps(record: Dict) -> str:
+    return json.dumps(_encode(record), default=str)
+
+
+def loads(content: str) -> Dict:
+    return json.loads(content, object_hook=_decode)
+
+
+class StoreBackend:
+    """ Records the Flows / Pods / Peas of the stores, so that a restarted jinad can recover them
+
+    The default backend keeps nothing, every entity is lost with the jinad process.
+    """
+    durable = False
+
+    def put(self, kind: str, entity_id: str, record: Dict):
+        pass
+
+    def delete(self, kind: str, entity_id: str):
+        pass
+
+    def get(self, kind: str, entity_id: str) -> Optional[Dict]:
+        return None
+
+    def load(self, kind: str) -> Dict[str, Dict]:
+        return {}
+
+    def lock(self, name: str = None):
+        """ Held by a jinad worker while it recovers the records, so that no other worker recovers them too
+
+        Locks named by `name` are independent of it, e.g. one held while blobs get referenced or removed.
+        """
+        return nullcontext()
+
+
+class SQLiteBackend(StoreBackend):
+    """ Keeps the records in a single SQLite file on the local disk """
+    durable = True
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS records '
+                                 '(kind TEXT, id TEXT, record TEXT, updated REAL, PRIMARY KEY (kind, id))')
+        self._lock = threading.Lock()
+        self._lock_path = f'{path}.lock'
+
+    def put(self, kind: str, entity_id: str, record: Dict):
+        content = dumps(record)
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)',
+                                     (kind, str(entity_id), content, time.time()))
+
+    def delete(self, kind: str, entity_id: str):
+        with self._lock:
+            self._connection.execute('DELETE FROM records WHERE kind = ? AND id = ?', (kind, str(entity_id)))
+
+    def get(self, kind: str, entity_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection.execute('SELECT record FROM records WHERE kind = ? AND id = ?',
+                                           (kind, str(entity_id))).fetchone()
+        return loads(row[0]) if row else None
+
+    def load(self, kind: str) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._connection.execute('SELECT id, record FROM records WHERE kind = ?', (kind,)).fetchall()
+        return {entity_id: loads(content) for entity_id, content in rows}
+
+    @contextmanager
+    def lock(self, name: str = None):
+        with open(f'{self._lock_path}.{name}' if name else self._lock_path, 'w') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+def get_backend() -> StoreBackend:
+    # workers of a multi-worker jinad share their records via the sqlite file
+    if store_config.BACKEND == 'sqlite' or server_config.WORKERS > 1:
+        return SQLiteBackend(path=store_config.DB_PATH)
+    return StoreBackend()
+
+
+def get_process_start_time(pid: int) -> Optional[int]:
+    """ Start time of the process in clock ticks since boot, tells it apart from a later one with the same pid
+
+    `None` if the process doesn't exist or is a zombie.
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as fp:
+            stat = fp.read()
+        # the name of the process is in parentheses & might contain spaces, state & starttime are 3rd & 22nd
+        fields = stat[stat.rindex(')') + 2:].split()
+        return None if fields[0] == 'Z' else int(fields[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def is_alive(pid: int, start_time: Optional[int]) -> bool:
+    if start_time is not None and os.path.exists('/proc'):
+        return get_process_start_time(pid) == start_time
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def get_worker() -> Dict:
+    """ Identifies the jinad worker process owning a context & the unix socket other workers reach it on """
+    pid = os.getpid()
+    return {'pid': pid,
+            'start_time': get_process_start_time(pid),
+            'address': os.path.join(server_config.WORKER_PATH, f'{pid}.sock')}
+
+
+class AttachedContext:
+    """ Stands in for a Flow / Pod / Pea started by a previous jinad process, whose processes are still alive
+
+    It can't talk to the processes like the original context, but serves the recorded host, port & yaml and
+    terminates the processes on close.
+    """
+
+    def __init__(self, record: Dict):
+        self.pids = record['pids']
+        self.host = record.get('host')
+        self.port_expose = record.get('port')
+        self.yaml_spec = record.get('yaml_spec')
+
+    @property
+    def is_alive(self) -> bool:
+        # Peas running in threads died with the previous jinad process
+        return bool(self.pids) and all(pid and is_alive(pid, start_time) for pid, start_time in self.pids)
+
+    def close(self, timeout: float = 10):
+        alive = [(pid, start_time) for pid, start_time in self.pids if pid and is_alive(pid, start_time)]
+        for pid, _ in alive:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + timeout
+        while alive and time.time() < deadline:
+            time.sleep(0.05)
+            alive = [(pid, start_time) for pid, start_time in alive if is_alive(pid, start_time)]
+        for pid, _ in alive:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
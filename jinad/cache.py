@@ -0,0 +1,120 @@
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from jina.proto import jina_pb2
+
+from jinad.config import result_cache_config
+from jinad.metrics import Counter, Gauge
+
+CacheKey = Tuple[uuid.UUID, str]
+
+
+def request_hash(mode: str, docs: List['jina_pb2.DocumentProto'], top_k: Optional[int]) -> str:
+    """ Hash of a request, ignoring the ids & content hashes of its docs, which differ on every request """
+    digest = hashlib.sha256(f'{mode}:{top_k}:{len(docs)}'.encode())
+    for doc in docs:
+        normalized = jina_pb2.DocumentProto()
+        normalized.CopyFrom(doc)
+        normalized.ClearField('id')
+        normalized.ClearField('content_hash')
+        serialized = normalized.SerializeToString(deterministic=True)
+        digest.update(len(serialized).to_bytes(8, 'little'))
+        digest.update(serialized)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """ Keeps the docs answered by Flows to search requests, per `flow_id` & `request_hash`
+
+    The least recently used results get evicted beyond `RESULT_CACHE_MAX_ENTRIES` or `RESULT_CACHE_MAX_BYTES`,
+    results expire after `RESULT_CACHE_TTL` secs. All results of a Flow get invalidated when it indexes docs
+    or gets deleted / restarted. A result gets stored only if its Flow did not get invalidated while it was
+    being searched, which is tracked by a generation per Flow.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()  # type: OrderedDict[CacheKey, Tuple[float, List[bytes], int]]
+        self._generations = {}  # type: Dict[uuid.UUID, int]
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return result_cache_config.RESULT_CACHE
+
+    def generation(self, flow_id: uuid.UUID) -> int:
+        return self._generations.get(flow_id, 0)
+
+    def get(self, flow_id: uuid.UUID, key: str) -> Optional[List['jina_pb2.DocumentProto']]:
+        with self._lock:
+            entry = self._entries.get((flow_id, key))
+            if entry and entry[0] < time.monotonic():
+                self._pop((flow_id, key))
+                entry = None
+            if entry:
+                self._entries.move_to_end((flow_id, key))
+        cache_requests.inc(result='hit' if entry else 'miss')
+        if entry:
+            return [jina_pb2.DocumentProto.FromString(doc) for doc in entry[1]]
+
+    def put(self, flow_id: uuid.UUID, key: str, docs: List['jina_pb2.DocumentProto'], generation: int):
+        serialized = [doc.SerializeToString() for doc in docs]
+        size = sum(len(doc) for doc in serialized)
+        if size > result_cache_config.RESULT_CACHE_MAX_BYTES:
+            return
+        with self._lock:
+            if self.generation(flow_id) != generation:
+                return
+            self._pop((flow_id, key))
+            self._entries[(flow_id, key)] = (time.monotonic() + result_cache_config.RESULT_CACHE_TTL, serialized, size)
+            self._bytes += size
+            while len(self._entries) > result_cache_config.RESULT_CACHE_MAX_ENTRIES or \
+                    self._bytes > result_cache_config.RESULT_CACHE_MAX_BYTES:
+                self._pop(next(iter(self._entries)))
+                cache_evictions.inc()
+
+    def invalidate(self, flow_id: uuid.UUID):
+        """ Drops all results of the Flow, results being searched at the moment won't get stored """
+        with self._lock:
+            self._generations[flow_id] = self.generation(flow_id) + 1
+            for key in [key for key in self._entries if key[0] == flow_id]:
+                self._pop(key)
+
+    def forget(self, flow_id: uuid.UUID):
+        """ Drops all results & the generation of a deleted Flow, flow_ids never get reused """
+        with self._lock:
+            self._generations.pop(flow_id, None)
+            for key in [key for key in self._entries if key[0] == flow_id]:
+                self._pop(key)
+
+    def _pop(self, key: CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry[2]
+
+    def stats(self) -> Dict:
+        hits, misses = cache_requests.get(result='hit'), cache_requests.get(result='miss')
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+        }
+
+
+result_cache = ResultCache()
+cache_requests = Counter('jinad_result_cache_requests_total', 'Lookups of the result cache by result (hit / miss)',
+                         labelnames=('result',))
+cache_evictions = Counter('jinad_result_cache_evictions_total',
+                          'Results evicted from the result cache to stay within its entry & byte bounds')
+Gauge('jinad_result_cache_entries', 'Number of results held by the result cache',
+      callback=lambda: {(): result_cache.stats()['entries']})
+Gauge('jinad_result_cache_bytes', 'Bytes of the docs held by the result cache',
+      callback=lambda: {(): result_cache.stats()['bytes']})
+Gauge('jinad_result_cache_hit_rate', 'Share of result cache lookups that were hits',
+      callback=lambda: {(): result_cache.stats()['hit_rate']})
@@ -57,6 +57,11 @@ class ServerConfig(BaseConfig):
     # TODO: check if HOST can be a ipaddress.IPv4Address
     HOST: str = '0.0.0.0'
     PORT: int = 8000
+    WS_PER_MESSAGE_DEFLATE: bool = True
+    # API workers, with more than 1 they share the records of the stores via the sqlite backend & forward
+    # requests for a Flow / Pod / Pea owned by another worker over its unix socket in `WORKER_PATH`
+    WORKERS: int = 1
+    WORKER_PATH: str = '/tmp/jinad/workers'
 
 
 class JinaDConfig(BaseConfig):
@@ -72,10 +77,121 @@ class JinaDConfig(BaseConfig):
 class LogConfig(BaseConfig):
     # TODO: Read config from some file
     PATH: str = '/tmp/jina-log/%s/log.log'
+    # log streams wake up on inotify events, files get polled every `POLL_INTERVAL` secs if unavailable
+    INOTIFY: bool = True
+    POLL_INTERVAL: float = 0.1
+    # every `INDEX_INTERVAL`th line's byte offset is indexed in `{PATH}.idx` to resume streams with a seek
+    INDEX_INTERVAL: int = 1000
+    # log lines sent per frame to clients negotiating the `json` / `msgpack` subprotocol
+    BATCH_LINES: int = 500
+    BATCH_BYTES: int = 64 * 1024
+    BATCH_LATENCY: float = 0.05
+    # frames buffered per client of a log stream, slower clients read the lines they miss from the file
+    SUBSCRIBER_QUEUE_SIZE: int = 100
+
+
+class StoreConfig(BaseConfig):
+    # max number of Flows that are created in parallel, rest of them wait in the queue
+    MAX_WORKERS: int = 4
+    # start Pods of a Flow level by level, all Peas of a level get started concurrently
+    PARALLEL_START: bool = False
+    # also bounds the Pods / Peas of a `PUT /pods`, `PUT /peas` (or bulk delete) started (or closed) concurrently
+    MAX_PARALLEL_PEAS: int = 8
+    # uploaded files are stored once by content, Flows get their own workspace linking them
+    WORKSPACE: str = '/tmp/jinad'
+    # contexts get closed gracefully within `CLOSE_TIMEOUT` secs, their processes get terminated & killed after
+    # `KILL_TIMEOUT` more secs, keep the sum below the stop grace period of the container (10 secs for docker)
+    CLOSE_TIMEOUT: float = 5
+    KILL_TIMEOUT: float = 2
+    # statuses of Flows that failed to get created are kept `FAILED_TTL` secs for the clients to fetch them
+    FAILED_TTL: float = 3600
+    # max number of idle Flows kept started per template of the warm pool
+    POOL_MAX_SIZE: int = 8
+    # `sqlite` records Flows / Pods / Peas in `DB_PATH`, so that they get recovered when jinad restarts
+    BACKEND: str = 'memory'
+    DB_PATH: str = '/tmp/jinad/store.db'
+
+    @validator('BACKEND')
+    def validate_backend(cls, value):
+        if value.lower() not in ['memory', 'sqlite']:
+            raise ValueError('BACKEND must be either memory or sqlite')
+        return value.lower()
+
+
+class UploadConfig(BaseConfig):
+    # uploads get copied to the artifact store in chunks, sizes are in bytes
+    CHUNK_SIZE: int = 1024 * 1024
+    MAX_FILE_SIZE: int = 1024 * 1024 * 1024
+    MAX_REQUEST_SIZE: int = 2 * 1024 * 1024 * 1024
+
+
+class MetricsConfig(BaseConfig):
+    # event loop lag gets sampled every `LOOP_LAG_INTERVAL` secs, starting with the first scrape of `/metrics`
+    LOOP_LAG_INTERVAL: float = 0.5
+    # stages of create / delete requests get appended as json lines, set to empty to disable
+    TRACE_PATH: str = '/tmp/jinad/trace.jsonl'
+
+
+class PingConfig(BaseConfig):
+    # `/ping?probe=true` results are cached per gateway for `PING_TTL` secs, over at most `PING_MAX_CHANNELS`
+    # gRPC channels kept open
+    PING_TTL: float = 2
+    PING_TIMEOUT: float = 1
+    PING_MAX_CHANNELS: int = 128
+
+
+class ProxyConfig(BaseConfig):
+    # `/flow/{flow_id}/search` & `/index` requests arriving within `PROXY_BATCH_LATENCY` secs get sent to the
+    # gateway as one request of at most `PROXY_BATCH_SIZE` docs, set the latency to 0 to send them one by one
+    PROXY_BATCH_LATENCY: float = 0.005
+    PROXY_BATCH_SIZE: int = 128
+    PROXY_TIMEOUT: float = 60
+    PROXY_MAX_CHANNELS: int = 128
+
+
+class IngestConfig(BaseConfig):
+    # docs of `/flow/{flow_id}/ingest` bodies are sent in batches of `INGEST_BATCH_SIZE`, the body is read no
+    # further while `INGEST_MAX_INFLIGHT` batches wait for the gateway
+    INGEST_BATCH_SIZE: int = 256
+    INGEST_MAX_INFLIGHT: int = 4
+    INGEST_MAX_LINE_BYTES: int = 16 * 1024 * 1024
+    # progress gets streamed every `INGEST_PROGRESS_INTERVAL` secs, of the last `INGEST_KEEP` finished ingests too
+    INGEST_PROGRESS_INTERVAL: float = 1
+    INGEST_KEEP: int = 100
+
+
+class ResultCacheConfig(BaseConfig):
+    # opt-in, docs answered to `/flow/{flow_id}/search` are kept per Flow & request for `RESULT_CACHE_TTL` secs,
+    # the least recently used ones get evicted beyond `RESULT_CACHE_MAX_ENTRIES` results or `RESULT_CACHE_MAX_BYTES`
+    RESULT_CACHE: bool = False
+    RESULT_CACHE_TTL: float = 300
+    RESULT_CACHE_MAX_ENTRIES: int = 10000
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+
+class ResourceConfig(BaseConfig):
+    # CPU%, RSS, threads & open fds of the processes of Flows / Pods / Peas get sampled every `RESOURCE_INTERVAL`
+    # secs from `/proc`, set to 0 to only sample on `/flow/{flow_id}/resources`
+    RESOURCE_INTERVAL: float = 5
+
+
+class ModelConfig(BaseConfig):
+    # pydantic models are built from field specs cached per jina version
+    CACHE: bool = True
+    CACHE_PATH: str = '~/.jina/jinad/models-%s.json'
 
 
 jinad_config = JinaDConfig()
 log_config = LogConfig()
+store_config = StoreConfig()
+upload_config = UploadConfig()
+metrics_config = MetricsConfig()
+ping_config = PingConfig()
+proxy_config = ProxyConfig()
+ingest_config = IngestConfig()
+result_cache_config = ResultCacheConfig()
+resource_config = ResourceConfig()
+model_config = ModelConfig()
 fastapi_config = FastAPIConfig()
 server_config = ServerConfig()
 openapitags_config = OpenAPITags()
@@ -26,5 +26,9 @@ class PeaStartException(Exception):
     """ Exception during pod start """
 
 
+class UploadTooLargeException(Exception):
+    """ Exception during upload if a file or the request exceeds the size limits """
+
+
 class NoSuchFileException(WebSocketException):
     """ Exception during log streaming if no file is found """
@@ -1,12 +1,18 @@
 import os
+import hashlib
 import argparse
-from typing import Dict, List, Union
+from functools import lru_cache
+from typing import Dict, List, Set, Union
 
 from jina import __default_host__
 from jina.helper import get_random_identity
 from fastapi import UploadFile
 
 from jinad.models import PeaModel, SinglePodModel, ParallelPodModel
+from jinad.parsers import get_parser
+from jinad.config import upload_config
+from jinad.excepts import UploadTooLargeException
+from jinad.artifacts import artifact_store
 
 
 def get_enum_defaults(parser: argparse.ArgumentParser):
@@ -20,16 +26,22 @@ def get_enum_defaults(parser: argparse.ArgumentParser):
     return enum_args
 
 
+@lru_cache()
+def get_enum_types(parser: argparse.ArgumentParser) -> Dict:
+    """ Maps args with Enum default values to their Enum types, computed once per parser """
+    return {key: type(value) for key, value in get_enum_defaults(parser=parser).items()}
+
+
 def handle_enums(args: Dict, parser: argparse.ArgumentParser) -> Dict:
     """ Since REST relies on json, reverse conversion of integers to enums is needed """
-    default_enums = get_enum_defaults(parser=parser)
+    enum_types = get_enum_types(parser=parser)
     _args = args.copy()
     if 'log_config' in _args:
         _args['log_config'] = parser.get_default('--log-config')
 
     for key, value in args.items():
-        if key in default_enums:
-            _enum_type = type(default_enums[key])
+        if key in enum_types:
+            _enum_type = enum_types[key]
             if isinstance(value, int):
                 _args[key] = _enum_type(value)
             elif isinstance(value, str):
@@ -59,8 +71,7 @@ def handle_remote_args(args: Dict, parser):
 
 
 def pod_to_namespace(args: Union[SinglePodModel, ParallelPodModel]):
-    from jina.parsers import set_pod_parser
-    parser = set_pod_parser()
+    parser = get_parser('pod')
 
     if isinstance(args, ParallelPodModel):
         pod_args = {}
@@ -93,8 +104,7 @@ def pod_to_namespace(args: Union[SinglePodModel, ParallelPodModel]):
 
 
 def pea_to_namespace(args: Union[PeaModel, Dict]):
-    from jina.parsers import set_pea_parser
-    parser = set_pea_parser()
+    parser = get_parser('pea')
 
     if isinstance(args, PeaModel):
         args = args.dict()
@@ -105,11 +115,116 @@ def pea_to_namespace(args: Union[PeaModel, Dict]):
         return argparse.Namespace(**pea_args)
 
 
+def get_pod_levels(pod_needs: Dict[str, Set[str]]) -> List[List[str]]:
+    """ Groups Pods into levels, every Pod only needs Pods from the levels before it
+
+    `gateway` closes the ring from the last Pod back to the first one, hence it gets a level of its own at the end
+    """
+    remaining = {name: set(needs) - {'gateway'} for name, needs in pod_needs.items() if name != 'gateway'}
+    levels = []
+    while remaining:
+        current_level = [name for name, needs in remaining.items() if not needs & remaining.keys()]
+        if not current_level:
+            # a cycle in the graph, nothing more to order here
+            current_level = list(remaining)
+        levels.append(current_level)
+        for name in current_level:
+            remaining.pop(name)
+    if 'gateway' in pod_needs:
+        levels.append(['gateway'])
+    return levels
+
+
+def handle_workspace_files(args: argparse.Namespace, workspace: str):
+    """ Points `uses` & `py_modules` of a Pea to the files uploaded to its workspace """
+
+    def _workspace_path(value):
+        if isinstance(value, str):
+            path = os.path.join(workspace, os.path.basename(value))
+            if os.path.lexists(path):
+                return path
+        return value
+
+    for key in ('uses', 'uses_before', 'uses_after'):
+        if key in args:
+            setattr(args, key, _workspace_path(getattr(args, key)))
+    if 'py_modules' in args and args.py_modules:
+        args.py_modules = [_workspace_path(current_module) for current_module in args.py_modules]
+
+
+def get_upload_size(current_file: UploadFile) -> int:
+    """ Size of the upload in bytes, FastAPI has already spooled it to a temp file """
+    current_file.file.seek(0, os.SEEK_END)
+    size = current_file.file.tell()
+    current_file.file.seek(0)
+    return size
+
+
+def check_upload_size(files: List[UploadFile]):
+    """ Raises UploadTooLargeException if a file or all files together exceed the configured limits """
+    total_size = 0
+    for current_file in files:
+        size = get_upload_size(current_file)
+        if size > upload_config.MAX_FILE_SIZE:
+            raise UploadTooLargeException(f'{current_file.filename} has {size} bytes, '
+                                          f'max allowed size of a file is {upload_config.MAX_FILE_SIZE} bytes')
+        total_size += size
+    if total_size > upload_config.MAX_REQUEST_SIZE:
+        raise UploadTooLargeException(f'Uploads have {total_size} bytes, '
+                                      f'max allowed size of a request is {upload_config.MAX_REQUEST_SIZE} bytes')
+
+
+def get_upload_digests(files: List[UploadFile]) -> Dict[str, str]:
+    """ sha256 of every upload by its filename, without storing them """
+    return {os.path.basename(current_file.filename): artifact_store.digest(current_file) for current_file in files}
+
+
+def get_spec_hash(config: str, digests: Dict[str, str]) -> str:
+    """ Identifies a Flow by its spec & the content of its `uses` & `py_modules` files i.e. `{filename: digest}` """
+    sha256 = hashlib.sha256(config.encode())
+    for filename, digest in sorted(digests.items()):
+        sha256.update(f'\0{filename}\0{digest}'.encode())
+    return sha256.hexdigest()
+
+
+def get_upload_owner(filename: str) -> str:
+    """ Owner of a file uploaded into `cwd` via `/upload`, released once the Pod / Pea using it gets deleted """
+    return f'{artifact_store.CWD}:{os.path.basename(filename)}'
+
+
 def create_meta_files_from_upload(current_file: UploadFile):
-    with open(current_file.filename, 'wb') as f:
-        f.write(current_file.file.read())
+    """ Links the upload into `cwd`, content gets written to the artifact store only if it is not there yet
 
+    A file uploaded under the same name before gets released, its link gets replaced anyway.
+    """
+    owner = get_upload_owner(current_file.filename)
+    artifact_store.release(owner=owner)
+    digest = artifact_store.put(current_file=current_file,
+                                owner=owner)
+    artifact_store.link(digest=digest,
+                        path=os.path.abspath(os.path.basename(current_file.filename)))
 
-def delete_meta_files_from_upload(current_file: UploadFile):
-    if os.path.isfile(current_file.filename):
-        os.remove(current_file.filename)
+
+def get_upload_files(args: Union[Dict, argparse.Namespace]) -> List[str]:
+    """ Filenames uploaded into `cwd` via `/upload` that the `uses` & `py_modules` of a Pod / Pea refer to """
+    if isinstance(args, Dict):
+        peas_args = [args.get('head'), args.get('tail'), *args.get('peas', ())]
+    else:
+        peas_args = [args]
+    filenames = []
+    for pea_args in filter(None, peas_args):
+        values = [getattr(pea_args, key, None) for key in ('uses', 'uses_before', 'uses_after')]
+        values.extend(getattr(pea_args, 'py_modules', None) or ())
+        for value in values:
+            if isinstance(value, str) and artifact_store.owns(get_upload_owner(value)) and \
+                    os.path.basename(value) not in filenames:
+                filenames.append(os.path.basename(value))
+    return filenames
+
+
+def delete_meta_files_from_upload(filename: str):
+    """ Removes a file uploaded via `/upload` from `cwd` & releases its content """
+    artifact_store.release(owner=get_upload_owner(filename))
+    path = os.path.basename(filename)
+    if os.path.lexists(path):
+        os.remove(path)
@@ -0,0 +1,187 @@
+import json
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from jina.clients.request import _build_doc
+from jina.enums import DataInputType
+from jina.logging import JinaLogger
+from jina.proto import jina_pb2
+
+from jinad.config import ingest_config
+from jinad.metrics import Counter, Gauge
+from jinad.proxy import flow_proxy
+
+#: formats of the ingested body, every line is a doc (`ndjson`) or the text of a doc (`lines`)
+INGEST_FORMATS = ('ndjson', 'lines')
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """ Splits a stream of chunks into lines, holding at most one partial line of `max_line_bytes` """
+    partial = b''
+    async for chunk in chunks:
+        lines = (partial + chunk).split(b'\n')
+        partial = lines.pop()
+        if len(partial) > max_line_bytes:
+            raise ValueError(f'line longer than {max_line_bytes} bytes')
+        for line in lines:
+            yield line
+    if partial:
+        yield partial
+
+
+def parse_line(line: bytes, fmt: str) -> Any:
+    """ Returns what a doc gets built from, `None` for blank lines """
+    line = line.strip()
+    if not line:
+        return None
+    if fmt == 'ndjson':
+        return json.loads(line)
+    return line.decode()
+
+
+def build_docs(lines: List[bytes], fmt: str) -> List['jina_pb2.DocumentProto']:
+    """ Builds the docs of a batch of lines, blank lines are skipped
+
+    This blocks, use it in a threadpool from the event loop.
+    """
+    contents = (parse_line(line, fmt) for line in lines)
+    return [_build_doc(content, DataInputType.AUTO)[0].as_pb_object for content in contents if content is not None]
+
+
+class Ingest:
+    """ Feeds the docs of a streamed body to a Flow in batches of `INGEST_BATCH_SIZE` docs
+
+    At most `INGEST_MAX_INFLIGHT` batches are waiting for the gateway, the body is not read any further till
+    one of them got answered. Hence memory stays bounded by the in-flight batches, whatever the size of the body.
+    """
+    logger = JinaLogger(context='🚚 INGEST')
+
+    def __init__(self, ingest_id: uuid.UUID, flow_id: uuid.UUID):
+        self.ingest_id = ingest_id
+        self.flow_id = flow_id
+        self.status = 'running'
+        self.detail = None  # type: Optional[str]
+        self.docs = 0
+        self.batches = 0
+        self.in_flight = 0
+        self.start_time = time.time()
+        self.end_time = None  # type: Optional[float]
+        self._done = asyncio.Event()
+
+    def progress(self) -> Dict:
+        duration = (self.end_time or time.time()) - self.start_time
+        return {
+            'ingest_id': self.ingest_id,
+            'flow_id': self.flow_id,
+            'status': self.status,
+            'docs': self.docs,
+            'batches': self.batches,
+            'in_flight': self.in_flight,
+            'duration': duration,
+            'docs_per_sec': self.docs / duration if duration else 0.0,
+            **({'detail': self.detail} if self.detail else {})
+        }
+
+    async def updates(self, interval: float) -> AsyncIterator[Dict]:
+        """ Yields the progress every `interval` secs & once more when the ingest is over """
+        while not self._done.is_set():
+            yield self.progress()
+            try:
+                await asyncio.wait_for(self._done.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+        yield self.progress()
+
+    async def run(self, chunks: AsyncIterator[bytes], fmt: str, host: str, port: int):
+        slots = asyncio.Semaphore(ingest_config.INGEST_MAX_INFLIGHT)
+        pending = set()
+        failures = []
+
+        async def _send(batch):
+            try:
+                await run_in_threadpool(flow_proxy._call, host, port, 'index', batch, None)
+                self.docs += len(batch)
+                self.batches += 1
+                ingested_docs.inc(len(batch))
+            except Exception as e:
+                failures.append(e)
+            finally:
+                self.in_flight -= 1
+                slots.release()
+
+        async def _submit(lines):
+            batch = await run_in_threadpool(build_docs, lines, fmt)
+            await slots.acquire()
+            if failures:
+                raise failures[0]
+            self.in_flight += 1
+            task = asyncio.ensure_future(_send(batch))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        try:
+            lines = []
+            async for line in iter_lines(chunks, max_line_bytes=ingest_config.INGEST_MAX_LINE_BYTES):
+                if not line.strip():
+                    continue
+                lines.append(line)
+                if len(lines) >= ingest_config.INGEST_BATCH_SIZE:
+                    await _submit(lines)
+                    lines = []
+            if lines:
+                await _submit(lines)
+            await asyncio.gather(*pending)
+            if failures:
+                raise failures[0]
+            self.status = 'finished'
+        except BaseException as e:
+            for task in list(pending):
+                task.cancel()
+            self.status = 'failed'
+            self.detail = repr(e)
+            self.logger.error(f'Ingest {self.ingest_id} into Flow {self.flow_id} failed: {repr(e)}')
+            raise
+        finally:
+            self.end_time = time.time()
+            self._done.set()
+
+
+class IngestHub:
+    """ Keeps the running ingests & the last `INGEST_KEEP` finished ones, for their progress to be streamed """
+
+    def __init__(self):
+        self._ingests = OrderedDict()  # type: OrderedDict[uuid.UUID, Ingest]
+        self._registered = {}  # type: Dict[uuid.UUID, asyncio.Event]
+
+    def register(self, ingest: Ingest):
+        if ingest.ingest_id in self._ingests:
+            raise KeyError(f'{ingest.ingest_id} already exists')
+        self._ingests[ingest.ingest_id] = ingest
+        finished = [i for i, v in self._ingests.items() if v.status != 'running']
+        for ingest_id in finished[:max(0, len(finished) - ingest_config.INGEST_KEEP)]:
+            self._ingests.pop(ingest_id)
+        registered = self._registered.pop(ingest.ingest_id, None)
+        if registered:
+            registered.set()
+
+    async def wait(self, ingest_id: uuid.UUID, timeout: float) -> Optional[Ingest]:
+        """ Waits for the ingest to be registered, so that progress can be streamed before its body is sent """
+        if ingest_id not in self._ingests:
+            registered = self._registered.setdefault(ingest_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(registered.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self._registered.pop(ingest_id, None)
+        return self._ingests.get(ingest_id)
+
+    def running(self) -> int:
+        return sum(ingest.status == 'running' for ingest in self._ingests.values())
+
+
+ingest_hub = IngestHub()
+ingested_docs = Counter('jinad_ingest_docs_total', 'Docs sent to Flows via `/flow/{flow_id}/ingest`')
+Gauge('jinad_ingest_running', 'Number of ingests being fed to Flows', callback=lambda: {(): ingest_hub.running()})
@@ -3,6 +3,7 @@ from collections import namedtuple
 from fastapi import FastAPI
 
 from jinad.api.endpoints import common_router, flow, pod, pea, logs
+from jinad.metrics import ServerTimingMiddleware
 from jinad.config import jinad_config, fastapi_config, server_config, openapitags_config
 
 
@@ -24,6 +25,7 @@ def get_app():
         description=fastapi_config.DESCRIPTION,
         version=fastapi_config.VERSION
     )
+    app.add_middleware(ServerTimingMiddleware)
     app.include_router(router=common_router,
                        prefix=fastapi_config.PREFIX)
     app.include_router(router=logs.router,
@@ -56,14 +58,34 @@ def uvicorn_serve(app: 'FastAPI'):
                     host=server_config.HOST,
                     port=server_config.PORT,
                     loop='uvloop',
+                    ws_per_message_deflate=server_config.WS_PER_MESSAGE_DEFLATE,
                     log_level='error')
     server = Server(config=config)
     server.run()
 
 
+def uvicorn_serve_workers():
+    """ Runs `WORKERS` uvicorn workers sharing the port, each of them builds its own app via `get_app` """
+    from uvicorn import Config, Server
+    from uvicorn.supervisors import Multiprocess
+    config = Config(app='jinad.main:get_app',
+                    factory=True,
+                    workers=server_config.WORKERS,
+                    host=server_config.HOST,
+                    port=server_config.PORT,
+                    loop='uvloop',
+                    ws_per_message_deflate=server_config.WS_PER_MESSAGE_DEFLATE,
+                    log_level='error')
+    server = Server(config=config)
+    Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+
+
 def start():
-    app = get_app()
-    uvicorn_serve(app=app)
+    if server_config.WORKERS > 1:
+        uvicorn_serve_workers()
+    else:
+        app = get_app()
+        uvicorn_serve(app=app)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from jinad.config import metrics_config
+
+#: default latency buckets in secs, wide enough for Flows taking minutes to start
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence) -> str:
+    if not labelnames:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Registry:
+    """ Collects the metrics of jinad & renders them in the Prometheus text format """
+
+    def __init__(self):
+        self._metrics = {}  # type: Dict[str, Metric]
+
+    def register(self, metric: 'Metric'):
+        if metric.name in self._metrics:
+            raise ValueError(f'metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+
+    def unregister(self, metric: 'Metric'):
+        self._metrics.pop(metric.name, None)
+
+    def render(self) -> str:
+        return ''.join(f'{line}\n' for metric in self._metrics.values() for line in metric.render())
+
+
+registry = Registry()
+
+
+class Metric:
+    """ Base of all metrics, values are kept per tuple of label values
+
+    Metrics with a `callback` compute `{label values: value}` only when they get rendered, hence cost nothing
+    as long as nobody scrapes `/metrics`.
+    """
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple, float]]] = None, registry: Registry = registry):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}  # type: Dict[Tuple, float]
+        self._lock = threading.Lock()
+        if registry:
+            registry.register(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects the labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[Tuple[str, Tuple, float]]:
+        values = self.callback() if self.callback else dict(self._values)
+        for labelvalues, value in values.items():
+            yield '', labelvalues if isinstance(labelvalues, tuple) else (labelvalues,), value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {_escape(self.documentation)}',
+                 f'# TYPE {self.name} {self.kind}']
+        for suffix, labelvalues, value in self.samples():
+            labelnames = self.labelnames + (('le',) if suffix == '_bucket' else ())
+            lines.append(f'{self.name}{suffix}{_format_labels(labelnames, labelvalues)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._counts = {}  # type: Dict[Tuple, List[int]]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[idx] += 1
+                    break
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def get(self, **labels) -> float:
+        """ Number of observations """
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self) -> Iterable[Tuple[str, Tuple, float]]:
+        with self._lock:
+            counts = {key: list(bucket_counts) for key, bucket_counts in self._counts.items()}
+            sums = dict(self._values)
+        for key, bucket_counts in counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, bucket_counts):
+                cumulative += count
+                yield '_bucket', key + (_format_value(bound),), cumulative
+            yield '_sum', key, sums[key]
+            yield '_count', key, cumulative
+
+
+operation_latency = Histogram('jinad_operation_duration_seconds',
+                              'Time taken by create / delete operations of the stores',
+                              labelnames=('store', 'operation'))
+operation_failures = Counter('jinad_operation_failures_total',
+                             'Failed create / delete operations of the stores by exception type',
+                             labelnames=('store', 'operation', 'exception'))
+event_loop_lag = Histogram('jinad_event_loop_lag_seconds',
+                           'Delay of the event loop in running a callback scheduled on time',
+                           buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+
+
+def track(operation: str):
+    """ Records the latency & failures of a store method, labelled by the class name of the store """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            start_time = time.perf_counter()
+            store = type(self).__name__
+            try:
+                return func(self, *args, **kwargs)
+            except Exception as e:
+                operation_failures.inc(store=store, operation=operation, exception=type(e).__name__)
+                raise
+            finally:
+                operation_latency.observe(time.perf_counter() - start_time, store=store, operation=operation)
+
+        return wrapper
+
+    return decorator
+
+
+class LoopLagMonitor:
+    """ Measures how late the event loop runs a sleep of `LOOP_LAG_INTERVAL` secs """
+
+    def __init__(self):
+        self._task = None  # type: Optional[asyncio.Task]
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._monitor())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    @staticmethod
+    async def _monitor():
+        loop = asyncio.get_event_loop()
+        while True:
+            start_time = loop.time()
+            await asyncio.sleep(metrics_config.LOOP_LAG_INTERVAL)
+            event_loop_lag.observe(max(loop.time() - start_time - metrics_config.LOOP_LAG_INTERVAL, 0))
+
+
+loop_lag_monitor = LoopLagMonitor()
+
+
+_current_trace = ContextVar('trace', default=None)
+_trace_file_lock = threading.Lock()
+
+
+class Trace:
+    """ Named stages of a create / delete request, sent as `Server-Timing` & written as spans to `TRACE_PATH` """
+
+    def __init__(self, name: str, trace_id: Optional[str] = None):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.start_time = time.time()
+        self.spans = []  # type: List[Dict]
+
+    def add(self, stage: str, start_time: float, duration: float):
+        self.spans.append({'stage': stage, 'start': start_time, 'duration': duration})
+
+    def stages(self) -> Dict[str, float]:
+        """ Duration of every stage in secs, repeated stages get summed up """
+        stages = {}
+        for span in self.spans:
+            stages[span['stage']] = stages.get(span['stage'], 0.0) + span['duration']
+        return stages
+
+    def server_timing(self) -> str:
+        stages = {**self.stages(), 'total': time.time() - self.start_time}
+        return ', '.join(f'{stage};dur={duration * 1000:.1f}' for stage, duration in stages.items())
+
+    @contextmanager
+    def activate(self):
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def dump(self):
+        """ Appends the spans to the trace file as json lines, the whole trace is the `total` span """
+        if not metrics_config.TRACE_PATH:
+            return
+        spans = [*self.spans, {'stage': 'total', 'start': self.start_time, 'duration': time.time() - self.start_time}]
+        content = ''.join(json.dumps({'trace_id': self.trace_id, 'name': self.name, **span}) + '\n'
+                          for span in spans)
+        try:
+            os.makedirs(os.path.dirname(metrics_config.TRACE_PATH) or '.', exist_ok=True)
+            with _trace_file_lock, open(metrics_config.TRACE_PATH, 'a') as fp:
+                fp.write(content)
+        except OSError:
+            pass
+
+
+@contextmanager
+def stage(name: str):
+    """ Records the time spent in the block as stage `name` of the current trace, no-op outside of a trace """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start_time = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage=name, start_time=start_time, duration=time.perf_counter() - start)
+
+
+def current_stages() -> Dict[str, float]:
+    trace = _current_trace.get()
+    return trace.stages() if trace else {}
+
+
+class ServerTimingMiddleware:
+    """ Traces every `PUT` & `DELETE` request & sends its stages in the `Server-Timing` header """
+    methods = ('PUT', 'DELETE')
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['method'] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(name=f'{scope["method"]} {scope["path"]}')
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                MutableHeaders(scope=message).append('Server-Timing', trace.server_timing())
+            await send(message)
+
+        with trace.activate():
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                trace.dump()
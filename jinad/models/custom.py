@@ -1,9 +1,15 @@
-import requests
+import os
+import json
 import argparse
-from typing import Union
+import importlib
+from enum import Enum
+from typing import Dict, List, Union
+
+import requests
 from pydantic import create_model, validator, Field
 
 JINA_API_URL = 'https://api.jina.ai/latest'
+BUILTIN_TYPES = {'int': int, 'str': str, 'bool': bool, 'float': float, 'dict': dict, 'list': list}
 
 
 def get_latest_api():
@@ -33,50 +39,153 @@ def generate_validator(field: str, choices: list):
     return validator(field, allow_reuse=True)(validate_arg_choices)
 
 
-def get_pydantic_fields(config: Union[dict, argparse.ArgumentParser]):
-    all_options = {}
-    choices_validators = {}
+def get_field_specs(config: Union[dict, argparse.ArgumentParser]) -> List[Dict]:
+    """ Converts jina cli args (from the api or a local parser) to json serializable field specs """
+    specs = []
 
     if isinstance(config, dict):
         for arg in config['options']:
-            arg_key = arg['name']
             arg_type = arg['type']
-            if arg['choices']:
-                choices_validators[f'validator_for_{arg_key}'] = generate_validator(field=arg_key,
-                                                                                    choices=arg['choices'])
             if arg_type == 'method':
-                arg_type = type(arg['default']) if arg['default'] else int
+                arg_type = type(arg['default']).__name__ if arg['default'] else 'int'
             arg_type = 'str' if arg_type == 'FileType' else arg_type
-
-            current_field = Field(default=arg['default'],
-                                  example=arg['default'],
-                                  description=arg['help'])
-            all_options[arg_key] = (arg_type, current_field)
+            specs.append({'name': arg['name'],
+                          'type': arg_type,
+                          'default': arg['default'],
+                          'help': arg['help'],
+                          'choices': arg['choices']})
 
     # TODO(Deepankar): possible refactoring to `jina.api_to_dict()`
     if isinstance(config, argparse.ArgumentParser):
         # Ignoring first 3 as they're generic args
         from jina.parsers.helper import KVAppendAction
         for arg in config._actions[3:]:
-            arg_key = arg.dest
             arg_type = arg.type
-            if arg.choices:
-                choices_validators[f'validator_for_{arg_key}'] = generate_validator(field=arg_key,
-                                                                                    choices=arg.choices)
             # This is to handle the Enum args (to check if it is a bound method)
             if hasattr(arg_type, '__self__'):
                 arg_type = type(arg.default) if arg.default else int
             arg_type = str if isinstance(arg_type, argparse.FileType) else arg_type
             arg_type = dict if type(arg) == KVAppendAction else arg_type
+            specs.append({'name': arg.dest,
+                          'type': _type_to_str(arg_type),
+                          'default': arg.default,
+                          'help': arg.help,
+                          'choices': list(arg.choices) if arg.choices else None})
+
+    return specs
+
 
-            current_field = Field(default=arg.default,
-                                  example=arg.default,
-                                  description=arg.help)
-            all_options[arg_key] = (arg_type, current_field)
+def get_pydantic_fields(specs: List[Dict]):
+    all_options = {}
+    choices_validators = {}
+
+    for spec in specs:
+        arg_key = spec['name']
+        if spec['choices']:
+            choices_validators[f'validator_for_{arg_key}'] = generate_validator(field=arg_key,
+                                                                                choices=spec['choices'])
+        current_field = Field(default=spec['default'],
+                              example=spec['default'],
+                              description=spec['help'])
+        all_options[arg_key] = (_str_to_type(spec['type']), current_field)
 
     return all_options, choices_validators
 
 
+def _type_to_str(arg_type) -> Union[str, None]:
+    if arg_type is None or isinstance(arg_type, str):
+        return arg_type
+    if arg_type.__module__ == 'builtins':
+        return arg_type.__name__
+    return f'{arg_type.__module__}.{arg_type.__qualname__}'
+
+
+def _str_to_type(arg_type: Union[str, None]):
+    if arg_type in BUILTIN_TYPES:
+        return BUILTIN_TYPES[arg_type]
+    if arg_type and '.' in arg_type:
+        module, name = arg_type.rsplit('.', 1)
+        return getattr(importlib.import_module(module), name)
+    return arg_type
+
+
+def _encode_enum(value):
+    # IntEnum is an int for `json`, hence Enums need to be encoded before dumping
+    if isinstance(value, Enum):
+        return {'__enum__': _type_to_str(type(value)), 'name': value.name}
+    if isinstance(value, dict):
+        return {k: _encode_enum(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_enum(v) for v in value]
+    return value
+
+
+def _decode_enum(value: Dict):
+    if '__enum__' in value:
+        return _str_to_type(value['__enum__'])[value['name']]
+    return value
+
+
+def load_field_specs(kind: str, module: str) -> List[Dict]:
+    """ Loads field specs from the on-disk cache keyed by jina version, builds & caches them on a miss """
+    from jina import __version__ as jina_version
+    from jinad.config import model_config
+    from jinad.parsers import get_parser
+
+    cache_path = os.path.expanduser(model_config.CACHE_PATH % jina_version)
+    cache_key = f'{kind}.{module}'
+    cached_specs = {}
+    if model_config.CACHE and os.path.isfile(cache_path):
+        try:
+            with open(cache_path) as fp:
+                cached_specs = json.load(fp, object_hook=_decode_enum)
+        except Exception:
+            # a corrupt or outdated cache is rebuilt below
+            cached_specs = {}
+
+    if cache_key in cached_specs:
+        specs = cached_specs[cache_key]
+    else:
+        specs = _build_field_specs(kind=kind, module=module)
+        if model_config.CACHE:
+            cached_specs[cache_key] = specs
+            _dump_field_specs(cache_path=cache_path, cached_specs=cached_specs)
+
+    if kind == 'local':
+        # random ports & identities are never shared across processes, they come from this process' parser
+        parser = get_parser(module)
+        for spec in specs:
+            if spec.get('volatile'):
+                spec['default'] = parser.get_default(spec['name'])
+    return specs
+
+
+def _build_field_specs(kind: str, module: str) -> List[Dict]:
+    if kind == 'api':
+        return get_field_specs(config=get_module_args(all_args=get_latest_api(),
+                                                      module=module))
+
+    from jinad.parsers import get_parser
+    specs = get_field_specs(config=get_parser(module))
+    # defaults which differ b/w 2 parsers (random ports, identities) are marked volatile
+    other_parser = get_parser.__wrapped__(module)
+    for spec in specs:
+        spec['volatile'] = spec['default'] != other_parser.get_default(spec['name'])
+    return specs
+
+
+def _dump_field_specs(cache_path: str, cached_specs: Dict):
+    try:
+        content = json.dumps(_encode_enum(cached_specs))
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # write to a temp file first, multiple jinad processes might share the cache
+        with open(f'{cache_path}.{os.getpid()}', 'w') as fp:
+            fp.write(content)
+        os.replace(f'{cache_path}.{os.getpid()}', cache_path)
+    except (OSError, TypeError):
+        pass
+
+
 class PydanticConfig:
     arbitrary_types_allowed = True
 
@@ -84,23 +193,8 @@ class PydanticConfig:
 def build_pydantic_model(kind: str = 'local',
                          model_name: str = 'CustomModel',
                          module: str = 'pod'):
-    if kind == 'api':
-        all_cli_args = get_latest_api()
-        module_args = get_module_args(all_args=all_cli_args,
-                                      module=module)
-        all_fields, field_validators = get_pydantic_fields(config=module_args)
-
-    elif kind == 'local':
-        from jina.parsers import set_pea_parser, set_pod_parser
-        from jina.parsers.flow import set_flow_parser
-        if module == 'pod':
-            parser = set_pod_parser()
-        elif module == 'pea':
-            parser = set_pea_parser()
-        elif module == 'flow':
-            parser = set_flow_parser()
-        all_fields, field_validators = get_pydantic_fields(config=parser)
-
+    all_fields, field_validators = get_pydantic_fields(specs=load_field_specs(kind=kind,
+                                                                              module=module))
     return create_model(model_name,
                         **all_fields,
                         __config__=PydanticConfig,
@@ -0,0 +1,18 @@
+import argparse
+from functools import lru_cache
+
+from jina import __version__ as jina_version
+
+
+@lru_cache()
+def get_parser(kind: str, version: str = jina_version) -> argparse.ArgumentParser:
+    """ Builds the jina parser for `flow`, `pod` or `pea` once per process & jina version """
+    from jina.parsers import set_pea_parser, set_pod_parser
+    from jina.parsers.flow import set_flow_parser
+    if kind == 'pod':
+        return set_pod_parser()
+    elif kind == 'pea':
+        return set_pea_parser()
+    elif kind == 'flow':
+        return set_flow_parser()
+    raise ValueError(f'No parser for {kind}, valid choices are flow, pod & pea')
@@ -0,0 +1,152 @@
+import os
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from fastapi import UploadFile
+from jina.helper import colored, get_random_identity
+from jina.logging import JinaLogger
+
+from jinad.config import store_config
+from jinad.helper import get_spec_hash
+from jinad.artifacts import artifact_store
+from jinad.metrics import Counter, Gauge
+from jinad.store import InMemoryFlowStore, flow_store
+
+
+class FlowPool:
+    """ Warm pool keeping Flows of every registered template started & idle
+
+    Templates are keyed by the hash of their yaml spec & files (see `get_spec_hash`). A Flow created with the
+    same spec gets handed out from the pool, which then gets refilled in the background by a worker of its own,
+    hence refills never hold back the creation of Flows by the workers of the Flow store.
+    """
+    logger = JinaLogger(context='🏊 POOL')
+
+    def __init__(self, store: InMemoryFlowStore):
+        self.store = store
+        self._templates = {}  # type: Dict[str, Dict]
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pool-fill')
+
+    @property
+    def registered(self) -> bool:
+        return bool(self._templates)
+
+    def register(self, config: str, files: List[UploadFile], size: int) -> str:
+        """ Stores the files of the template & starts filling its pool, re-registering only changes the size
+
+        This blocks while storing the files, use it in a threadpool from the event loop.
+        """
+        size = min(size, store_config.POOL_MAX_SIZE)
+        owner = f'pool-{uuid.uuid4().hex}'
+        digests = {os.path.basename(current_file.filename): artifact_store.put(current_file=current_file,
+                                                                               owner=owner)
+                   for current_file in files}
+        key = get_spec_hash(config=config, digests=digests)
+        with self._lock:
+            template = self._templates.get(key)
+            if template:
+                template['size'] = size
+            else:
+                self._templates[key] = {'config': config, 'digests': digests, 'owner': owner,
+                                        'size': size, 'idle': deque(), 'filling': False}
+        if template:
+            artifact_store.release(owner=owner)
+        self.logger.info(f'Registered template {colored(key, "cyan")} with {size} Flows')
+        self._refill(key)
+        return key
+
+    def unregister(self, key: str):
+        """ Closes the idle Flows of the template & releases its files, Flows handed out keep running """
+        with self._lock:
+            template = self._templates.pop(key)
+            idle = list(template['idle'])
+            template['idle'].clear()
+        for flow_id in idle:
+            try:
+                self.store._delete(flow_id=flow_id)
+            except KeyError:
+                pass
+        artifact_store.release(owner=template['owner'])
+        self.logger.info(f'Unregistered template {colored(key, "cyan")}')
+
+    def templates(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {key: {'size': template['size'],
+                          'idle': len(template['idle']),
+                          'filling': template['filling'],
+                          'files': list(template['digests'])}
+                    for key, template in self._templates.items()}
+
+    def acquire(self, key: str) -> Optional[uuid.UUID]:
+        """ Hands out an idle Flow of the template with the spec hash `key`, `None` if there is none """
+        if not self.registered:
+            return None
+        flow_id = None
+        with self._lock:
+            template = self._templates.get(key)
+            while template and template['idle'] and flow_id is None:
+                flow_id = template['idle'].popleft()
+                # idle Flows might have been deleted via their flow_id
+                if flow_id not in self.store._store:
+                    flow_id = None
+
+        pool_requests.inc(result='hit' if flow_id else 'miss')
+        if template:
+            self._refill(key)
+        if flow_id:
+            # idle Flows aren't recorded in the backend, they'd be recovered outside of the pool
+            self.store._persist(flow_id)
+            flow = self.store._store[flow_id]['flow']
+            self.store._set_status(flow_id=flow_id, status='started', host=flow.host, port=flow.port_expose,
+                                   template=key)
+            self.logger.info(f'Handed out flow_id {colored(flow_id, "cyan")} of template {key}')
+        return flow_id
+
+    def _refill(self, key: str):
+        with self._lock:
+            template = self._templates.get(key)
+            if not template or template['filling']:
+                return
+            template['filling'] = True
+        self._executor.submit(self._fill, key=key, template=template)
+
+    def _fill(self, key: str, template: Dict):
+        """ Runs in the worker of the pool, starts idle Flows one by one till the pool is full
+
+        Flows of a template aren't started concurrently, loading the same executors in parallel threads isn't safe.
+        """
+        while True:
+            with self._lock:
+                if self._templates.get(key) is not template or len(template['idle']) >= template['size']:
+                    template['filling'] = False
+                    return
+            try:
+                flow_id, _, _ = self.store._create(config=template['config'],
+                                                   digests=template['digests'],
+                                                   flow_id=uuid.UUID(get_random_identity()),
+                                                   persist=False)
+            except Exception as e:
+                self.logger.error(f'Got error while starting a Flow of template {key}: {repr(e)}')
+                with self._lock:
+                    template['filling'] = False
+                return
+
+            with self._lock:
+                registered = self._templates.get(key) is template
+                if registered:
+                    template['idle'].append(flow_id)
+            if not registered:
+                self.store._delete(flow_id=flow_id)
+
+
+flow_pool = FlowPool(store=flow_store)
+
+pool_requests = Counter('jinad_pool_requests_total',
+                        'Flows asked from the warm pool by result i.e. hit or miss',
+                        labelnames=('result',))
+Gauge('jinad_pool_idle_flows', 'Idle Flows in the warm pool per template', labelnames=('template',),
+      callback=lambda: {key: template['idle'] for key, template in flow_pool.templates().items()})
@@ -0,0 +1,74 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+import grpc
+from jina.logging import JinaLogger
+
+from jinad.config import ping_config
+
+#: standard gRPC health check, gateways not implementing it still answer with `UNIMPLEMENTED`
+HEALTH_CHECK_METHOD = '/grpc.health.v1.Health/Check'
+#: status codes meaning the gateway is up & answered the call
+READY_CODES = (grpc.StatusCode.OK, grpc.StatusCode.UNIMPLEMENTED)
+
+
+class GatewayProbe:
+    """ Checks whether the gRPC gateway of a Flow is up, without sending any request through the Flow
+
+    A health check call gets sent over a long-lived channel per `host:port`, at most `PING_MAX_CHANNELS` of them
+    are kept open. Results are cached for `PING_TTL` secs, hence polling `/ping` costs a round trip per TTL.
+    """
+    logger = JinaLogger(context='📡 PROBE')
+
+    def __init__(self):
+        self._channels = OrderedDict()  # type: OrderedDict[tuple, grpc.Channel]
+        self._results = {}  # type: Dict[tuple, Dict]
+        self._lock = threading.Lock()
+
+    def _channel(self, host: str, port: int) -> grpc.Channel:
+        with self._lock:
+            channel = self._channels.pop((host, port), None) or grpc.insecure_channel(f'{host}:{port}')
+            self._channels[(host, port)] = channel
+            while len(self._channels) > ping_config.PING_MAX_CHANNELS:
+                address, evicted = self._channels.popitem(last=False)
+                self._results.pop(address, None)
+                evicted.close()
+        return channel
+
+    def probe(self, host: str, port: int) -> Dict:
+        """ Returns `connected`, the round trip `latency` in secs & whether the result is `cached`
+
+        This blocks till the gateway answers or `PING_TIMEOUT` secs passed, use it in a threadpool from the
+        event loop.
+        """
+        result = self._results.get((host, port))
+        if result and time.monotonic() - result['checked'] < ping_config.PING_TTL:
+            return {'connected': result['connected'], 'latency': result['latency'], 'cached': True}
+
+        health_check = self._channel(host, port).unary_unary(HEALTH_CHECK_METHOD,
+                                                              request_serializer=lambda request: request,
+                                                              response_deserializer=lambda response: response)
+        start = time.perf_counter()
+        try:
+            health_check(b'', timeout=ping_config.PING_TIMEOUT)
+            code = grpc.StatusCode.OK
+        except grpc.RpcError as e:
+            code = e.code()
+        latency = time.perf_counter() - start
+        connected = code in READY_CODES
+        if not connected:
+            self.logger.debug(f'Gateway {host}:{port} not ready: {code}')
+        self._results[(host, port)] = {'connected': connected, 'latency': latency, 'checked': time.monotonic()}
+        return {'connected': connected, 'latency': latency, 'cached': False}
+
+    def close(self):
+        with self._lock:
+            for channel in self._channels.values():
+                channel.close()
+            self._channels.clear()
+            self._results.clear()
+
+
+gateway_probe = GatewayProbe()
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import grpc
+from fastapi.concurrency import run_in_threadpool
+from jina.clients import request as request_generators
+from jina.enums import RequestType
+from jina.logging import JinaLogger
+from jina.proto import jina_pb2, jina_pb2_grpc
+
+from jinad.config import proxy_config
+
+BatchKey = Tuple[str, int, str, Optional[int]]
+
+
+class ProxyException(Exception):
+    """ Exception if the gateway of a Flow is not reachable or fails the request """
+
+
+class FlowProxy:
+    """ Forwards search / index requests to the gateway of a Flow
+
+    Requests get sent over a long-lived gRPC channel per `host:port`, at most `PROXY_MAX_CHANNELS` of them are
+    kept open besides the ones evicted while still in use. Requests for the same gateway, mode & `top_k` arriving
+    within `PROXY_BATCH_LATENCY` secs of the first one get sent as a single request, whose docs are split back in
+    order once the gateway answers.
+    """
+    logger = JinaLogger(context='🔀 PROXY')
+
+    def __init__(self):
+        self._channels = OrderedDict()  # type: OrderedDict[Tuple[str, int], Dict]
+        self._lock = threading.Lock()
+        self._batches = {}  # type: Dict[BatchKey, Dict]
+
+    @contextmanager
+    def _channel(self, host: str, port: int) -> Iterator[grpc.Channel]:
+        """ Borrows the channel of the gateway for a call, evicted channels get closed once their last call is over """
+        with self._lock:
+            entry = self._channels.pop((host, port), None) or \
+                {'channel': grpc.insecure_channel(f'{host}:{port}'), 'calls': 0, 'evicted': False}
+            entry['calls'] += 1
+            self._channels[(host, port)] = entry
+            while len(self._channels) > proxy_config.PROXY_MAX_CHANNELS:
+                _, evicted = self._channels.popitem(last=False)
+                evicted['evicted'] = True
+                if not evicted['calls']:
+                    evicted['channel'].close()
+        try:
+            yield entry['channel']
+        finally:
+            with self._lock:
+                entry['calls'] -= 1
+                if entry['evicted'] and not entry['calls']:
+                    entry['channel'].close()
+
+    def _call(self, host: str, port: int, mode: str, docs: List['jina_pb2.DocumentProto'],
+              top_k: Optional[int]) -> List['jina_pb2.DocumentProto']:
+        """ Sends the docs as one request & returns the docs of the response, blocks till the gateway answers """
+        request = next(getattr(request_generators, mode)(data=docs, batch_size=len(docs),
+                                                          mode=RequestType.from_string(mode), top_k=top_k), None)
+        if request is None:
+            raise ProxyException(f'could not build a {mode} request from {len(docs)} docs')
+        try:
+            with self._channel(host, port) as channel:
+                response, = jina_pb2_grpc.JinaRPCStub(channel).Call(iter([request]),
+                                                                    timeout=proxy_config.PROXY_TIMEOUT)
+        except grpc.RpcError as e:
+            raise ProxyException(f'gateway {host}:{port} failed the request: {e.code()}') from e
+        response = response.as_pb_object
+        if response.status.code == jina_pb2.StatusProto.ERROR:
+            raise ProxyException(f'Flow failed the request: {response.status.description}')
+        response_docs = getattr(response, mode).docs
+        if len(response_docs) != len(docs):
+            raise ProxyException(f'sent {len(docs)} docs, gateway {host}:{port} answered {len(response_docs)}')
+        return list(response_docs)
+
+    async def send(self, host: str, port: int, mode: str, docs: List['jina_pb2.DocumentProto'],
+                   top_k: Optional[int] = None) -> List['jina_pb2.DocumentProto']:
+        """ Sends the docs in `mode` (`search` or `index`) to the gateway & returns the docs of its response """
+        if proxy_config.PROXY_BATCH_LATENCY <= 0 or len(docs) >= proxy_config.PROXY_BATCH_SIZE:
+            return await run_in_threadpool(self._call, host, port, mode, docs, top_k)
+
+        loop = asyncio.get_event_loop()
+        key = (host, port, mode, top_k)
+        batch = self._batches.get(key)
+        if batch and len(batch['docs']) + len(docs) > proxy_config.PROXY_BATCH_SIZE:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = self._batches[key] = {
+                'docs': [], 'waiters': [],
+                'timer': loop.call_later(proxy_config.PROXY_BATCH_LATENCY, self._flush, key)
+            }
+        future = loop.create_future()
+        batch['docs'].extend(docs)
+        batch['waiters'].append((len(docs), future))
+        if len(batch['docs']) >= proxy_config.PROXY_BATCH_SIZE:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key: BatchKey):
+        batch = self._batches.pop(key, None)
+        if batch:
+            batch['timer'].cancel()
+            asyncio.ensure_future(self._send_batch(key, batch))
+
+    async def _send_batch(self, key: BatchKey, batch: Dict):
+        host, port, mode, top_k = key
+        try:
+            docs = await run_in_threadpool(self._call, host, port, mode, batch['docs'], top_k)
+        except Exception as e:
+            self.logger.error(f'Got error while sending {len(batch["waiters"])} requests: {repr(e)}')
+            for _, future in batch['waiters']:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        offset = 0
+        for count, future in batch['waiters']:
+            if not future.done():
+                future.set_result(docs[offset:offset + count])
+            offset += count
+
+    def close(self):
+        with self._lock:
+            for entry in self._channels.values():
+                entry['channel'].close()
+            self._channels.clear()
+
+
+flow_proxy = FlowProxy()
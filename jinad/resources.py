@@ -0,0 +1,154 @@
+import os
+import time
+import uuid
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from jina.logging import JinaLogger
+
+from jinad.config import resource_config
+from jinad.metrics import Gauge
+from jinad.store import InMemoryStore, flow_store, pod_store, pea_store
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+#: resources summed up over the processes of an entity, `cpu_percent` can exceed 100 on multiple cores
+RESOURCES = ('cpu_percent', 'rss', 'threads', 'fds')
+
+
+def read_process(pid: int, start_time: Optional[int]) -> Optional[Dict]:
+    """ CPU ticks, RSS in bytes, number of threads & open fds of a process from `/proc`
+
+    `None` if the process is gone or its pid got reused, `fds` is `None` if they can't be listed.
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as fp:
+            stat = fp.read()
+        with open(f'/proc/{pid}/status') as fp:
+            status = dict(line.split(':', 1) for line in fp.read().splitlines() if ':' in line)
+    except OSError:
+        return None
+    # the name of the process is in parentheses & might contain spaces, utime, stime & starttime are
+    # the 14th, 15th & 22nd fields
+    fields = stat[stat.rindex(')') + 2:].split()
+    if fields[0] == 'Z' or (start_time is not None and int(fields[19]) != start_time):
+        return None
+    try:
+        fds = len(os.listdir(f'/proc/{pid}/fd'))
+    except OSError:
+        fds = None
+    return {
+        'ticks': int(fields[11]) + int(fields[12]),
+        'rss': int(status.get('VmRSS', '0 kB').split()[0]) * 1024,
+        'threads': int(status.get('Threads', fields[17])),
+        'fds': fds
+    }
+
+
+class ResourceSampler:
+    """ Samples CPU%, RSS, threads & open fds of the processes of every Flow / Pod / Pea
+
+    Processes are the recorded `[pid, start time]` of the Peas, also of the ones owned by other workers, sampled
+    every `RESOURCE_INTERVAL` secs. CPU% is the share of a core used since the previous sample of the process.
+    """
+    logger = JinaLogger(context='📊 RESOURCES')
+
+    def __init__(self):
+        self._stores = {store._kind: store for store in (flow_store, pod_store, pea_store)}
+        self._ticks = {}  # type: Dict[Tuple[int, int], Tuple[int, float]]
+        self._samples = {}  # type: Dict[Tuple[str, uuid.UUID], Dict]
+        self._task = None  # type: Optional[asyncio.Task]
+        self._lock = threading.Lock()
+
+    def start(self):
+        if resource_config.RESOURCE_INTERVAL > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.sample_all)
+            except Exception as e:
+                self.logger.error(f'Got error while sampling resources: {repr(e)}')
+            await asyncio.sleep(resource_config.RESOURCE_INTERVAL)
+
+    def _sample_process(self, pid: int, start_time: Optional[int], now: float) -> Dict:
+        usage = read_process(pid, start_time)
+        if usage is None:
+            self._ticks.pop((pid, start_time), None)
+            return {'pid': pid, 'alive': False}
+        previous = self._ticks.get((pid, start_time))
+        self._ticks[(pid, start_time)] = (usage['ticks'], now)
+        cpu_percent = None
+        if previous and now > previous[1]:
+            cpu_percent = (usage['ticks'] - previous[0]) / CLOCK_TICKS / (now - previous[1]) * 100
+        return {'pid': pid, 'alive': True, 'cpu_percent': cpu_percent,
+                'rss': usage['rss'], 'threads': usage['threads'], 'fds': usage['fds']}
+
+    def sample(self, pids: List[List[int]]) -> Dict:
+        """ Samples the processes of an entity, returns them along with their `total` """
+        now = time.monotonic()
+        processes = [self._sample_process(pid, start_time, now) for pid, start_time in pids if pid]
+        alive = [p for p in processes if p['alive']]
+        total = {resource: sum(p[resource] for p in alive if p[resource] is not None) for resource in RESOURCES}
+        if any(p['cpu_percent'] is None for p in alive):
+            total['cpu_percent'] = None
+        return {'processes': processes, 'total': total, 'sampled_at': time.time()}
+
+    def _pids(self, store: InMemoryStore) -> Dict[uuid.UUID, List[List[int]]]:
+        pids = {entity_id: entry['record']['pids']
+                for entity_id, entry in list(store._store.items()) if 'record' in entry}
+        if store._shared:
+            for entity_id, record in store._backend.load(kind=store._kind).items():
+                pids.setdefault(uuid.UUID(entity_id), record['pids'])
+        return pids
+
+    def sample_all(self):
+        """ Samples every entity, forgets the ones that are gone """
+        samples, processes = {}, set()
+        with self._lock:
+            for kind, store in self._stores.items():
+                for entity_id, pids in self._pids(store).items():
+                    samples[(kind, entity_id)] = self.sample(pids)
+                    processes.update((pid, start_time) for pid, start_time in pids)
+            for key in set(self._ticks) - processes:
+                self._ticks.pop(key)
+        self._samples = samples
+
+    def get(self, kind: str, entity_id: uuid.UUID) -> Dict:
+        """ Latest sample of the entity, sampled right away if there is none yet
+
+        Raises `KeyError` if no Flow / Pod / Pea of this worker or of the store backend has the id.
+        """
+        store = self._stores[kind]
+        entry = store._store.get(entity_id)
+        # contexts still being started have no record & no processes yet
+        record = entry.get('record', {'pids': []}) if entry else store._lookup(entity_id)
+        if record is None:
+            raise KeyError(f'{kind} {entity_id} not found')
+        if (kind, entity_id) in self._samples:
+            return self._samples[(kind, entity_id)]
+        with self._lock:
+            return self.sample(record['pids'])
+
+    def metrics(self, resource: str) -> Dict[Tuple, float]:
+        return {(kind, str(entity_id)): sample['total'][resource]
+                for (kind, entity_id), sample in list(self._samples.items())
+                if sample['total'][resource] is not None}
+
+
+resource_sampler = ResourceSampler()
+Gauge('jinad_resource_cpu_percent', 'CPU% used by the processes of every Flow / Pod / Pea',
+      labelnames=('kind', 'id'), callback=lambda: resource_sampler.metrics('cpu_percent'))
+Gauge('jinad_resource_rss_bytes', 'Resident memory of the processes of every Flow / Pod / Pea',
+      labelnames=('kind', 'id'), callback=lambda: resource_sampler.metrics('rss'))
+Gauge('jinad_resource_threads', 'Threads of the processes of every Flow / Pod / Pea',
+      labelnames=('kind', 'id'), callback=lambda: resource_sampler.metrics('threads'))
+Gauge('jinad_resource_open_fds', 'Open file descriptors of the processes of every Flow / Pod / Pea',
+      labelnames=('kind', 'id'), callback=lambda: resource_sampler.metrics('fds'))
@@ -1,25 +1,45 @@
+import os
+import time
 import uuid
-from contextlib import contextmanager
+import threading
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor
 from tempfile import SpooledTemporaryFile
-from typing import List, Dict, Union
+from typing import Callable, List, Dict, Optional, Tuple, Union
 from argparse import Namespace
 
 from fastapi import UploadFile
 from jina import __default_host__
 from jina.flow import Flow
+from jina.enums import FlowBuildLevel
 from jina.jaml import JAML
 from jina.helper import colored, get_random_identity
 from jina.logging import JinaLogger
 from jina.peapods import Pea, Pod
 
 from jinad.models import SinglePodModel
-from jinad.helper import create_meta_files_from_upload, delete_meta_files_from_upload
+from jinad.config import server_config, store_config
+from jinad.helper import delete_meta_files_from_upload, get_pod_levels, get_upload_files, handle_workspace_files
+from jinad.artifacts import artifact_store
+from jinad.cache import result_cache
+from jinad.backend import AttachedContext, get_backend, get_process_start_time, get_worker, is_alive
+from jinad.metrics import Gauge, Trace, stage, track
 from jinad.excepts import FlowYamlParseException, FlowCreationException, \
     FlowStartException, PodStartException, PeaStartException, FlowBadInputException
 
+# jina rebuilds the class of every Pea it builds & `super()` in `BasePea` resolves to the last one built
+_pea_build_lock = threading.Lock()
+
 
 class InMemoryStore:
     _store = {}
+    #: key of the context in the entries of `_store` & kind of the records in the backend
+    _kind = None
+    _backend = get_backend()
+    #: with multiple API workers, contexts owned by other workers are looked up in the backend
+    _shared = server_config.WORKERS > 1
+    _executor = ThreadPoolExecutor(max_workers=store_config.MAX_WORKERS,
+                                   thread_name_prefix='recover')
     # TODO(Deepankar): Implement fastapi based oauth/bearer security here
     # https://github.com/jina-ai/jinad/issues/4
     credentials = 'foo:bar'
@@ -51,64 +71,487 @@ class InMemoryStore:
         raise NotImplementedError
 
     def _start(self, context):
+        """ Starts the context, stores starting contexts concurrently build their Peas via `_start_pea` """
         return context.start()
 
     def _close(self, context):
         context.close()
 
-    def _delete(self, id: uuid.UUID):
+    def _close_before(self, entity_id: uuid.UUID, entry: Dict, deadline: float):
+        """ Closes the context gracefully till `deadline`, then terminates & kills the processes of its Peas
+
+        The graceful close runs in a daemon thread, it might never return once the processes got killed.
+        """
+        errors = []
+
+        def _close():
+            try:
+                self._close(context=entry[self._kind])
+            except Exception as e:
+                errors.append(e)
+
+        closer = threading.Thread(target=_close, name=f'{self._kind}-close', daemon=True)
+        closer.start()
+        closer.join(timeout=max(deadline - time.time(), 0))
+        if closer.is_alive():
+            self.logger.warning(f'{self._kind} {entity_id} didn\'t close in time, terminating its processes')
+            context = AttachedContext(entry.get('record') or {'pids': []})
+            if not all(pid for pid, _ in context.pids):
+                self.logger.warning(f'{self._kind} {entity_id} has Peas running in threads, they keep running')
+            context.close(timeout=store_config.KILL_TIMEOUT)
+        elif errors:
+            raise errors[0]
+
+    @staticmethod
+    def _start_pea(pea_args: Namespace) -> Tuple[Pea, float, float]:
+        """ Builds & starts a Pea, safe to be called from several threads to start Peas concurrently
+
+        No Pea gets built till the one built before got its process / thread running, waiting for it to be
+        ready happens outside of the lock. Returns the Pea along with the start & end time.
+        """
+        start_time = time.time()
+        starter = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pea-starter')
+        try:
+            with _pea_build_lock:
+                pea = Pea(pea_args)
+                future = starter.submit(pea.start)
+                while not (future.done() or pea.is_alive()):
+                    time.sleep(0.005)
+            future.result()
+        finally:
+            starter.shutdown(wait=False)
+        return pea, start_time, time.time()
+
+    def _delete(self, id: uuid.UUID, forget: bool = True, deadline: float = None):
         raise NotImplementedError
 
-    def _delete_all(self):
-        for _id in self._store.copy().keys():
-            self._delete(_id)
+    def _create_many(self, arguments: List) -> List[Dict]:
+        """ Starts the contexts concurrently, each of them gets created like via `_create`
+
+        Returns `{'status': 'started', '<kind>_id': ...}` or `{'status': 'failed', 'detail': ...}` per item, in order.
+        """
+        with ThreadPoolExecutor(max_workers=store_config.MAX_PARALLEL_PEAS,
+                                thread_name_prefix=f'{self._kind}-start') as executor:
+            futures = [executor.submit(self._create, **{f'{self._kind}_arguments': args}) for args in arguments]
+        results = []
+        for future in futures:
+            try:
+                results.append({'status': 'started', f'{self._kind}_id': future.result()})
+            except Exception as e:
+                results.append({'status': 'failed', 'detail': repr(e)})
+        return results
+
+    def _delete_many(self, ids: List[uuid.UUID], forget: bool = True, deadline: float = None,
+                     max_workers: int = store_config.MAX_PARALLEL_PEAS) -> List[Dict]:
+        """ Closes the contexts concurrently, returns `{'status': 'deleted' / 'not_found' / 'failed'}` per id
+
+        All of them get closed gracefully till the same `deadline`, by default `CLOSE_TIMEOUT` secs from now.
+        """
+        deadline = deadline or time.time() + store_config.CLOSE_TIMEOUT
+        with ThreadPoolExecutor(max_workers=max(min(max_workers, len(ids)), 1),
+                                thread_name_prefix=f'{self._kind}-close') as executor:
+            futures = [executor.submit(self._delete, _id, forget, deadline) for _id in ids]
+        results = []
+        for future in futures:
+            try:
+                future.result()
+                results.append({'status': 'deleted'})
+            except KeyError:
+                results.append({'status': 'not_found'})
+            except Exception as e:
+                results.append({'status': 'failed', 'detail': repr(e)})
+        return results
+
+    def _delete_all(self, forget: bool = True):
+        """ Closes all contexts at once within `CLOSE_TIMEOUT` (+ `KILL_TIMEOUT`) secs
+
+        With `forget` unset their records are kept to recover them on the next start.
+        """
+        ids = list(self._store)
+        for _id, result in zip(ids, self._delete_many(ids, forget=forget, max_workers=len(ids))):
+            if result['status'] == 'failed':
+                self.logger.error(f'Got error while closing {self._kind} {_id}: {result["detail"]}')
+
+    def _release_files(self, filenames: List[str]):
+        """ Removes the files uploaded via `/upload` unless another Pod / Pea of the store uses them """
+        in_use = {filename for entry in list(self._store.values()) for filename in entry.get('files', ())}
+        for filename in filenames:
+            if filename not in in_use:
+                delete_meta_files_from_upload(filename=filename)
+
+    def _record(self, entity_id: uuid.UUID, context, persist: bool = True, **kwargs):
+        """ Keeps the spec & pids of a started context, persisted in the backend to recover it after a restart """
+        self._store[entity_id]['record'] = {'pids': self._get_pids(context), 'owner': get_worker(), **kwargs}
+        if persist:
+            self._persist(entity_id)
+
+    def _persist(self, entity_id: uuid.UUID):
+        self._backend.put(kind=self._kind, entity_id=entity_id, record=self._store[entity_id]['record'])
+
+    def _lookup(self, entity_id: uuid.UUID) -> Union[Dict, None]:
+        """ Fetches the record of a context owned by another worker, `None` unless the workers are shared """
+        return self._backend.get(kind=self._kind, entity_id=entity_id) if self._shared else None
+
+    def _reap(self, entity_id: uuid.UUID, record: Dict):
+        """ Terminates the processes of a context whose owner died without closing it & forgets it """
+        AttachedContext(record).close()
+        self._backend.delete(kind=self._kind, entity_id=entity_id)
+        self.logger.info(f'Reaped {self._kind} with {self._kind}_id {colored(entity_id, "cyan")}')
+
+    @staticmethod
+    def _get_pids(context) -> List[List[int]]:
+        """ `[pid, start time]` of the process of every Pea, `[None, None]` for Peas running in threads """
+        if isinstance(context, Flow):
+            peas = [pea for pod in context._pod_nodes.values() for pea in pod.peas]
+        else:
+            peas = getattr(context, 'peas', [context])
+        return [[pea.pid, get_process_start_time(pea.pid)] if getattr(pea, 'pid', None) else [None, None]
+                for pea in peas]
+
+    def _recover(self) -> List[Future]:
+        """ Re-attaches the recorded contexts whose processes are all alive & restarts the others in parallel
+
+        Records owned by another live worker are skipped, the others get claimed by this worker. Processes left
+        over by the contexts to restart get closed by the restarts, once the backend got unlocked.
+        Returns the futures of the restarts.
+        """
+        attached, stale = 0, []
+        worker = get_worker()
+        with self._backend.lock():
+            for entity_id, record in self._backend.load(kind=self._kind).items():
+                entity_id = uuid.UUID(entity_id)
+                owner = record.get('owner')
+                if entity_id in self._store or \
+                        (owner and owner['pid'] != worker['pid'] and is_alive(owner['pid'], owner['start_time'])):
+                    continue
+                record['owner'] = worker
+                self._backend.put(kind=self._kind, entity_id=entity_id, record=record)
+                context = AttachedContext(record)
+                if context.is_alive:
+                    self._attach(entity_id=entity_id, context=context, record=record)
+                    attached += 1
+                else:
+                    stale.append((entity_id, record, context))
+        restarts = [self._executor.submit(self._close_and_restart, entity_id=entity_id, record=record,
+                                          context=context)
+                    for entity_id, record, context in stale]
+        if attached or restarts:
+            self.logger.success(f'Re-attached {attached} & restarting {len(restarts)} {self._kind}s')
+        return restarts
+
+    def _attach(self, entity_id: uuid.UUID, context: AttachedContext, record: Dict):
+        self._store[entity_id] = {self._kind: context, 'record': record}
+
+    def _close_and_restart(self, entity_id: uuid.UUID, record: Dict, context: AttachedContext):
+        # processes left over by a partially dead context would hold its ports
+        context.close()
+        self._restart(entity_id=entity_id, record=record)
+
+    def _restart(self, entity_id: uuid.UUID, record: Dict):
+        try:
+            self._create(**{f'{self._kind}_arguments': record['args']})
+        except Exception:
+            self._backend.delete(kind=self._kind, entity_id=entity_id)
+            raise
 
 
 class InMemoryFlowStore(InMemoryStore):
+    _store = {}
+    _kind = 'flow'
+    _status = {}
+    # Idempotency-Key / spec hash -> flow_id, retried requests get the Flow created by the first one
+    _idempotency_keys = {}
+    _keys_lock = threading.Lock()
+    _executor = ThreadPoolExecutor(max_workers=store_config.MAX_WORKERS,
+                                   thread_name_prefix='flow-create')
+    _delete_executor = ThreadPoolExecutor(max_workers=store_config.MAX_WORKERS,
+                                          thread_name_prefix='flow-delete')
+
+    def _submit(self,
+                config: Union[str, SpooledTemporaryFile, List[SinglePodModel]] = None,
+                files: List[UploadFile] = None,
+                flow_id: uuid.UUID = None) -> uuid.UUID:
+        """ Queues Flow creation in the worker pool & returns the flow_id without waiting for it to start
+
+        The uploaded files get stored in the artifact store right away, which blocks, use it in a threadpool
+        from the event loop. Pass the `flow_id` reserved via `_find_or_reserve`, a new one is used otherwise.
+        """
+        # FastAPI closes the SpooledTemporaryFile & the uploads once the request is served, read them beforehand
+        if isinstance(config, SpooledTemporaryFile):
+            config = config.read().decode()
+
+        flow_id = flow_id or uuid.UUID(get_random_identity())
+        try:
+            digests = {os.path.basename(current_file.filename): artifact_store.put(current_file=current_file,
+                                                                                   owner=flow_id)
+                       for current_file in files or ()}
+        except Exception:
+            artifact_store.release(owner=flow_id)
+            raise
+        self._set_status(flow_id=flow_id, status='pending')
+        self._executor.submit(self._create_job, flow_id=flow_id, config=config, digests=digests)
+        return flow_id
+
+    def _find(self, keys: List[str]) -> Union[uuid.UUID, None]:
+        """ Fetches the Flow created for any of the idempotency keys, unless it failed or got (being) deleted """
+        for key in keys:
+            flow_id = self._idempotency_keys.get(key)
+            if flow_id is None and self._shared:
+                record = self._backend.get(kind='key', entity_id=key)
+                flow_id = uuid.UUID(record['flow_id']) if record else None
+            try:
+                if flow_id and self._get_status(flow_id=flow_id)['status'] not in ('failed', 'deleting'):
+                    return flow_id
+            except KeyError:
+                pass
+
+    def _remember(self, flow_id: uuid.UUID, keys: List[str]):
+        for key in keys:
+            self._idempotency_keys[key] = flow_id
+            if self._shared:
+                self._backend.put(kind='key', entity_id=key, record={'flow_id': str(flow_id)})
+
+    def _find_or_reserve(self,
+                         keys: List[str],
+                         acquire: Callable[[], Optional[uuid.UUID]] = None) -> Tuple[uuid.UUID, str]:
+        """ Fetches the Flow for any of the idempotency keys, else binds the keys to a Flow in the same step,
+        hence concurrent requests with the same keys never end up with two Flows
+
+        The Flow is either `reused`, `acquired` via `acquire` (i.e. from the warm pool) or a new flow_id gets
+        `reserved` as `pending`, pass it to `_submit` & drop it via `_forget` if that fails.
+        """
+        with self._keys_lock, self._backend.lock() if self._shared else nullcontext():
+            flow_id = self._find(keys)
+            if flow_id:
+                return flow_id, 'reused'
+            flow_id = acquire() if acquire else None
+            result = 'acquired' if flow_id else 'reserved'
+            if not flow_id:
+                flow_id = uuid.UUID(get_random_identity())
+                self._set_status(flow_id=flow_id, status='pending')
+            self._remember(flow_id=flow_id, keys=keys)
+            return flow_id, result
+
+    def _forget(self, flow_id: uuid.UUID):
+        """ Drops the status of the Flow & the idempotency keys bound to it """
+        self._status.pop(flow_id, None)
+        for key in [key for key, _flow_id in self._idempotency_keys.items() if _flow_id == flow_id]:
+            self._idempotency_keys.pop(key, None)
+            if self._shared:
+                self._backend.delete(kind='key', entity_id=key)
+        if self._shared:
+            self._backend.delete(kind='status', entity_id=flow_id)
+
+    def _create_job(self, flow_id: uuid.UUID, **kwargs):
+        """ Runs in the worker pool, keeps track of the status of Flow creation """
+        self._set_status(flow_id=flow_id, status='starting')
+        trace = Trace(name='flow.create', trace_id=str(flow_id))
+        pending_time = self._status[flow_id]['timings']['pending']
+        trace.add(stage='queue', start_time=pending_time, duration=trace.start_time - pending_time)
+        try:
+            with trace.activate():
+                _, host, port_expose = self._create(flow_id=flow_id, **kwargs)
+        except Exception as e:
+            # files stored for the Flow before it got queued
+            artifact_store.release(owner=flow_id)
+            self._set_status(flow_id=flow_id, status='failed', detail=repr(e), stages=trace.stages())
+        else:
+            self._set_status(flow_id=flow_id, status='started', host=host, port=port_expose,
+                             stages=trace.stages())
+        finally:
+            trace.dump()
+
+    def _set_status(self, flow_id: uuid.UUID, status: str, **kwargs):
+        if flow_id not in self._status:
+            self._status[flow_id] = {'timings': {}}
+        self._status[flow_id]['status'] = status
+        self._status[flow_id]['timings'][status] = time.time()
+        self._status[flow_id].update(kwargs)
+        if self._shared:
+            self._backend.put(kind='status', entity_id=flow_id, record=self._status[flow_id])
+        if status == 'pending':
+            self._expire_failed()
+
+    def _expire_failed(self):
+        """ Forgets the Flows that failed to get created more than `FAILED_TTL` secs ago """
+        expiry = time.time() - store_config.FAILED_TTL
+        for flow_id, flow_status in list(self._status.items()):
+            if flow_status['status'] == 'failed' and flow_status['timings']['failed'] < expiry:
+                self._forget(flow_id)
+
+    def _get_status(self, flow_id: uuid.UUID) -> Dict:
+        """ Fetches the status of Flow creation along with the time at which each status got reached """
+        if flow_id in self._status:
+            flow_status = self._status[flow_id].copy()
+        else:
+            # Flow created by another worker
+            flow_status = self._backend.get(kind='status', entity_id=flow_id) if self._shared else None
+            if flow_status is None:
+                raise KeyError(f'{flow_id} not found')
+
+        timings = flow_status['timings'] = flow_status['timings'].copy()
+        if 'pending' in timings:
+            flow_status['elapsed'] = max(timings.values()) - timings['pending']
+        return flow_status
 
+    @track('create')
     def _create(self,
                 config: Union[str, SpooledTemporaryFile, List[SinglePodModel]] = None,
-                files: List[UploadFile] = None):
-        """ Creates Flow using List[PodModel] or yaml spec """
-        # This makes sure `uses` & `py_modules` are created locally in `cwd`
-        # TODO: Handle file creation, deletion better
-        if files:
-            [create_meta_files_from_upload(current_file) for current_file in files]
-
+                files: List[UploadFile] = None,
+                flow_id: uuid.UUID = None,
+                digests: Dict[str, str] = None,
+                persist: bool = True):
+        """ Creates Flow using List[PodModel] or yaml spec, `digests` refer to files already in the artifact store
+
+        With `persist` unset, the Flow gets recorded in the backend only once `_persist` gets called.
+        """
         # FastAPI treats UploadFile as a tempfile.SpooledTemporaryFile
         if isinstance(config, str) or isinstance(config, SpooledTemporaryFile):
             yamlspec = config.read().decode() if isinstance(config, SpooledTemporaryFile) else config
+            spec = yamlspec
             try:
-                JAML.register(Flow)
-                flow = JAML.load(yamlspec)
+                with stage('load'):
+                    JAML.register(Flow)
+                    flow = JAML.load(yamlspec)
             except Exception as e:
                 self.logger.error(f'Got error while loading from yaml {repr(e)}')
                 raise FlowYamlParseException
         elif isinstance(config, list):
+            spec = [pod_args.dict() for pod_args in config]
             try:
-                flow = self._build_with_pods(pod_args=config)
-                with flow:
-                    pass
+                with stage('build'):
+                    flow = self._build_with_pods(pod_args=config)
             except Exception as e:
                 self.logger.error(f'Got error while creating flows via pods: {repr(e)}')
                 raise FlowCreationException
         else:
             raise FlowBadInputException(f'Not valid Flow config input {type(config)}')
 
-        try:
+        if flow_id:
+            flow.args.log_id = str(flow_id)
+        else:
             flow.args.log_id = flow.args.identity if 'identity' in flow.args else get_random_identity()
-            flow_id = uuid.UUID(flow.args.log_id)
-            flow = self._start(context=flow)
-        except Exception as e:
-            self.logger.critical(f'Got following error while starting the flow: {repr(e)}')
-            raise FlowStartException(repr(e))
+        flow_id = uuid.UUID(flow.args.log_id)
+
+        workspace = None
+        try:
+            if files or digests:
+                with stage('workspace'):
+                    workspace, digests = self._create_workspace(flow=flow, flow_id=flow_id, files=files,
+                                                                digests=digests)
+            if isinstance(config, list):
+                try:
+                    with stage('dry_run'):
+                        self._start(context=flow)
+                        flow.close()
+                except Exception as e:
+                    self.logger.error(f'Got error while creating flows via pods: {repr(e)}')
+                    raise FlowCreationException
+            try:
+                with stage('start'):
+                    flow = self._start(context=flow)
+            except Exception as e:
+                self.logger.critical(f'Got following error while starting the flow: {repr(e)}')
+                raise FlowStartException(repr(e))
+        except Exception:
+            artifact_store.release(owner=flow_id)
+            raise
 
         self._store[flow_id] = {}
         self._store[flow_id]['flow'] = flow
-        self._store[flow_id]['files'] = files
+        self._store[flow_id]['workspace'] = workspace
+        self._record(entity_id=flow_id, context=flow, persist=persist, config=spec, digests=digests or {},
+                     workspace=workspace, host=flow.host, port=flow.port_expose, yaml_spec=flow.yaml_spec)
         self.logger.info(f'Started flow with flow_id {colored(flow_id, "cyan")}')
         return flow_id, flow.host, flow.port_expose
 
+    def _create_workspace(self, flow: Flow, flow_id: uuid.UUID, files: List[UploadFile] = None,
+                          digests: Dict[str, str] = None) -> Tuple[str, Dict[str, str]]:
+        """ Stores the uploaded `uses` & `py_modules` files & links them in the workspace of the Flow
+
+        Returns the workspace & the digests of all its files.
+        """
+        digests = dict(digests or {})
+        for digest in digests.values():
+            artifact_store.put_digest(digest=digest, owner=flow_id)
+        for current_file in files or ():
+            digests[os.path.basename(current_file.filename)] = artifact_store.put(current_file=current_file,
+                                                                                  owner=flow_id)
+        workspace = artifact_store.workspace(owner=flow_id, files=digests)
+        for pod in flow._pod_nodes.values():
+            if pod.args.host == __default_host__:
+                for pea_args in [pod.args, *pod.all_args]:
+                    handle_workspace_files(args=pea_args, workspace=workspace)
+            else:
+                # JinadRuntime looks up the files to upload to a remote Pod in `cwd`, unlinked with the Flow
+                for filename, digest in digests.items():
+                    artifact_store.link(digest=digest, path=os.path.abspath(filename))
+        return workspace, digests
+
+    def _start(self, context: Flow):
+        """ Starts the Pods of the Flow one by one like `Flow.start`, each Pea via `_start_pea`
+
+        Pods get started level by level if `PARALLEL_START` is set, all Peas of a level get started concurrently.
+        """
+        flow = context
+        if flow._build_level.value < FlowBuildLevel.GRAPH.value:
+            flow.build(copy_flow=False)
+
+        if flow.args.logserver:
+            self.logger.info('starting logserver...')
+            flow._start_log_server()
+
+        # set env only before the pod get started
+        if flow._env:
+            os.environ.update(flow._env)
+
+        if store_config.PARALLEL_START:
+            levels = get_pod_levels({name: pod.needs for name, pod in flow._pod_nodes.items()})
+            max_workers = store_config.MAX_PARALLEL_PEAS
+        else:
+            levels = [[name] for name in flow._pod_nodes]
+            max_workers = 1
+
+        pod_timings = {}
+        flow_start_time = time.time()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pea-start') as executor:
+            for level, pod_names in enumerate(levels):
+                pods = [flow._pod_nodes[name] for name in pod_names]
+                for pod in pods:
+                    # a Flow started before (i.e. the dry run) keeps its closed Peas
+                    pod.peas.clear()
+                futures = [(pod, executor.submit(self._start_pea, pea_args))
+                           for pod in pods for pea_args in pod.all_args]
+                errors = []
+                for pod, future in futures:
+                    try:
+                        pea, start_time, end_time = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    pod.peas.append(pea)
+                    pod.push(pea)
+                    timing = pod_timings.setdefault(pod.name, {'level': level,
+                                                               'start': start_time - flow_start_time,
+                                                               'end': end_time - flow_start_time})
+                    timing['start'] = min(timing['start'], start_time - flow_start_time)
+                    timing['end'] = max(timing['end'], end_time - flow_start_time)
+                for pod in pods:
+                    flow.push(pod)
+                if errors:
+                    flow.close()
+                    raise errors[0]
+
+        for timing in pod_timings.values():
+            timing['elapsed'] = timing['end'] - timing['start']
+        self.logger.info(f'{flow.num_pods} Pods (i.e. {flow.num_peas} Peas) got started in {len(levels)} levels '
+                         f'in {time.time() - flow_start_time:.2f} secs')
+
+        flow_id = uuid.UUID(flow.args.log_id)
+        if flow_id in self._status:
+            self._status[flow_id]['pods'] = pod_timings
+        return flow
+
     def _build_with_pods(self,
                          pod_args: List[SinglePodModel]):
         """ Since we rely on PodModel, this can accept all params that a Pod can accept """
@@ -122,32 +565,98 @@ class InMemoryFlowStore(InMemoryStore):
     def _get(self,
              flow_id: uuid.UUID,
              yaml_only: bool = False):
-        """ Fetches a Flow from the store """
+        """ Fetches a Flow from the store, or its record if it is owned by another worker """
         if flow_id not in self._store:
-            raise KeyError(f'{flow_id} not found')
+            record = self._lookup(flow_id)
+            if record is None:
+                raise KeyError(f'{flow_id} not found')
+            return record['host'], record['port'], record['yaml_spec']
 
         if 'flow' in self._store[flow_id]:
             flow = self._store[flow_id]['flow']
             return flow.host, flow.port_expose, flow.yaml_spec
 
-    def _delete(self, flow_id: uuid.UUID):
-        """ Closes a Flow context & deletes from store """
+    def _attach(self, entity_id: uuid.UUID, context: AttachedContext, record: Dict):
+        for digest in record['digests'].values():
+            try:
+                artifact_store.restore(digest=digest, owner=entity_id)
+            except KeyError as e:
+                self.logger.warning(f'Flow {entity_id} got re-attached, but {e}')
+        super()._attach(entity_id=entity_id, context=context, record=record)
+        self._store[entity_id]['workspace'] = record['workspace']
+        self._set_status(flow_id=entity_id, status='started', host=context.host, port=context.port_expose,
+                         recovered='attached')
+
+    def _restart(self, entity_id: uuid.UUID, record: Dict):
+        """ Creates the Flow again with the same flow_id, spec & files """
+        result_cache.invalidate(entity_id)
+        config = record['config'] if isinstance(record['config'], str) else \
+            [SinglePodModel(**pod_args) for pod_args in record['config']]
+        self._set_status(flow_id=entity_id, status='pending', recovered='restarted')
+        try:
+            for digest in record['digests'].values():
+                artifact_store.restore(digest=digest, owner=entity_id)
+        except KeyError as e:
+            self._set_status(flow_id=entity_id, status='failed', detail=repr(e))
+        else:
+            self._create_job(flow_id=entity_id, config=config, digests=record['digests'])
+        if self._status[entity_id]['status'] == 'failed':
+            self._backend.delete(kind=self._kind, entity_id=entity_id)
+
+    def _reap(self, entity_id: uuid.UUID, record: Dict):
+        super()._reap(entity_id=entity_id, record=record)
+        artifact_store.release(owner=entity_id)
+        self._backend.delete(kind='status', entity_id=entity_id)
+
+    def _submit_delete(self, flow_id: uuid.UUID):
+        """ Queues closing the Flow in the background, its status stays `deleting` till it is gone """
+        if self._status.get(flow_id, {}).get('status') == 'deleting':
+            return
         if flow_id not in self._store:
             raise KeyError(f'flow_id {flow_id} not found in store. please create one!')
-        flow = self._store.pop(flow_id)
-
-        if 'flow' in flow:
-            self._close(context=flow['flow'])
+        self._set_status(flow_id=flow_id, status='deleting')
+        self._delete_executor.submit(self._delete, flow_id)
 
-        if 'files' in flow and flow['files']:
-            for current_file in flow['files']:
-                delete_meta_files_from_upload(current_file=current_file)
+    @track('delete')
+    def _delete(self, flow_id: uuid.UUID, forget: bool = True, deadline: float = None):
+        """ Closes a Flow context & deletes from store, see `_close_before` for the `deadline` """
+        if flow_id not in self._store:
+            raise KeyError(f'flow_id {flow_id} not found in store. please create one!')
+        flow = self._store.pop(flow_id)
+        try:
+            if 'flow' in flow:
+                with stage('close'):
+                    self._close_before(entity_id=flow_id, entry=flow,
+                                       deadline=deadline or time.time() + store_config.CLOSE_TIMEOUT)
+
+            if flow.get('workspace'):
+                with stage('release'):
+                    for filename, digest in flow.get('record', {}).get('digests', {}).items():
+                        artifact_store.unlink(digest=digest, path=os.path.abspath(filename))
+                    artifact_store.release(owner=flow_id)
+        finally:
+            # the status is kept till the Flow got closed, e.g. `deleting` while it gets closed in the background
+            self._forget(flow_id)
+            result_cache.forget(flow_id)
 
+        if forget:
+            self._backend.delete(kind=self._kind, entity_id=flow_id)
         self.logger.info(f'Closed flow with flow_id {colored(flow_id, "cyan")}')
 
 
 class InMemoryPodStore(InMemoryStore):
+    _store = {}
+    _kind = 'pod'
+
+    def _start(self, context: Pod):
+        """ Starts the Peas of the Pod one by one like `Pod.start`, safe to start Pods concurrently """
+        for pea_args in context.all_args:
+            pea, _, _ = self._start_pea(pea_args)
+            context.peas.append(pea)
+            context.push(pea)
+        return context
 
+    @track('create')
     def _create(self, pod_arguments: Union[Dict, Namespace]):
         """ Creates a Pod via Flow or via CLI """
 
@@ -155,29 +664,38 @@ class InMemoryPodStore(InMemoryStore):
             pod_id = uuid.UUID(pod_arguments.log_id) if isinstance(pod_arguments, Namespace) \
                 else uuid.UUID(pod_arguments['peas'][0].log_id)
 
-            pod = Pod(pod_arguments)
-            pod = self._start(context=pod)
+            with stage('start'):
+                pod = Pod(pod_arguments)
+                pod = self._start(context=pod)
         except Exception as e:
             self.logger.critical(f'Got following error while starting the pod: {repr(e)}')
             raise PodStartException(repr(e))
 
         self._store[pod_id] = {}
         self._store[pod_id]['pod'] = pod
+        self._store[pod_id]['files'] = get_upload_files(pod_arguments)
+        self._record(entity_id=pod_id, context=pod, args=pod_arguments)
         self.logger.info(f'Started pod with pod_id {colored(pod_id, "cyan")}')
         return pod_id
 
-    def _delete(self, pod_id: uuid.UUID):
-        """ Closes a Pod context & deletes from store """
+    @track('delete')
+    def _delete(self, pod_id: uuid.UUID, forget: bool = True, deadline: float = None):
+        """ Closes a Pod context & deletes from store, see `_close_before` for the `deadline` """
         if pod_id not in self._store:
             raise KeyError(f'pod_id {pod_id} not found in store. please create one!')
         pod = self._store.pop(pod_id)
 
         if 'pod' in pod:
-            self._close(context=pod['pod'])
+            with stage('close'):
+                self._close_before(entity_id=pod_id, entry=pod,
+                                   deadline=deadline or time.time() + store_config.CLOSE_TIMEOUT)
+
+        if pod.get('files'):
+            with stage('release'):
+                self._release_files(pod['files'])
 
-        if 'files' in pod:
-            for current_file in pod['files']:
-                delete_meta_files_from_upload(current_file=current_file)
+        if forget:
+            self._backend.delete(kind=self._kind, entity_id=pod_id)
 
         self.logger.info(f'Closed pod with pod_id {colored(pod_id, "cyan")}')
 
@@ -185,34 +703,46 @@ class InMemoryPodStore(InMemoryStore):
 class InMemoryPeaStore(InMemoryStore):
     """ Creates Pea on remote  """
 
+    _store = {}
+    _kind = 'pea'
+
     # TODO: Merge this with InMemoryPodStore
+    @track('create')
     def _create(self, pea_arguments: Union[Dict, Namespace]):
         try:
             pea_id = uuid.UUID(pea_arguments.log_id) if isinstance(pea_arguments, Namespace) \
                 else uuid.UUID(pea_arguments['log_id'])
-            pea = Pea(pea_arguments)
-            pea = self._start(context=pea)
+            with stage('start'):
+                pea, _, _ = self._start_pea(pea_arguments)
         except Exception as e:
             self.logger.critical(f'Got following error while starting the pea: {repr(e)}')
             raise PeaStartException(repr(e))
 
         self._store[pea_id] = {}
         self._store[pea_id]['pea'] = pea
+        self._store[pea_id]['files'] = get_upload_files(pea_arguments)
+        self._record(entity_id=pea_id, context=pea, args=pea_arguments)
         self.logger.info(f'Started pea with pea_id {colored(pea_id, "cyan")}')
         return pea_id
 
-    def _delete(self, pea_id: uuid.UUID):
-        """ Closes a Pea context & deletes from store """
+    @track('delete')
+    def _delete(self, pea_id: uuid.UUID, forget: bool = True, deadline: float = None):
+        """ Closes a Pea context & deletes from store, see `_close_before` for the `deadline` """
         if pea_id not in self._store:
             raise KeyError(f'pea_id {pea_id} not found in store. please create one!')
         pea = self._store.pop(pea_id)
 
         if 'pea' in pea:
-            self._close(context=pea['pea'])
+            with stage('close'):
+                self._close_before(entity_id=pea_id, entry=pea,
+                                   deadline=deadline or time.time() + store_config.CLOSE_TIMEOUT)
 
-        if 'files' in pea:
-            for current_file in pea['files']:
-                delete_meta_files_from_upload(current_file=current_file)
+        if pea.get('files'):
+            with stage('release'):
+                self._release_files(pea['files'])
+
+        if forget:
+            self._backend.delete(kind=self._kind, entity_id=pea_id)
 
         self.logger.info(f'Closed pea with pea_id {colored(pea_id, "cyan")}')
 
@@ -220,3 +750,11 @@ class InMemoryPeaStore(InMemoryStore):
 flow_store = InMemoryFlowStore()
 pod_store = InMemoryPodStore()
 pea_store = InMemoryPeaStore()
+
+
+def _store_sizes() -> Dict:
+    return {type(store).__name__: len(store._store) for store in (flow_store, pod_store, pea_store)}
+
+
+Gauge('jinad_store_size', 'Number of Flows / Pods / Peas held by each store',
+      labelnames=('store',), callback=_store_sizes)
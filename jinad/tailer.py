@@ -0,0 +1,528 @@
+import os
+import re
+import sys
+import json
+import time
+import ctypes
+import asyncio
+import threading
+import ctypes.util
+from array import array
+from datetime import datetime, timezone
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from jina.enums import LogVerbosity
+from jina.logging import JinaLogger
+from fastapi.concurrency import run_in_threadpool
+
+from jinad.config import log_config
+from jinad.metrics import Gauge
+
+logger = JinaLogger(context='👻 TAILER')
+
+# https://man7.org/linux/man-pages/man7/inotify.7.html
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_libc()
+
+
+class InotifyWatcher:
+    """ Wakes up waiters when the file gets modified, using inotify events on the event loop """
+
+    def __init__(self, path: str):
+        self._fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_init1 failed for {path}')
+        if _libc.inotify_add_watch(self._fd, os.fsencode(path), IN_WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f'inotify_add_watch failed for {path}')
+        self._event = asyncio.Event()
+        self._loop = asyncio.get_event_loop()
+        self._loop.add_reader(self._fd, self._on_event)
+
+    def _on_event(self):
+        try:
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self._event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """ Returns True if the file got modified within `timeout` secs """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+    def close(self):
+        self._loop.remove_reader(self._fd)
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """ Wakes up waiters when the size or mtime of the file changes, checked every `POLL_INTERVAL` secs """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._stat = self._get_stat()
+
+    def _get_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    async def wait(self, timeout: float) -> bool:
+        """ Returns True if the file got modified within `timeout` secs """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            await asyncio.sleep(min(log_config.POLL_INTERVAL, max(deadline - time.time(), 0)))
+            stat = self._get_stat()
+            if stat != self._stat:
+                self._stat = stat
+                return True
+        return False
+
+    def close(self):
+        pass
+
+
+def get_file_watcher(path: str) -> Union[InotifyWatcher, PollingWatcher]:
+    """ Watches the file via inotify if available, falls back to polling otherwise """
+    if log_config.INOTIFY and _libc:
+        try:
+            return InotifyWatcher(path)
+        except OSError as e:
+            # e.g. `fs.inotify.max_user_watches` got exhausted
+            logger.warning(f'Falling back to polling {path}, inotify failed with {repr(e)}')
+    return PollingWatcher(path)
+
+
+class LineIndex:
+    """ Sparse index of the byte offsets of every `interval`th line of a log file
+
+    `offsets[k]` is where line `k * interval + 1` starts. The index gets extended incrementally by scanning
+    only the bytes written since the last update & gets persisted in `{path}.idx`, so that resuming a
+    stream at any line is a seek followed by reading less than `interval` lines.
+    """
+    CHUNK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, path: str, interval: int = None):
+        self.path = path
+        self.index_path = f'{path}.idx'
+        self.interval = interval or log_config.INDEX_INTERVAL
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.offsets = array('Q', [0])
+        self._lines = 0  # number of newlines scanned
+        self._scanned = 0  # number of bytes scanned
+
+    def _load(self):
+        """ Index file has the interval followed by the offsets, all as uint64 """
+        try:
+            with open(self.index_path, 'rb') as fp:
+                content = fp.read()
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        index = array('Q')
+        index.frombytes(content[:len(content) - len(content) % index.itemsize])
+        if len(index) < 2 or index[0] != self.interval or index[1] != 0 or index[-1] > size:
+            # stale index, e.g. log file got rotated
+            self._remove()
+            return
+        # offsets appended by another writer of the index aren't increasing, these get dropped
+        decreasing = np.flatnonzero(np.diff(np.frombuffer(index, dtype=np.int64)[1:]) <= 0)
+        if decreasing.size:
+            index = index[:decreasing[0] + 2]
+            try:
+                with open(self.index_path, 'wb') as fp:
+                    fp.write(index.tobytes())
+            except OSError:
+                self._remove()
+                return
+        self.offsets = index[1:]
+        self._lines = (len(self.offsets) - 1) * self.interval
+        self._scanned = self.offsets[-1]
+
+    def _remove(self):
+        try:
+            os.remove(self.index_path)
+        except OSError:
+            pass
+
+    def _persist(self, offsets: array):
+        try:
+            with open(self.index_path, 'ab') as fp:
+                if fp.tell() == 0:
+                    fp.write(array('Q', [self.interval, 0]).tobytes())
+                fp.write(offsets.tobytes())
+        except OSError as e:
+            logger.warning(f'Could not persist line index {self.index_path}: {repr(e)}')
+
+    def update(self):
+        """ Extends the index to the current end of the file, this blocks """
+        with self._lock:
+            if os.path.getsize(self.path) < self._scanned:
+                self._reset()
+                self._remove()
+
+            new_offsets = array('Q')
+            with open(self.path, 'rb') as fp:
+                fp.seek(self._scanned)
+                for chunk in iter(lambda: fp.read(self.CHUNK_SIZE), b''):
+                    newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord('\n'))
+                    # index in `newlines` of the newline which ends the last line before the next checkpoint
+                    first = self.interval - self._lines % self.interval - 1
+                    new_offsets.extend((newlines[first::self.interval] + self._scanned + 1).tolist())
+                    self._lines += len(newlines)
+                    self._scanned += len(chunk)
+
+            if new_offsets:
+                self.offsets.extend(new_offsets)
+                self._persist(new_offsets)
+
+    @property
+    def lines(self) -> int:
+        """ Number of complete lines indexed """
+        return self._lines
+
+    def bisect(self, file_handler: BinaryIO, before: Callable[[bytes], bool]) -> int:
+        """ Line number of the last checkpoint whose line is `before` the one looked for, e.g. by time
+
+        Lines have to be sorted by `before`, only the lines at the checkpoints are read.
+        """
+        low, high = 0, len(self.offsets) - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            file_handler.seek(self.offsets[mid])
+            if before(file_handler.readline()):
+                low = mid
+            else:
+                high = mid - 1
+        return low * self.interval + 1
+
+    def seek(self, file_handler: BinaryIO, line_number: int) -> int:
+        """ Seeks to the closest checkpoint at or before `line_number` & returns the number of lines before it """
+        checkpoint = min((max(line_number, 1) - 1) // self.interval, len(self.offsets) - 1)
+        file_handler.seek(self.offsets[checkpoint])
+        return checkpoint * self.interval
+
+
+_line_indexes = {}  # type: Dict[str, LineIndex]
+_line_indexes_lock = threading.Lock()
+
+
+def get_line_index(path: str) -> LineIndex:
+    """ Line index shared by all streams of a log file, the only one appending to its `.idx`
+
+    Indexes of the log files that got removed meanwhile are dropped.
+    """
+    with _line_indexes_lock:
+        for indexed_path in [indexed_path for indexed_path in _line_indexes if not os.path.exists(indexed_path)]:
+            _line_indexes.pop(indexed_path)
+        if path not in _line_indexes:
+            _line_indexes[path] = LineIndex(path)
+        return _line_indexes[path]
+
+
+async def tail(file_handler, line_num_from=0, timeout=5, max_lines=1, max_bytes=None, max_latency=0, follow=True):
+    """ asynchronous tail file, sleeps till the file gets modified instead of spinning over it
+
+    Yields lists of `(line_number, line)` with max `max_lines` lines or `max_bytes` bytes, `None` on timeout.
+    Once the file gets modified, it waits `max_latency` secs so that the lines written meanwhile go in one batch.
+    With `follow=False`, it returns once the complete lines written so far are read.
+    `file_handler` needs to be opened in binary mode, lines before `line_num_from` are skipped using the line index
+    """
+    line_number = 0
+    partial_line = b''
+    if line_num_from > 1:
+        line_index = get_line_index(file_handler.name)
+        await run_in_threadpool(line_index.update)
+        line_number = line_index.seek(file_handler=file_handler, line_number=line_num_from)
+
+    watcher = get_file_watcher(file_handler.name) if follow else None
+    try:
+        while True:
+            lines, lines_size = [], 0
+            for line in iter(file_handler.readline, b''):
+                # a line is only complete once the writer has written the newline
+                partial_line += line
+                if not partial_line.endswith(b'\n'):
+                    break
+                line, partial_line = partial_line, b''
+                line_number += 1
+                if line_number < line_num_from:
+                    continue
+                lines.append((line_number, line.decode(errors='replace')))
+                lines_size += len(line)
+                if len(lines) >= max_lines or (max_bytes and lines_size >= max_bytes):
+                    yield lines
+                    lines, lines_size = [], 0
+                    # sending a frame doesn't suspend till the socket buffer is full, let others run meanwhile
+                    await asyncio.sleep(0)
+            if lines:
+                yield lines
+            if not follow:
+                return
+            if not await watcher.wait(timeout=timeout):
+                logger.debug('File tailer timed-out!')
+                yield None
+                return
+            if max_latency:
+                await asyncio.sleep(max_latency)
+    finally:
+        if watcher:
+            watcher.close()
+
+
+def split_lines(lines: List[Tuple[int, str]], max_lines: int = 1, max_bytes: int = None):
+    """ Splits a frame of lines in frames of max `max_lines` lines or `max_bytes` bytes """
+    frame, frame_size = [], 0
+    for line in lines:
+        frame.append(line)
+        frame_size += len(line[1])
+        if len(frame) >= max_lines or (max_bytes and frame_size >= max_bytes):
+            yield frame
+            frame, frame_size = [], 0
+    if frame:
+        yield frame
+
+
+class LogSubscriber:
+    """ Receives the frames of a log file from the tailer shared by all subscribers, via a bounded queue
+
+    If the queue is full, the subscriber is marked as lagging & reads the lines it missed from the log file itself.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.queue = asyncio.Queue(maxsize=log_config.SUBSCRIBER_QUEUE_SIZE)
+        self.lagging = False
+
+    def put(self, lines: List[Tuple[int, str]]):
+        try:
+            self.queue.put_nowait(lines)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.lagging = True
+
+    async def _read(self, line_num_from: int):
+        with open(self.path, 'rb') as fp:
+            async for lines in tail(file_handler=fp, line_num_from=line_num_from, max_lines=log_config.BATCH_LINES,
+                                    max_bytes=log_config.BATCH_BYTES, follow=False):
+                yield lines
+
+    async def frames(self, line_num_from: int = 0, timeout: float = 5, max_lines: int = 1, max_bytes: int = None,
+                     log_filter: 'LogFilter' = None):
+        """ Same frames as `tail()` with only the lines matching `log_filter`
+
+        Lines which are not in the queue are read from the file.
+        """
+        next_line = max(line_num_from, 1)
+        self.lagging = True
+        while True:
+            if self.lagging:
+                # lines written before subscribing or dropped from the queue
+                self.lagging = False
+                async for lines in self._read(line_num_from=next_line):
+                    next_line = lines[-1][0] + 1
+                    for frame in split_lines(log_filter.filter(lines) if log_filter else lines, max_lines, max_bytes):
+                        yield frame
+                        await asyncio.sleep(0)
+            try:
+                lines = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                yield None
+                return
+            lines = [line for line in lines if line[0] >= next_line]
+            if self.lagging or not lines:
+                continue
+            next_line = lines[-1][0] + 1
+            for frame in split_lines(log_filter.filter(lines) if log_filter else lines, max_lines, max_bytes):
+                yield frame
+                await asyncio.sleep(0)
+
+
+FLUENTD_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S%z'
+
+
+def parse_log_time(line: Union[str, bytes]) -> Optional[float]:
+    """ Unix timestamp of a line written by fluentd i.e. `{time}\t{tag}\t{record}`, `None` for other lines """
+    if isinstance(line, bytes):
+        line = line.decode(errors='replace')
+    try:
+        return datetime.strptime(line.split('\t', 1)[0], FLUENTD_TIME_FORMAT).timestamp()
+    except ValueError:
+        return None
+
+
+class LogFilter:
+    """ Matches the lines written by fluentd i.e. `{time}\t{tag}\t{record}` by the fields of the json record
+
+    - level: minimum log level (`type` of the record) e.g. `WARNING`
+    - regex: regex to search in the `message` of the record
+    - name: comma separated names of the Peas/Pods which logged the record
+    - since / until: time window of the records as unix timestamps or ISO 8601 strings
+    """
+    PARAMS = ('level', 'regex', 'name', 'since', 'until')
+    LEVELS = {level.name: level.value for level in LogVerbosity}
+
+    def __init__(self, level: str = None, regex: str = None, name: str = None,
+                 since: Union[str, float] = None, until: Union[str, float] = None):
+        # params of a `from` message can be of any json type
+        for param, value in (('level', level), ('regex', regex), ('name', name)):
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f'Invalid {param} {value!r}, expected a string')
+        try:
+            self.level = self.LEVELS[level.upper()] if level else None
+            self.regex = re.compile(regex) if regex else None
+        except KeyError:
+            raise ValueError(f'Invalid level {level}, valid choices are {list(self.LEVELS)}')
+        except re.error as e:
+            raise ValueError(f'Invalid regex {regex}: {e}')
+        self.names = set(name.split(',')) if name else None
+        self.since = self.to_timestamp(since)
+        self.until = self.to_timestamp(until)
+        self._last_time = (None, None)
+
+    @classmethod
+    def from_params(cls, params: Dict) -> Optional['LogFilter']:
+        """ Builds the filter from handshake query params / `from` message, `None` if there's nothing to filter """
+        filter_args = {key: params[key] for key in cls.PARAMS if params.get(key) not in (None, '')}
+        return cls(**filter_args) if filter_args else None
+
+    @staticmethod
+    def to_timestamp(value: Union[str, float, None]) -> Optional[float]:
+        """ Converts unix timestamps or ISO 8601 strings (UTC if no timezone) to unix timestamps """
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f'Invalid time {value!r}, expected a unix timestamp or an ISO 8601 string')
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            timestamp = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f'Invalid time {value}, expected a unix timestamp or an ISO 8601 string')
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.timestamp()
+
+    def _parse_time(self, time_str: str) -> float:
+        # consecutive lines are mostly logged in the same second
+        if self._last_time[0] != time_str:
+            self._last_time = (time_str, datetime.strptime(time_str, FLUENTD_TIME_FORMAT).timestamp())
+        return self._last_time[1]
+
+    def match(self, line: str) -> bool:
+        try:
+            time_str, _, record = line.split('\t', 2)
+            if self.since is not None or self.until is not None:
+                timestamp = self._parse_time(time_str)
+                if (self.since is not None and timestamp < self.since) or \
+                        (self.until is not None and timestamp > self.until):
+                    return False
+            if self.level is None and self.names is None and self.regex is None:
+                return True
+            record = json.loads(record)
+        except ValueError:
+            # not a fluentd record
+            return False
+        if self.level is not None and self.LEVELS.get(str(record.get('type')).upper(), 0) < self.level:
+            return False
+        if self.names is not None and record.get('name') not in self.names:
+            return False
+        if self.regex is not None and not self.regex.search(str(record.get('message', ''))):
+            return False
+        return True
+
+    def filter(self, lines: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        return [line for line in lines if self.match(line[1])]
+
+
+class LogHub:
+    """ Keeps one tailer per log file, which fans the lines out to all of its subscribers
+
+    The tailer gets started with the first subscriber & cancelled when the last one leaves.
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # type: Dict[str, set]
+        self._tailers = {}  # type: Dict[str, asyncio.Task]
+
+    def subscribe(self, path: str) -> LogSubscriber:
+        subscriber = LogSubscriber(path)
+        self._subscribers.setdefault(path, set()).add(subscriber)
+        if path not in self._tailers or self._tailers[path].done():
+            self._tailers[path] = asyncio.ensure_future(self._tail(path))
+        return subscriber
+
+    def unsubscribe(self, subscriber: LogSubscriber):
+        subscribers = self._subscribers.get(subscriber.path, set())
+        subscribers.discard(subscriber)
+        if not subscribers:
+            self._subscribers.pop(subscriber.path, None)
+            tailer = self._tailers.pop(subscriber.path, None)
+            if tailer:
+                tailer.cancel()
+
+    async def _tail(self, path: str):
+        try:
+            line_index = get_line_index(path)
+            await run_in_threadpool(line_index.update)
+            next_line = line_index.lines + 1
+            with open(path, 'rb') as fp:
+                while True:
+                    async for lines in tail(file_handler=fp, line_num_from=next_line, timeout=60,
+                                            max_lines=log_config.BATCH_LINES, max_bytes=log_config.BATCH_BYTES,
+                                            max_latency=log_config.BATCH_LATENCY):
+                        if lines is None:
+                            break
+                        next_line = lines[-1][0] + 1
+                        for subscriber in list(self._subscribers.get(path, ())):
+                            subscriber.put(lines)
+        except Exception as e:
+            logger.error(f'Tailer of {path} failed with {repr(e)}')
+
+    def stats(self) -> Dict:
+        return {
+            'tailers': len(self._tailers),
+            'subscribers': sum(len(subscribers) for subscribers in self._subscribers.values())
+        }
+
+
+log_hub = LogHub()
+Gauge('jinad_log_stream_clients', 'Number of websocket clients streaming logs',
+      callback=lambda: {(): log_hub.stats()['subscribers']})
+Gauge('jinad_log_stream_tailers', 'Number of log files being tailed',
+      callback=lambda: {(): log_hub.stats()['tailers']})
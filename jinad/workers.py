@@ -0,0 +1,100 @@
+import os
+import json
+import uuid
+import asyncio
+import multiprocessing
+from typing import Dict
+
+from fastapi.concurrency import run_in_threadpool
+from jina.logging import JinaLogger
+
+from jinad.backend import get_worker, is_alive
+from jinad.store import InMemoryStore, flow_store, pod_store, pea_store
+
+
+class WorkerServer:
+    """ Serves the requests other API workers forward to the owner of a Flow / Pod / Pea
+
+    Every worker listens on its own unix socket, requests & replies are single json lines e.g.
+    `{"kind": "flow", "op": "delete", "id": "..."}` & `{"status": "ok"}`.
+    """
+    logger = JinaLogger(context='🏭 WORKER')
+
+    def __init__(self):
+        self._stores = {store._kind: store for store in (flow_store, pod_store, pea_store)}
+        self._server = None
+        self._address = None
+
+    async def start(self):
+        # uvicorn spawns the workers, Peas need to be forked like in a single worker jinad
+        multiprocessing.set_start_method('fork', force=True)
+        self._address = get_worker()['address']
+        os.makedirs(os.path.dirname(self._address), exist_ok=True)
+        if os.path.exists(self._address):
+            os.remove(self._address)
+        self._server = await asyncio.start_unix_server(self._handle, path=self._address)
+        self.logger.success(f'Worker {os.getpid()} listening on {self._address}')
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self._address):
+                os.remove(self._address)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = json.loads(await reader.readline())
+            reply = await self._serve(request)
+        except Exception as e:
+            self.logger.error(f'Got error while serving a forwarded request: {repr(e)}')
+            reply = {'status': 'error', 'detail': repr(e)}
+        writer.write(json.dumps(reply).encode() + b'\n')
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _serve(self, request: Dict) -> Dict:
+        store = self._stores[request['kind']]
+        if request['op'] != 'delete':
+            raise ValueError(f'unknown op {request["op"]}')
+        try:
+            with store._session():
+                await run_in_threadpool(store._delete, uuid.UUID(request['id']))
+        except KeyError:
+            return {'status': 'not_found'}
+        return {'status': 'ok'}
+
+
+worker_server = WorkerServer()
+
+
+async def forward(owner: Dict, request: Dict) -> Dict:
+    """ Sends the request to the worker `owner` & returns its reply """
+    reader, writer = await asyncio.open_unix_connection(owner['address'])
+    try:
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+        return json.loads(await reader.readline())
+    finally:
+        writer.close()
+
+
+async def delete_from_owner(store: InMemoryStore, entity_id: uuid.UUID) -> bool:
+    """ Deletes a Flow / Pod / Pea owned by another worker, `False` if no worker has it
+
+    Contexts of a worker that died get closed by terminating their processes.
+    """
+    record = store._lookup(entity_id)
+    if record is None:
+        return False
+    owner = record.get('owner')
+    if owner and owner['pid'] != os.getpid() and is_alive(owner['pid'], owner['start_time']):
+        reply = await forward(owner=owner, request={'kind': store._kind, 'op': 'delete', 'id': str(entity_id)})
+        if reply['status'] == 'error':
+            raise RuntimeError(reply['detail'])
+        return reply['status'] == 'ok'
+    await run_in_threadpool(store._reap, entity_id, record)
+    return True
@@ -0,0 +1,69 @@
+"""
+Time to build jina parsers, Pod / Pea namespaces & pydantic models, cold vs cached
+
+    python scripts/benchmark_parsers.py --number 50
+
+Cold runs clear the parser & enum caches before every call & build the field specs of the models from the parser,
+cached runs reuse the parsers built once per process & load the field specs from the on-disk cache.
+"""
+import os
+import timeit
+import argparse
+import tempfile
+
+from jinad.config import model_config
+from jinad.helper import get_enum_types, pea_to_namespace, pod_to_namespace
+from jinad.models import PeaModel, SinglePodModel, ParallelPodModel
+from jinad.models.custom import build_pydantic_model
+from jinad.parsers import get_parser
+
+
+def clear_caches():
+    get_parser.cache_clear()
+    get_enum_types.cache_clear()
+
+
+def parallel_pod(parallel: int) -> ParallelPodModel:
+    return ParallelPodModel(head=SinglePodModel(), tail=SinglePodModel(),
+                            peas=[SinglePodModel() for _ in range(parallel)])
+
+
+def benchmark(func, number: int, cold: bool) -> float:
+    """ Average secs per call of `func` """
+    if cold:
+        return timeit.timeit(lambda: (clear_caches(), func()), number=number) / number
+    func()
+    return timeit.timeit(func, number=number) / number
+
+
+def build_model(module: str):
+    return build_pydantic_model(model_name='BenchmarkModel', module=module)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=50, help='calls timed per case')
+    parser.add_argument('--parallel', type=int, default=8, help='peas of the parallel Pod')
+    args = parser.parse_args()
+
+    cases = {
+        'get_parser(pod)': lambda: get_parser('pod'),
+        'get_parser(pea)': lambda: get_parser('pea'),
+        'pod_to_namespace(SinglePodModel)': lambda: pod_to_namespace(SinglePodModel()),
+        f'pod_to_namespace(ParallelPodModel, {args.parallel})': lambda: pod_to_namespace(parallel_pod(args.parallel)),
+        'pea_to_namespace(PeaModel)': lambda: pea_to_namespace(PeaModel()),
+    }
+    for name, func in cases.items():
+        cold = benchmark(func, number=args.number, cold=True)
+        cached = benchmark(func, number=args.number, cold=False)
+        print(f'{name:40} cold {cold * 1e3:8.2f} ms, cached {cached * 1e3:8.2f} ms ({cold / cached:.1f}x)')
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        model_config.CACHE_PATH = os.path.join(cache_dir, 'models-%s.json')
+        for module in ('pod', 'pea'):
+            model_config.CACHE = False
+            cold = benchmark(lambda: build_model(module), number=args.number, cold=True)
+            model_config.CACHE = True
+            cached = benchmark(lambda: build_model(module), number=args.number, cold=False)
+            name = f'build_pydantic_model({module})'
+            print(f'{name:40} cold {cold * 1e3:8.2f} ms, cached {cached * 1e3:8.2f} ms ({cold / cached:.1f}x)')
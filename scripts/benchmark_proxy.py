@@ -0,0 +1,78 @@
+"""
+Throughput & latency percentiles of the search proxy of jinad, with & without micro-batching
+
+    python scripts/benchmark_proxy.py --latency 0 0.002 0.005 --clients 64 --duration 10
+
+Requests go through `FlowProxy` to a local stub gateway, which answers every request after `--request-cost`
+secs plus `--doc-cost` secs per doc, handling one request at a time like a Flow with a single Pea per Pod.
+Every client keeps sending a single doc search request, waiting for the answer before sending the next one.
+"""
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+from jina.clients.request import _build_doc
+from jina.enums import DataInputType
+from jina.proto import jina_pb2_grpc
+
+from jinad.config import proxy_config
+from jinad.proxy import FlowProxy
+
+
+class StubGateway(jina_pb2_grpc.JinaRPCServicer):
+
+    def __init__(self, request_cost: float, doc_cost: float):
+        self.request_cost = request_cost
+        self.doc_cost = doc_cost
+
+    def Call(self, request_iterator, context):
+        for request in request_iterator:
+            time.sleep(self.request_cost + self.doc_cost * len(request.as_pb_object.search.docs))
+            yield request
+
+
+async def client(proxy: FlowProxy, port: int, deadline: float, latencies: list):
+    docs = [_build_doc('hello world', DataInputType.AUTO)[0].as_pb_object]
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await proxy.send(host='localhost', port=port, mode='search', docs=docs, top_k=10)
+        latencies.append(time.perf_counter() - start)
+
+
+async def benchmark(port: int, clients: int, duration: float):
+    proxy = FlowProxy()
+    latencies = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*[client(proxy, port, deadline, latencies) for _ in range(clients)])
+    proxy.close()
+    latencies.sort()
+    return len(latencies) / duration, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, nargs='+', default=[0, 0.002, 0.005],
+                        help='batch latency windows in secs, 0 sends requests one by one')
+    parser.add_argument('--batch-size', type=int, default=proxy_config.PROXY_BATCH_SIZE)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--request-cost', type=float, default=0.002)
+    parser.add_argument('--doc-cost', type=float, default=0.00005)
+    args = parser.parse_args()
+
+    server = grpc.server(ThreadPoolExecutor(max_workers=1))
+    jina_pb2_grpc.add_JinaRPCServicer_to_server(StubGateway(args.request_cost, args.doc_cost), server)
+    port = server.add_insecure_port('localhost:0')
+    server.start()
+    proxy_config.PROXY_BATCH_SIZE = args.batch_size
+    try:
+        for latency in args.latency:
+            proxy_config.PROXY_BATCH_LATENCY = latency
+            rps, p50, p99 = asyncio.get_event_loop().run_until_complete(
+                benchmark(port=port, clients=args.clients, duration=args.duration))
+            print(f'batch latency {latency * 1000:5.1f} ms: {rps:8.1f} requests/sec, '
+                  f'p50 {p50 * 1000:7.1f} ms, p99 {p99 * 1000:7.1f} ms')
+    finally:
+        server.stop(None)
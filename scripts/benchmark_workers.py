@@ -0,0 +1,79 @@
+"""
+Requests/sec served by jinad with 1, 2, 4, ... API workers
+
+    python scripts/benchmark_workers.py --workers 1 2 4 --clients 16 --duration 10
+
+Every run starts jinad on a fresh sqlite store, hence creates no Flow. Clients keep hitting `GET /flow/{id}/status`
+& `GET /alive`, which go through request validation & the store (the backend lookup with multiple workers).
+"""
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+import subprocess
+from multiprocessing import Pool
+
+import requests
+
+PREFIX = '/v1'
+
+
+def wait_alive(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{url}{PREFIX}/alive').status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f'jinad not alive on {url} after {timeout} secs')
+
+
+def client(url: str, duration: float) -> int:
+    session = requests.Session()
+    paths = [f'{PREFIX}/flow/{uuid.uuid4()}/status', f'{PREFIX}/alive']
+    served = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        session.get(f'{url}{paths[served % len(paths)]}')
+        served += 1
+    return served
+
+
+def benchmark(workers: int, clients: int, duration: float, port: int) -> float:
+    with tempfile.TemporaryDirectory() as workspace:
+        env = {**os.environ,
+               'JINAD_WORKERS': str(workers),
+               'JINAD_PORT': str(port),
+               'JINAD_WORKSPACE': workspace,
+               'JINAD_DB_PATH': os.path.join(workspace, 'store.db'),
+               'JINAD_WORKER_PATH': os.path.join(workspace, 'workers')}
+        jinad = subprocess.Popen([sys.executable, '-m', 'jinad.main'], env=env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        url = f'http://localhost:{port}'
+        try:
+            wait_alive(url)
+            with Pool(clients) as pool:
+                served = sum(pool.starmap(client, [(url, duration)] * clients))
+        finally:
+            jinad.terminate()
+            jinad.wait()
+    return served / duration
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        rps = benchmark(workers=workers, clients=args.clients, duration=args.duration, port=args.port)
+        baseline = baseline or rps
+        print(f'{workers} workers: {rps:8.1f} requests/sec ({rps / baseline:.2f}x)')
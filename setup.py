@@ -17,8 +17,8 @@ try:
 except FileNotFoundError:
     _long_description = ''
 
-install_requires = ['fastapi', 'uvicorn', 'pydantic', 'python-multipart', 'requests', 'websockets']
-extras_require = {'all': ['flaky', 'pytest', 'pytest-asyncio', 'pytest-cov']}
+install_requires = ['fastapi', 'uvicorn>=0.17.0', 'pydantic', 'python-multipart', 'requests', 'websockets']
+extras_require = {'all': ['msgpack', 'flaky', 'pytest', 'pytest-asyncio', 'pytest-cov']}
 jinaver = os.environ.get('JINAVER', 'jina')
 if jinaver:
     install_requires.append(jinaver)
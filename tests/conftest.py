@@ -1,7 +1,13 @@
 import os
 import sys
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
 import pytest
 from fastapi.testclient import TestClient
+from jina.proto import jina_pb2_grpc
 
 # adding jinad root to sys path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../jinad')
@@ -25,6 +31,9 @@ def common_endpoints():
         ('swagger_ui_redirect', '/docs/oauth2-redirect'),
         ('redoc_html', '/redoc'),
         ('_status', f'{PREFIX}/alive'),
+        ('_metrics', f'{PREFIX}/metrics'),
+        ('_logstream_stats', f'{PREFIX}/logstream'),
+        ('_fetch_logs', f'{PREFIX}/logs/{{log_id}}'),
         ('LogStreamingEndpoint', f'{PREFIX}/logstream/{{log_id}}')
     ]
 
@@ -34,7 +43,16 @@ def flow_endpoints():
     return [
         ('_create_from_pods', f'{PREFIX}/flow/pods'),
         ('_create_from_yaml', f'{PREFIX}/flow/yaml'),
+        ('_create_pool', f'{PREFIX}/flow/pool'),
+        ('_fetch_pool', f'{PREFIX}/flow/pool'),
+        ('_delete_pool', f'{PREFIX}/flow/pool'),
         ('_fetch', f'{PREFIX}/flow/{{flow_id}}'),
+        ('_fetch_status', f'{PREFIX}/flow/{{flow_id}}/status'),
+        ('_fetch_resources', f'{PREFIX}/flow/{{flow_id}}/resources'),
+        ('_search', f'{PREFIX}/flow/{{flow_id}}/search'),
+        ('_index', f'{PREFIX}/flow/{{flow_id}}/index'),
+        ('_ingest', f'{PREFIX}/flow/{{flow_id}}/ingest'),
+        ('_ingest_progress', f'{PREFIX}/flow/{{flow_id}}/ingest/{{ingest_id}}'),
         ('_ping', f'{PREFIX}/ping'),
         ('_delete', f'{PREFIX}/flow'),
     ]
@@ -45,7 +63,9 @@ def pod_endpoints():
     return [
         ('_upload', f'{PREFIX}/upload'),
         ('_create', f'{PREFIX}/pod'),
-        ('_delete', f'{PREFIX}/pod')
+        ('_delete', f'{PREFIX}/pod'),
+        ('_create_many', f'{PREFIX}/pods'),
+        ('_delete_many', f'{PREFIX}/pods')
     ]
 
 
@@ -54,5 +74,50 @@ def pea_endpoints():
     return [
         ('_upload', f'{PREFIX}/pea/upload'),
         ('_create', f'{PREFIX}/pea'),
-        ('_delete', f'{PREFIX}/pea')
+        ('_delete', f'{PREFIX}/pea'),
+        ('_create_many', f'{PREFIX}/peas'),
+        ('_delete_many', f'{PREFIX}/peas')
     ]
+
+
+@pytest.fixture
+def process():
+    """ A live process, e.g. standing in for a Pea or for another jinad worker """
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    yield process
+    process.kill()
+    process.wait()
+
+
+class StubGateway(jina_pb2_grpc.JinaRPCServicer):
+    """ Answers every request with its docs, tagging each with the number of docs of the request
+
+    Requests are held while `release` is cleared.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def Call(self, request_iterator, context):
+        for request in request_iterator:
+            self.release.wait()
+            self.requests.append(request.as_pb_object)
+            body = getattr(request.as_pb_object, request.as_pb_object.WhichOneof('body'))
+            for doc in body.docs:
+                doc.tags['batch'] = len(body.docs)
+            yield request
+
+
+@pytest.fixture
+def gateway():
+    """ Port & servicer of a gRPC server standing in for the gateway of a Flow """
+    servicer = StubGateway()
+    server = grpc.server(ThreadPoolExecutor(max_workers=1))
+    jina_pb2_grpc.add_JinaRPCServicer_to_server(servicer, server)
+    port = server.add_insecure_port('localhost:0')
+    server.start()
+    yield port, servicer
+    servicer.release.set()
+    server.stop(None)
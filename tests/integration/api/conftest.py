@@ -0,0 +1,38 @@
+import time
+from multiprocessing import Process
+
+import pytest
+import requests
+
+from jinad.config import fastapi_config, server_config
+
+
+def run_server():
+    from jinad.main import start
+    start()
+
+
+@pytest.fixture
+def jinad_server():
+    """ Runs jinad with uvicorn in a separate process, as opposed to `fastapi_client` """
+    url = f'http://localhost:{server_config.PORT}{fastapi_config.PREFIX}'
+    server = Process(target=run_server, daemon=True)
+    server.start()
+    for _ in range(100):
+        try:
+            requests.get(f'{url}/alive')
+            break
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    yield server
+    server.terminate()
+    # uvicorn waits for open websockets on a graceful shutdown
+    server.join(timeout=5)
+    if server.is_alive():
+        server.kill()
+        server.join()
+
+
+@pytest.fixture
+def server_url(jinad_server):
+    return f'http://localhost:{server_config.PORT}{fastapi_config.PREFIX}'
@@ -0,0 +1,66 @@
+import json
+import uuid
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from jinad.config import fastapi_config, ingest_config
+from jinad.store import flow_store
+
+
+@pytest.fixture
+def flow_id(monkeypatch, gateway):
+    port, _ = gateway
+    monkeypatch.setattr(flow_store, '_get', lambda flow_id: ('localhost', port, ''))
+    return uuid.uuid4()
+
+
+def _body(total_docs):
+    for i in range(total_docs):
+        yield json.dumps({'text': f'doc{i}'}).encode() + b'\n'
+
+
+def test_ingest_endpoint(monkeypatch, fastapi_client, gateway, flow_id):
+    _, servicer = gateway
+    monkeypatch.setattr(ingest_config, 'INGEST_BATCH_SIZE', 16)
+    ingest_id = uuid.uuid4()
+    response = fastapi_client.post(f'{fastapi_config.PREFIX}/flow/{flow_id}/ingest?ingest_id={ingest_id}',
+                                   data=_body(100), headers={'Content-Type': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.json()['docs'] == 100
+    assert response.json()['batches'] == 7
+    assert sum(len(r.index.docs) for r in servicer.requests) == 100
+
+    # progress of finished ingests is kept
+    with fastapi_client.websocket_connect(f'{fastapi_config.PREFIX}/flow/{flow_id}/ingest/{ingest_id}') as ws:
+        progress = ws.receive_json()
+    assert progress['status'] == 'finished'
+    assert progress['docs'] == 100 and progress['docs_per_sec'] > 0
+
+    response = fastapi_client.post(f'{fastapi_config.PREFIX}/flow/{flow_id}/ingest?ingest_id={ingest_id}',
+                                   data=b'doc\n')
+    assert response.status_code == 409
+
+
+def test_ingest_endpoint_lines(fastapi_client, gateway, flow_id):
+    _, servicer = gateway
+    response = fastapi_client.post(f'{fastapi_config.PREFIX}/flow/{flow_id}/ingest',
+                                   data=b'hello world\n\nhello jina')
+    assert response.json()['docs'] == 2
+    assert [d.text for d in servicer.requests[0].index.docs] == ['hello world', 'hello jina']
+
+
+def test_ingest_endpoint_bad_body(fastapi_client, flow_id):
+    response = fastapi_client.post(f'{fastapi_config.PREFIX}/flow/{flow_id}/ingest?format=ndjson',
+                                   data=b'{"text": "a"}\n{"text": ')
+    assert response.status_code == 400
+    response = fastapi_client.post(f'{fastapi_config.PREFIX}/flow/{flow_id}/ingest?format=csv', data=b'a')
+    assert response.status_code == 422
+
+
+def test_ingest_progress_not_found(fastapi_client, flow_id):
+    with pytest.raises(WebSocketDisconnect) as e:
+        with fastapi_client.websocket_connect(
+                f'{fastapi_config.PREFIX}/flow/{flow_id}/ingest/{uuid.uuid4()}?timeout=0.1') as ws:
+            ws.receive_json()
+    assert e.value.code == 4001
@@ -1,18 +1,24 @@
+import os
 import json
 import uuid
 import time
 import random
+import asyncio
 import pathlib
 from multiprocessing import Process, Event
 from datetime import datetime, timezone
 
+import msgpack
 import pytest
+import requests
+import websockets
 
 from jinad.excepts import NoSuchFileException
-from jinad.config import log_config, fastapi_config
+from jinad.config import log_config, fastapi_config, server_config
 
 LOG_MESSAGE = 'log message'
 TIMEOUT_ERROR_CODE = 4000
+BAD_FILTER_ERROR_CODE = 4002
 
 
 def feed_path_logs(filepath, total_lines, sleep, mp_event=None):
@@ -182,3 +188,134 @@ async def test_logging_client_disconnection(fastapi_client, total_lines, sleep,
             assert current_log_message['message'] == LOG_MESSAGE + ' ' + current_line_number
             if int(current_line_number) == disconnect_line_num:
                 break
+
+
+def get_cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as fp:
+        fields = fp.read().rsplit(')', 1)[-1].split()
+    # utime & stime are the 14th & 15th fields, counted from the pid
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+@pytest.mark.asyncio
+async def test_logging_idle_streams(jinad_server, server_url, total_streams=50, idle_secs=3):
+    """
+    This test verifies that idle log streams sleep till the log file gets modified
+
+    50 clients ask for logs of a file which doesn't get written anymore, with a timeout longer than the test.
+    CPU usage of the server stays low & `/alive` stays responsive, new lines are streamed once written.
+    """
+    log_id = uuid.uuid1()
+    filepath = log_config.PATH % log_id
+    feed_path_logs(filepath, total_lines=1, sleep=0)
+
+    url = f'ws://localhost:{server_config.PORT}{fastapi_config.PREFIX}/logstream/{log_id}?timeout=30'
+    streams = [await websockets.connect(url, close_timeout=1) for _ in range(total_streams)]
+    for stream in streams:
+        await stream.send(json.dumps({'from': 0}))
+        assert '1' in json.loads(await stream.recv())
+
+    stats = requests.get(f'{server_url}/logstream').json()
+    assert (stats['tailers'], stats['subscribers']) == (1, total_streams)
+
+    cpu_start = get_cpu_seconds(jinad_server.pid)
+    latencies = []
+    start_time = time.time()
+    while time.time() - start_time < idle_secs:
+        request_start = time.time()
+        assert requests.get(f'{server_url}/alive').status_code == 200
+        latencies.append(time.time() - request_start)
+        await asyncio.sleep(0.1)
+    cpu_usage = (get_cpu_seconds(jinad_server.pid) - cpu_start) / (time.time() - start_time)
+    print(f'CPU usage {cpu_usage:.2%}, /alive latency max {max(latencies):.3f} secs')
+    assert cpu_usage < 0.2
+    assert max(latencies) < 0.5
+
+    feed_path_logs(filepath, total_lines=1, sleep=0)
+    for stream in streams:
+        assert '2' in json.loads(await asyncio.wait_for(stream.recv(), timeout=5))
+    await asyncio.gather(*[stream.close() for stream in streams])
+    pathlib.Path(filepath).unlink()
+
+
+async def stream_all_lines(url, subprotocol, message=None):
+    subprotocols = [subprotocol] if subprotocol else None
+    async with websockets.connect(url, subprotocols=subprotocols, close_timeout=1) as websocket:
+        assert websocket.subprotocol == subprotocol
+        await websocket.send(json.dumps({'from': 0, **(message or {})}))
+        lines = 0
+        received_bytes = 0
+        async for frame in websocket:
+            received_bytes += len(frame)
+            frame = msgpack.unpackb(frame, strict_map_key=False) if subprotocol == 'msgpack' else json.loads(frame)
+            if 'code' in frame:
+                assert frame['code'] == TIMEOUT_ERROR_CODE
+                return lines, received_bytes
+            lines += len(frame)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('subprotocol', [None, 'json', 'msgpack'])
+async def test_logging_throughput(jinad_server, subprotocol, total_lines=20000, total_clients=10):
+    """ Benchmarks lines/sec delivered to `total_clients` clients streaming a complete log file """
+    log_id = uuid.uuid1()
+    filepath = log_config.PATH % log_id
+    feed_path_logs(filepath, total_lines=total_lines, sleep=0)
+
+    url = f'ws://localhost:{server_config.PORT}{fastapi_config.PREFIX}/logstream/{log_id}?timeout=0.5'
+    start_time = time.time()
+    received = await asyncio.gather(*[stream_all_lines(url, subprotocol) for _ in range(total_clients)])
+    # excluding the timeout at the end of the stream
+    elapsed = time.time() - start_time - 0.5
+    received_lines = sum(lines for lines, _ in received)
+    print(f'subprotocol {subprotocol}: {received_lines / elapsed:.0f} lines/sec to {total_clients} clients')
+    assert received_lines == total_lines * total_clients
+    pathlib.Path(filepath).unlink()
+
+
+def feed_fluentd_logs(filepath, total_lines):
+    pathlib.Path(filepath).parent.absolute().mkdir(parents=True, exist_ok=True)
+    with open(filepath, 'a') as fp:
+        for i in range(total_lines):
+            record = {'host': 'blah', 'process': 'blah', 'type': 'ERROR' if i % 100 == 0 else 'INFO',
+                      'name': f'pod{i % 4}', 'message': f'{LOG_MESSAGE} {i + 1}'}
+            fp.write(f'{datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S%z")}\tjina\t{json.dumps(record)}\n')
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('log_filter, expected_lines', [
+    ({}, 20000),
+    ({'level': 'ERROR'}, 200),
+    ({'level': 'ERROR', 'name': 'pod0'}, 200),
+    ({'regex': f'{LOG_MESSAGE} 1\\d*$'}, 11111),
+])
+async def test_logging_filtered_throughput(jinad_server, log_filter, expected_lines, total_lines=20000,
+                                           total_clients=10):
+    """ Benchmarks filtered vs unfiltered streams, lines are scanned & filtered on the server """
+    log_id = uuid.uuid1()
+    filepath = log_config.PATH % log_id
+    feed_fluentd_logs(filepath, total_lines=total_lines)
+
+    url = f'ws://localhost:{server_config.PORT}{fastapi_config.PREFIX}/logstream/{log_id}?timeout=0.5'
+    start_time = time.time()
+    received = await asyncio.gather(*[stream_all_lines(url, 'json', message=log_filter)
+                                      for _ in range(total_clients)])
+    elapsed = time.time() - start_time - 0.5
+    received_bytes = sum(received_bytes for _, received_bytes in received)
+    print(f'filter {log_filter}: {total_lines * total_clients / elapsed:.0f} lines/sec scanned, '
+          f'{received_bytes / 1024:.0f} KB sent to {total_clients} clients')
+    assert [lines for lines, _ in received] == [expected_lines] * total_clients
+    pathlib.Path(filepath).unlink()
+
+
+@pytest.mark.asyncio
+async def test_logging_bad_filter(fastapi_client):
+    log_id = uuid.uuid1()
+    filepath = log_config.PATH % log_id
+    feed_path_logs(filepath, total_lines=1, sleep=0)
+    with fastapi_client.websocket_connect(f'{fastapi_config.PREFIX}/logstream/{log_id}?level=LOUD') as websocket:
+        websocket.send_json({'from': 0})
+        data = websocket.receive_json()
+        assert data['code'] == BAD_FILTER_ERROR_CODE
+        assert 'LOUD' in data['detail']
+    pathlib.Path(filepath).unlink()
@@ -0,0 +1,53 @@
+import os
+import time
+import threading
+
+import pytest
+import requests
+
+from jinad.artifacts import artifact_store
+
+# size of the uploaded file in MB, the benchmark uploads it while checking the latency of `/alive`
+UPLOAD_SIZE = int(os.environ.get('JINAD_BENCHMARK_UPLOAD_SIZE', 300))
+MAX_ALIVE_LATENCY = 1
+
+
+@pytest.fixture(autouse=True)
+def workspace(monkeypatch, tmpdir):
+    """ Keeps the uploaded blobs out of the default `WORKSPACE`, the forked server inherits it """
+    monkeypatch.setattr(artifact_store, 'blobs_path', str(tmpdir / 'blobs'))
+    monkeypatch.setattr(artifact_store, 'workspaces_path', str(tmpdir / 'workspaces'))
+
+
+def test_upload_keeps_server_responsive(tmpdir, server_url):
+    upload_path = os.path.join(str(tmpdir), 'weights.bin')
+    with open(upload_path, 'wb') as f:
+        for _ in range(UPLOAD_SIZE):
+            f.write(os.urandom(1024 * 1024))
+
+    responses = []
+
+    def _upload():
+        with open(upload_path, 'rb') as f:
+            start_time = time.time()
+            responses.append(requests.put(f'{server_url}/upload', files={'pymodules_files': f}))
+            responses.append(time.time() - start_time)
+
+    upload_thread = threading.Thread(target=_upload)
+    upload_thread.start()
+    latencies = []
+    while upload_thread.is_alive():
+        start_time = time.time()
+        assert requests.get(f'{server_url}/alive').status_code == 200
+        latencies.append(time.time() - start_time)
+        time.sleep(0.05)
+    upload_thread.join()
+
+    response, elapsed = responses
+    assert response.status_code == 200
+    assert response.json()['status'] == 'uploaded'
+    print(f'uploaded {UPLOAD_SIZE} MB in {elapsed:.2f} secs ({UPLOAD_SIZE / elapsed:.2f} MB/s), '
+          f'/alive latency max {max(latencies):.3f} secs over {len(latencies)} requests')
+    assert max(latencies) < MAX_ALIVE_LATENCY
+    assert os.listdir(tmpdir / 'blobs')
+    os.remove('weights.bin')
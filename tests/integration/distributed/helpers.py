@@ -1,4 +1,5 @@
 import json
+import time
 from pathlib import Path
 from contextlib import ExitStack
 from typing import Optional, Dict
@@ -49,6 +50,19 @@ def create_flow(flow_yaml: str,
             ('yamlspec', file_stack.enter_context(open(flow_yaml))),
         ]
         response = requests.put(url, files=files)
-        print('Checking if the flow creation succeeded -- ')
-        assert response.status_code == 200
-        return response.json()
+        print('Checking if the flow creation got accepted -- ')
+        assert response.status_code == 202
+        return wait_for_flow(response.json()['flow_id'], url=url.replace('/yaml', ''))
+
+
+def wait_for_flow(flow_id: str,
+                  url: str = 'http://localhost:8000/v1/flow',
+                  timeout: int = 120):
+    for _ in range(timeout):
+        r = invoke_requests(method='get', url=f'{url}/{flow_id}/status')
+        if r is not None and r['status'] in ('started', 'failed'):
+            print(f'Flow {flow_id} is {r["status"]} in {r["elapsed"]:.2f} secs')
+            assert r['status'] == 'started'
+            return r
+        time.sleep(1)
+    raise TimeoutError(f'Flow {flow_id} did not start in {timeout} secs')
@@ -1,26 +1,28 @@
+import json
+import time
 import uuid
+import asyncio
+from io import BytesIO
+
 import pytest
 from fastapi import UploadFile
+from starlette.requests import ClientDisconnect
 
+from jinad.config import result_cache_config, upload_config
 from jinad.api.endpoints import flow
 
 _temp_id = uuid.uuid1()
 
 
-def mock_create_success(**kwargs):
-    return _temp_id, '0.0.0.0', 12345
-
-
-def mock_flow_creation_exception(**kwargs):
-    raise flow.FlowCreationException
-
+@pytest.fixture(autouse=True)
+def flow_store_keys(monkeypatch):
+    # Flows get bound to the idempotency keys before they get submitted, don't let them leak across tests
+    monkeypatch.setattr(flow.flow_store, '_status', {})
+    monkeypatch.setattr(flow.flow_store, '_idempotency_keys', {})
 
-def mock_flow_parse_exception(**kwargs):
-    raise flow.FlowYamlParseException
 
-
-def mock_flow_start_exception(**kwargs):
-    raise flow.FlowStartException
+def mock_submit_success(**kwargs):
+    return _temp_id
 
 
 def mock_fetch_success(**kwargs):
@@ -33,66 +35,150 @@ def mock_fetch_exception(**kwargs):
 
 @pytest.mark.asyncio
 async def test_create_from_pods_success(monkeypatch):
-    monkeypatch.setattr(flow.flow_store, '_create', mock_create_success)
+    monkeypatch.setattr(flow.flow_store, '_submit', mock_submit_success)
     response = await flow._create_from_pods()
-    assert response['status_code'] == 200
+    assert response['status_code'] == 202
+    assert response['flow_id'] == _temp_id
+    assert response['status'] == 'pending'
+
+
+@pytest.mark.asyncio
+async def test_create_from_yaml_success(monkeypatch):
+    monkeypatch.setattr(flow.flow_store, '_submit', mock_submit_success)
+    response = await flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml'),
+                                            uses_files=[UploadFile(filename='abcd.yaml')],
+                                            pymodules_files=[UploadFile(filename='abc.py')])
+    assert response['status_code'] == 202
+    assert response['flow_id'] == _temp_id
+    assert response['status'] == 'pending'
+
+
+@pytest.mark.asyncio
+async def test_create_from_yaml_pooled(monkeypatch):
+    monkeypatch.setattr(flow.flow_pool, '_templates', {'abc': {}})
+    monkeypatch.setattr(flow.flow_pool, 'acquire', lambda key: _temp_id)
+    response = await flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml', file=BytesIO(b'!Flow')),
+                                            uses_files=[], pymodules_files=[], idempotency_key=None, reuse=False)
     assert response['flow_id'] == _temp_id
-    assert response['host'] == '0.0.0.0'
-    assert response['port'] == 12345
     assert response['status'] == 'started'
 
 
 @pytest.mark.asyncio
-async def test_create_from_pods_flow_create_exception(monkeypatch):
-    monkeypatch.setattr(flow.flow_store, '_create', mock_flow_creation_exception)
+@pytest.mark.parametrize('idempotency_keys, reuse, specs, reused', [
+    (['a', 'a'], False, [b'!Flow', b'!Flow\n'], True),
+    (['a', 'b'], False, [b'!Flow', b'!Flow'], False),
+    ([None, None], False, [b'!Flow', b'!Flow'], False),
+    ([None, None], True, [b'!Flow', b'!Flow'], True),
+    ([None, None], True, [b'!Flow', b'!Flow\n'], False),
+])
+async def test_create_from_yaml_idempotent(monkeypatch, idempotency_keys, reuse, specs, reused):
+    def mock_submit(flow_id, **kwargs):
+        flow.flow_store._set_status(flow_id=flow_id, status='started', host='0.0.0.0', port=12345)
+        return flow_id
+
+    monkeypatch.setattr(flow.flow_store, '_submit', mock_submit)
+    responses = [await flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml', file=BytesIO(spec)),
+                                              uses_files=[UploadFile(filename='abc.py', file=BytesIO(b'1'))],
+                                              pymodules_files=[], idempotency_key=idempotency_key, reuse=reuse)
+                 for idempotency_key, spec in zip(idempotency_keys, specs)]
+    assert (responses[0]['flow_id'] == responses[1]['flow_id']) == reused
+    assert responses[1].get('reused', False) == reused
+    if reused:
+        assert responses[1]['host'] == '0.0.0.0' and responses[1]['port'] == 12345
+
+
+
+@pytest.mark.asyncio
+async def test_create_from_yaml_idempotent_concurrently(monkeypatch):
+    submitted = []
+
+    def mock_submit(flow_id, **kwargs):
+        # blocks the threadpool while the other request comes in
+        time.sleep(0.2)
+        submitted.append(flow_id)
+        return flow_id
+
+    monkeypatch.setattr(flow.flow_store, '_submit', mock_submit)
+    responses = await asyncio.gather(*[
+        flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml', file=BytesIO(b'!Flow')),
+                               uses_files=[], pymodules_files=[], idempotency_key='a', reuse=False)
+        for _ in range(2)])
+    assert len(submitted) == 1
+    assert responses[0]['flow_id'] == responses[1]['flow_id'] == submitted[0]
+    assert sorted(response['status'] for response in responses) == ['pending', 'pending']
+    assert sum(response.get('reused', False) for response in responses) == 1
+
+
+@pytest.mark.asyncio
+async def test_create_from_yaml_submit_failed(monkeypatch):
+    def mock_submit(**kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(flow.flow_store, '_submit', mock_submit)
+    with pytest.raises(OSError):
+        await flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml', file=BytesIO(b'!Flow')),
+                                     uses_files=[], pymodules_files=[], idempotency_key='a', reuse=False)
+    # the reservation got dropped, a retry creates the Flow
+    assert flow.flow_store._status == {} and flow.flow_store._idempotency_keys == {}
+    monkeypatch.setattr(flow.flow_store, '_submit', mock_submit_success)
+    response = await flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml', file=BytesIO(b'!Flow')),
+                                            uses_files=[], pymodules_files=[], idempotency_key='a', reuse=False)
+    assert response['flow_id'] == _temp_id
+    assert not response.get('reused', False)
+
+@pytest.mark.asyncio
+async def test_create_pool(monkeypatch):
+    monkeypatch.setattr(flow.flow_pool, 'register', lambda config, files, size: 'abc')
+    monkeypatch.setattr(flow.flow_pool, 'templates', lambda: {'abc': {'size': 2, 'idle': 0}})
+    response = await flow._create_pool(yamlspec=UploadFile(filename='abc.yaml', file=BytesIO(b'!Flow')),
+                                       uses_files=[], pymodules_files=[], size=2)
+    assert response['status_code'] == 202
+    assert response['template'] == 'abc'
+    assert response['size'] == 2
+
+
+@pytest.mark.asyncio
+async def test_delete_pool_keyerror():
     with pytest.raises(flow.HTTPException) as response:
-        await flow._create_from_pods()
+        await flow._delete_pool(template='abc')
     assert response.value.status_code == 404
-    assert response.value.detail == 'Bad pods args'
 
 
 @pytest.mark.asyncio
-async def test_create_from_pods_flow_start_exception(monkeypatch):
-    monkeypatch.setattr(flow.flow_store, '_create', mock_flow_start_exception)
+async def test_create_from_yaml_too_large(monkeypatch):
+    monkeypatch.setattr(flow.flow_store, '_submit', mock_submit_success)
+    monkeypatch.setattr(upload_config, 'MAX_REQUEST_SIZE', 5)
     with pytest.raises(flow.HTTPException) as response:
-        await flow._create_from_pods()
-    assert response.value.status_code == 404
-    assert response.value.detail == 'Flow couldn\'t get started'
+        await flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml', file=BytesIO(b'!Flow')),
+                                     uses_files=[UploadFile(filename='abcd.yaml', file=BytesIO(b'!Pod'))],
+                                     pymodules_files=[])
+    assert response.value.status_code == 413
+
+
+def mock_fetch_status_success(**kwargs):
+    return {'status': 'started', 'host': '0.0.0.0', 'port': 12345,
+            'timings': {'pending': 1.0, 'starting': 2.0, 'started': 5.0}, 'elapsed': 4.0}
 
 
 @pytest.mark.asyncio
-async def test_create_from_yaml_success(monkeypatch):
-    monkeypatch.setattr(flow.flow_store, '_create', mock_create_success)
-    response = await flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml'),
-                                            uses_files=[UploadFile(filename='abcd.yaml')],
-                                            pymodules_files=[UploadFile(filename='abc.py')])
+async def test_fetch_status_success(monkeypatch):
+    monkeypatch.setattr(flow.flow_store, '_get_status', mock_fetch_status_success)
+    response = await flow._fetch_status(_temp_id)
     assert response['status_code'] == 200
     assert response['flow_id'] == _temp_id
+    assert response['status'] == 'started'
     assert response['host'] == '0.0.0.0'
     assert response['port'] == 12345
-    assert response['status'] == 'started'
-
-
-@pytest.mark.asyncio
-async def test_create_from_yaml_parse_exception(monkeypatch):
-    monkeypatch.setattr(flow.flow_store, '_create', mock_flow_parse_exception)
-    with pytest.raises(flow.HTTPException) as response:
-        await flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml'),
-                                     uses_files=[UploadFile(filename='abcd.yaml')],
-                                     pymodules_files=[UploadFile(filename='abc.py')])
-    assert response.value.status_code == 404
-    assert response.value.detail == 'Invalid yaml file.'
+    assert response['elapsed'] == 4.0
 
 
 @pytest.mark.asyncio
-async def test_create_from_yaml_flow_start_exception(monkeypatch):
-    monkeypatch.setattr(flow.flow_store, '_create', mock_flow_start_exception)
+async def test_fetch_status_keyerror(monkeypatch):
+    monkeypatch.setattr(flow.flow_store, '_get_status', mock_fetch_exception)
     with pytest.raises(flow.HTTPException) as response:
-        await flow._create_from_yaml(yamlspec=UploadFile(filename='abc.yaml'),
-                                     uses_files=[UploadFile(filename='abcd.yaml')],
-                                     pymodules_files=[UploadFile(filename='abc.py')])
+        await flow._fetch_status(_temp_id)
     assert response.value.status_code == 404
-    assert 'Flow couldn\'t get started' in response.value.detail
+    assert response.value.detail == f'Flow ID {_temp_id} not found! Please create a new Flow'
 
 
 @pytest.mark.asyncio
@@ -145,6 +231,123 @@ async def test_ping_exception(monkeypatch):
     assert response.value.detail == 'Cannot connect to GRPC Server on 0.0.0.0:12345'
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize('connected', [True, False])
+async def test_ping_probe(monkeypatch, connected):
+    monkeypatch.setattr(flow.gateway_probe, 'probe',
+                        lambda host, port: {'connected': connected, 'latency': 0.001, 'cached': False})
+    if connected:
+        response = await flow._ping(host='0.0.0.0', port=12345, probe=True)
+        assert response['detail'] == 'connected'
+        assert response['latency'] == 0.001
+    else:
+        with pytest.raises(flow.HTTPException) as response:
+            await flow._ping(host='0.0.0.0', port=12345, probe=True)
+        assert response.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_fetch_resources(monkeypatch):
+    resources = {'processes': [{'pid': 1, 'alive': True, 'cpu_percent': 1.5, 'rss': 1024, 'threads': 2, 'fds': 4}],
+                 'total': {'cpu_percent': 1.5, 'rss': 1024, 'threads': 2, 'fds': 4}, 'sampled_at': 0}
+    monkeypatch.setattr(flow.resource_sampler, 'get', lambda kind, entity_id: resources)
+    response = await flow._fetch_resources(_temp_id)
+    assert response['status_code'] == 200
+    assert response['total']['rss'] == 1024
+
+
+@pytest.mark.asyncio
+async def test_fetch_resources_exception(monkeypatch):
+    def get(kind, entity_id):
+        raise KeyError(entity_id)
+
+    monkeypatch.setattr(flow.resource_sampler, 'get', get)
+    with pytest.raises(flow.HTTPException) as response:
+        await flow._fetch_resources(_temp_id)
+    assert response.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_search_success(monkeypatch):
+    sent = {}
+
+    async def send(host, port, mode, docs, top_k):
+        sent.update(host=host, port=port, mode=mode, top_k=top_k)
+        return docs
+
+    monkeypatch.setattr(flow.flow_store, '_get', mock_fetch_success)
+    monkeypatch.setattr(flow.flow_proxy, 'send', send)
+    response = await flow._search(_temp_id, data=['hello', {'text': 'world'}], top_k=3)
+    assert response['status_code'] == 200
+    assert [d['text'] for d in response['docs']] == ['hello', 'world']
+    assert sent == {'host': '0.0.0.0', 'port': 12345, 'mode': 'search', 'top_k': 3}
+
+
+@pytest.mark.asyncio
+async def test_search_cached(monkeypatch):
+    sent = []
+
+    async def send(host, port, mode, docs, top_k):
+        sent.append(mode)
+        return docs
+
+    monkeypatch.setattr(result_cache_config, 'RESULT_CACHE', True)
+    monkeypatch.setattr(flow.flow_store, '_get', mock_fetch_success)
+    monkeypatch.setattr(flow.flow_proxy, 'send', send)
+    response = await flow._search(_temp_id, data=['hello'], top_k=3)
+    assert not response['cached']
+    response = await flow._search(_temp_id, data=['hello'], top_k=3)
+    assert response['cached'] and response['docs'][0]['text'] == 'hello'
+    assert not (await flow._search(_temp_id, data=['hello'], top_k=4))['cached']
+    assert sent == ['search', 'search']
+
+    await flow._index(_temp_id, data=['hello'])
+    assert not (await flow._search(_temp_id, data=['hello'], top_k=3))['cached']
+
+
+@pytest.mark.asyncio
+async def test_index_exception(monkeypatch):
+    async def send(**kwargs):
+        raise flow.ProxyException('gateway 0.0.0.0:12345 failed the request: StatusCode.UNAVAILABLE')
+
+    monkeypatch.setattr(flow.flow_store, '_get', mock_fetch_exception)
+    with pytest.raises(flow.HTTPException) as response:
+        await flow._index(_temp_id, data=['hello'])
+    assert response.value.status_code == 404
+
+    monkeypatch.setattr(flow.flow_store, '_get', lambda **kwargs: None)
+    with pytest.raises(flow.HTTPException) as response:
+        await flow._index(_temp_id, data=['hello'])
+    assert response.value.status_code == 409
+
+    monkeypatch.setattr(flow.flow_store, '_get', mock_fetch_success)
+    with pytest.raises(flow.HTTPException) as response:
+        await flow._index(_temp_id, data=[42])
+    assert response.value.status_code == 400
+
+    monkeypatch.setattr(flow.flow_proxy, 'send', send)
+    with pytest.raises(flow.HTTPException) as response:
+        await flow._index(_temp_id, data=['hello'])
+    assert response.value.status_code == 502
+
+
+@pytest.mark.asyncio
+async def test_ingest_client_disconnect(monkeypatch):
+    class MockRequest:
+        headers = {}
+
+        async def stream(self):
+            yield b'doc\n'
+            raise ClientDisconnect
+
+    ingest_id = uuid.uuid4()
+    monkeypatch.setattr(flow.flow_store, '_get', mock_fetch_success)
+    with pytest.raises(flow.HTTPException) as response:
+        await flow._ingest(_temp_id, request=MockRequest(), ingest_id=ingest_id)
+    assert response.value.status_code == 400
+    assert (await flow.ingest_hub.wait(ingest_id, timeout=0)).progress()['status'] == 'failed'
+
+
 @pytest.mark.asyncio
 async def test_delete_success(monkeypatch):
     monkeypatch.setattr(flow.flow_store, '_delete', lambda **kwargs: None)
@@ -152,6 +355,14 @@ async def test_delete_success(monkeypatch):
     assert response['status_code'] == 200
 
 
+@pytest.mark.asyncio
+async def test_delete_background(monkeypatch):
+    monkeypatch.setattr(flow.flow_store, '_submit_delete', lambda **kwargs: None)
+    response = await flow._delete(_temp_id, wait=False)
+    assert response.status_code == 202
+    assert json.loads(response.body) == {'status_code': 202, 'flow_id': str(_temp_id), 'status': 'deleting'}
+
+
 @pytest.mark.asyncio
 async def test_delete_exception(monkeypatch):
     monkeypatch.setattr(flow.flow_store, '_delete', mock_fetch_exception)
@@ -0,0 +1,80 @@
+import gzip
+import json
+import uuid
+import pathlib
+
+import pytest
+
+from jinad.config import log_config, fastapi_config
+
+
+@pytest.fixture
+def log_id(monkeypatch, tmpdir):
+    monkeypatch.setattr(log_config, 'PATH', str(tmpdir) + '/%s/log.log')
+    monkeypatch.setattr(log_config, 'INDEX_INTERVAL', 7)
+    monkeypatch.setattr(log_config, 'BATCH_LINES', 4)
+    log_id = str(uuid.uuid1())
+    pathlib.Path(log_config.PATH % log_id).parent.mkdir(parents=True)
+    with open(log_config.PATH % log_id, 'w') as fp:
+        for i in range(1, 51):
+            # 2 lines per second starting at 2020-11-20T10:00:00+0000
+            fp.write(f'2020-11-20T10:00:{(i - 1) // 2:02d}+0000\tjina\t{{"message": "log message {i}"}}\n')
+    return log_id
+
+
+def fetch_logs(fastapi_client, log_id, **params):
+    response = fastapi_client.get(f'{fastapi_config.PREFIX}/logs/{log_id}', params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.parametrize('params, line_numbers, next_line', [
+    ({}, list(range(1, 51)), 51),
+    ({'limit': 10}, list(range(1, 11)), 11),
+    ({'from_line': 15, 'limit': 6}, list(range(15, 21)), 21),
+    ({'from_line': 48, 'limit': 6}, [48, 49, 50], 51),
+    ({'from_line': 60}, [], 60),
+    ({'from_ts': '2020-11-20T10:00:10', 'limit': 3}, [21, 22, 23], 24),
+    ({'from_ts': 1605866412, 'from_line': 30, 'limit': 2}, [30, 31], 32),
+    ({'from_ts': '2020-11-20T11:00:00'}, [], 51),
+])
+def test_fetch_logs(fastapi_client, log_id, params, line_numbers, next_line):
+    page = fetch_logs(fastapi_client, log_id, **params)
+    assert page['log_id'] == log_id
+    assert [int(line_number) for line_number in page['lines']] == line_numbers
+    assert all(line.endswith(f'log message {line_number}"}}\n') for line_number, line in page['lines'].items())
+    assert page['next_line'] == next_line
+
+
+def test_fetch_logs_pages(fastapi_client, log_id):
+    lines, from_line = {}, 1
+    while True:
+        page = fetch_logs(fastapi_client, log_id, from_line=from_line, limit=9)
+        if not page['lines']:
+            break
+        lines.update(page['lines'])
+        from_line = page['next_line']
+    assert list(lines) == [str(i) for i in range(1, 51)]
+
+
+def test_fetch_logs_gzip(fastapi_client, log_id):
+    response = fastapi_client.get(f'{fastapi_config.PREFIX}/logs/{log_id}', headers={'Accept-Encoding': 'gzip'},
+                                  stream=True)
+    assert response.headers['content-encoding'] == 'gzip'
+    page = json.loads(gzip.decompress(response.raw.read(decode_content=False)))
+    assert len(page['lines']) == 50
+
+
+@pytest.mark.parametrize('params, status_code', [
+    ({'limit': 0}, 422),
+    ({'from_line': 0}, 422),
+    ({'from_ts': 'yesterday'}, 422),
+])
+def test_fetch_logs_invalid(fastapi_client, log_id, params, status_code):
+    response = fastapi_client.get(f'{fastapi_config.PREFIX}/logs/{log_id}', params=params)
+    assert response.status_code == status_code
+
+
+def test_fetch_logs_not_found(fastapi_client):
+    response = fastapi_client.get(f'{fastapi_config.PREFIX}/logs/{uuid.uuid1()}')
+    assert response.status_code == 404
@@ -1,7 +1,9 @@
 import uuid
+from io import BytesIO
 import pytest
 from fastapi import UploadFile
 
+from jinad.config import upload_config
 from jinad.api.endpoints import pea
 
 _temp_id = uuid.uuid1()
@@ -39,6 +41,16 @@ async def test_upload_failure(monkeypatch):
     assert response['status'] == 'nothing to upload'
 
 
+@pytest.mark.asyncio
+async def test_upload_too_large(monkeypatch):
+    monkeypatch.setattr(pea, 'create_meta_files_from_upload', lambda *args: None)
+    monkeypatch.setattr(upload_config, 'MAX_FILE_SIZE', 2)
+    with pytest.raises(pea.HTTPException) as response:
+        await pea._upload(uses_files=[UploadFile(filename='abc.yaml', file=BytesIO(b'abc'))],
+                             pymodules_files=[])
+    assert response.value.status_code == 413
+
+
 @pytest.mark.asyncio
 async def test_create_success(monkeypatch):
     monkeypatch.setattr(pea.pea_store, '_create', lambda **args: _temp_id)
@@ -80,3 +92,41 @@ async def test_delete_exception(monkeypatch):
         await pea._delete(_temp_id)
     assert response.value.status_code == 404
     assert response.value.detail == f'Pea ID {_temp_id} not found! Please create a new Pea'
+
+
+@pytest.mark.asyncio
+async def test_create_many(monkeypatch):
+    monkeypatch.setattr(pea, 'pea_to_namespace', lambda **kwargs: kwargs['args'])
+    monkeypatch.setattr(pea.pea_store, '_create_many',
+                        lambda arguments: [{'status': 'started', 'pea_id': _temp_id},
+                                           {'status': 'failed', 'detail': 'error'}])
+    response = await pea._create_many([{}, {}])
+    assert response['status_code'] == 200
+    assert [result['status'] for result in response['peas']] == ['started', 'failed']
+    assert response['peas'][0]['pea_id'] == _temp_id
+
+
+@pytest.mark.asyncio
+async def test_create_many_parse_failed(monkeypatch):
+    def mock_to_namespace(args):
+        if not args:
+            raise ValueError('invalid')
+        return args
+
+    monkeypatch.setattr(pea, 'pea_to_namespace', mock_to_namespace)
+    monkeypatch.setattr(pea.pea_store, '_create_many',
+                        lambda arguments: [{'status': 'started', 'pea_id': _temp_id} for _ in arguments])
+    response = await pea._create_many([{}, {'name': 'a'}])
+    assert response['peas'] == [{'status': 'failed', 'detail': repr(ValueError('invalid'))},
+                               {'status': 'started', 'pea_id': _temp_id}]
+
+
+@pytest.mark.asyncio
+async def test_delete_many(monkeypatch):
+    other_id = uuid.uuid1()
+    monkeypatch.setattr(pea.pea_store, '_delete_many',
+                        lambda ids: [{'status': 'deleted'}, {'status': 'not_found'}])
+    response = await pea._delete_many([_temp_id, other_id])
+    assert response['status_code'] == 200
+    assert response['peas'] == [{'pea_id': _temp_id, 'status': 'deleted'},
+                                 {'pea_id': other_id, 'status': 'not_found'}]
@@ -1,6 +1,9 @@
 import uuid
+from io import BytesIO
 import pytest
+from fastapi import UploadFile
 
+from jinad.config import upload_config
 from jinad.api.endpoints import pod
 
 _temp_id = uuid.uuid1()
@@ -14,6 +17,16 @@ def mock_key_error(**kwargs):
     raise KeyError
 
 
+@pytest.mark.asyncio
+async def test_upload_too_large(monkeypatch):
+    monkeypatch.setattr(pod, 'create_meta_files_from_upload', lambda *args: None)
+    monkeypatch.setattr(upload_config, 'MAX_FILE_SIZE', 2)
+    with pytest.raises(pod.HTTPException) as response:
+        await pod._upload(uses_files=[UploadFile(filename='abc.yaml', file=BytesIO(b'abc'))],
+                             pymodules_files=[])
+    assert response.value.status_code == 413
+
+
 @pytest.mark.asyncio
 async def test_create_success(monkeypatch):
     monkeypatch.setattr(pod.pod_store, '_create', lambda **args: _temp_id)
@@ -58,3 +71,41 @@ async def test_delete_exception(monkeypatch):
         await pod._delete(_temp_id)
     assert response.value.status_code == 404
     assert response.value.detail == f'Pod ID {_temp_id} not found! Please create a new Pod'
+
+
+@pytest.mark.asyncio
+async def test_create_many(monkeypatch):
+    monkeypatch.setattr(pod, 'pod_to_namespace', lambda **kwargs: kwargs['args'])
+    monkeypatch.setattr(pod.pod_store, '_create_many',
+                        lambda arguments: [{'status': 'started', 'pod_id': _temp_id},
+                                           {'status': 'failed', 'detail': 'error'}])
+    response = await pod._create_many([{}, {}])
+    assert response['status_code'] == 200
+    assert [result['status'] for result in response['pods']] == ['started', 'failed']
+    assert response['pods'][0]['pod_id'] == _temp_id
+
+
+@pytest.mark.asyncio
+async def test_create_many_parse_failed(monkeypatch):
+    def mock_to_namespace(args):
+        if not args:
+            raise ValueError('invalid')
+        return args
+
+    monkeypatch.setattr(pod, 'pod_to_namespace', mock_to_namespace)
+    monkeypatch.setattr(pod.pod_store, '_create_many',
+                        lambda arguments: [{'status': 'started', 'pod_id': _temp_id} for _ in arguments])
+    response = await pod._create_many([{}, {'name': 'a'}])
+    assert response['pods'] == [{'status': 'failed', 'detail': repr(ValueError('invalid'))},
+                               {'status': 'started', 'pod_id': _temp_id}]
+
+
+@pytest.mark.asyncio
+async def test_delete_many(monkeypatch):
+    other_id = uuid.uuid1()
+    monkeypatch.setattr(pod.pod_store, '_delete_many',
+                        lambda ids: [{'status': 'deleted'}, {'status': 'not_found'}])
+    response = await pod._delete_many([_temp_id, other_id])
+    assert response['status_code'] == 200
+    assert response['pods'] == [{'pod_id': _temp_id, 'status': 'deleted'},
+                                 {'pod_id': other_id, 'status': 'not_found'}]
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from jinad.config import model_config
+from jinad.models import custom
+from jinad.models.custom import build_pydantic_model, load_field_specs
+
+
+@pytest.fixture
+def cache_path(tmpdir, monkeypatch):
+    monkeypatch.setattr(model_config, 'CACHE', True)
+    monkeypatch.setattr(model_config, 'CACHE_PATH', str(tmpdir / 'models-%s.json'))
+    return str(tmpdir / 'models-%s.json')
+
+
+@pytest.mark.parametrize('module', ['flow', 'pod', 'pea'])
+def test_cached_model_same_as_built(cache_path, monkeypatch, module):
+    monkeypatch.setattr(model_config, 'CACHE', False)
+    built_model = build_pydantic_model(module=module)
+    monkeypatch.setattr(model_config, 'CACHE', True)
+    load_field_specs(kind='local', module=module)
+    cached_model = build_pydantic_model(module=module)
+    assert cached_model.schema() == built_model.schema()
+    for key, value in built_model().dict().items():
+        assert cached_model().dict()[key] == value
+        assert type(cached_model().dict()[key]) == type(value)
+
+
+def test_cache_keyed_by_jina_version(cache_path):
+    from jina import __version__ as jina_version
+    load_field_specs(kind='local', module='pea')
+    with open(cache_path % jina_version) as fp:
+        assert 'local.pea' in json.load(fp)
+
+
+def test_volatile_defaults_not_shared(cache_path):
+    specs = {spec['name']: spec for spec in load_field_specs(kind='local', module='pea')}
+    assert specs['port_expose']['volatile']
+    assert specs['identity']['volatile']
+    assert not specs['name']['volatile']
+
+
+def test_api_model_offline(cache_path, monkeypatch):
+    api = {'methods': [{'name': 'pea',
+                        'options': [{'name': 'name', 'type': 'str', 'default': 'blah',
+                                     'help': 'name', 'choices': None},
+                                    {'name': 'parallel', 'type': 'int', 'default': 1,
+                                     'help': 'parallel', 'choices': [1, 2]}]}]}
+    monkeypatch.setattr(custom, 'get_latest_api', lambda: api)
+    build_pydantic_model(kind='api', module='pea')
+
+    def _offline():
+        raise ConnectionError
+
+    monkeypatch.setattr(custom, 'get_latest_api', _offline)
+    model = build_pydantic_model(kind='api', module='pea')
+    assert model().dict() == {'name': 'blah', 'parallel': 1}
+    with pytest.raises(ValueError):
+        model(parallel=3)
+
+
+def test_corrupt_cache_rebuilt(cache_path):
+    from jina import __version__ as jina_version
+    with open(cache_path % jina_version, 'w') as fp:
+        fp.write('{blah')
+    assert load_field_specs(kind='local', module='flow')
@@ -0,0 +1,88 @@
+import os
+import shutil
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+
+from jinad.config import upload_config
+from jinad.excepts import UploadTooLargeException
+from jinad.artifacts import ArtifactStore
+from jinad.backend import SQLiteBackend
+
+
+def _upload(filename, content):
+    return UploadFile(filename, file=BytesIO(content))
+
+
+def test_put_same_content_once(monkeypatch, tmpdir):
+    store = ArtifactStore(root=str(tmpdir))
+    digest = store.put(_upload('a.yml', b'!BaseExecutor {}'), owner='flow1')
+    mtime = os.stat(store.blob_path(digest)).st_mtime_ns
+    # content already stored doesn't get copied again
+    monkeypatch.setattr(shutil, 'copyfileobj', None)
+    assert store.put(_upload('b.yml', b'!BaseExecutor {}'), owner='flow2') == digest
+    assert os.stat(store.blob_path(digest)).st_mtime_ns == mtime
+    assert os.listdir(store.blobs_path) == [digest]
+    assert store.references(digest) == 2
+
+
+def test_workspace(tmpdir):
+    store = ArtifactStore(root=str(tmpdir))
+    digest = store.put(_upload('pods/a.yml', b'!BaseExecutor {}'), owner='flow1')
+    workspace = store.workspace(owner='flow1', files={'pods/a.yml': digest})
+    with open(os.path.join(workspace, 'a.yml'), 'rb') as f:
+        assert f.read() == b'!BaseExecutor {}'
+
+
+def test_release_last_owner(tmpdir):
+    store = ArtifactStore(root=str(tmpdir))
+    shared = store.put(_upload('a.yml', b'shared'), owner='flow1')
+    store.put(_upload('a.yml', b'shared'), owner='flow2')
+    own = store.put(_upload('b.py', b'own'), owner='flow1')
+    workspace = store.workspace(owner='flow1', files={'a.yml': shared, 'b.py': own})
+
+    assert store.release(owner='flow1') == [own]
+    assert not os.path.exists(workspace)
+    assert os.path.isfile(store.blob_path(shared))
+    assert not os.path.exists(store.blob_path(own))
+    assert store.references(shared) == 1
+
+    assert store.release(owner='flow2') == [shared]
+    assert not os.path.exists(store.blob_path(shared))
+
+
+def test_release_last_owner_of_all_workers(tmpdir):
+    # two API workers sharing the blobs & the sqlite backend
+    path = os.path.join(str(tmpdir), 'jinad.db')
+    stores = [ArtifactStore(root=str(tmpdir), backend=SQLiteBackend(path=path)) for _ in range(2)]
+    shared = stores[0].put(_upload('a.yml', b'shared'), owner='flow1')
+    stores[1].put(_upload('a.yml', b'shared'), owner='flow2')
+    assert stores[0].references(shared) == stores[1].references(shared) == 2
+
+    assert stores[0].release(owner='flow1') == []
+    assert os.path.isfile(stores[1].blob_path(shared))
+    assert stores[1].release(owner='flow2') == [shared]
+    assert not os.path.exists(stores[0].blob_path(shared))
+    assert stores[0].references(shared) == 0
+
+
+def test_put_in_chunks(monkeypatch, tmpdir):
+    monkeypatch.setattr(upload_config, 'CHUNK_SIZE', 7)
+    store = ArtifactStore(root=str(tmpdir))
+    digest = store.put(_upload('a.py', b'a' * 100), owner='flow1')
+    with open(store.blob_path(digest), 'rb') as f:
+        assert f.read() == b'a' * 100
+    assert store.uploads['files'] == 1
+    assert store.uploads['bytes'] == 100
+    assert store.throughput() > 0
+
+
+def test_put_too_large(monkeypatch, tmpdir):
+    monkeypatch.setattr(upload_config, 'CHUNK_SIZE', 7)
+    monkeypatch.setattr(upload_config, 'MAX_FILE_SIZE', 50)
+    store = ArtifactStore(root=str(tmpdir))
+    with pytest.raises(UploadTooLargeException):
+        store.put(_upload('a.py', b'a' * 100), owner='flow1')
+    assert os.listdir(store.blobs_path) == []
+    assert store.uploads['files'] == 0
@@ -0,0 +1,43 @@
+from argparse import Namespace
+
+from jina.enums import PeaRoleType
+
+from jinad.backend import SQLiteBackend, AttachedContext, get_process_start_time, is_alive
+
+
+def test_sqlite_backend(tmpdir):
+    backend = SQLiteBackend(path=str(tmpdir / 'store.db'))
+    args = Namespace(log_id='abc', pea_role=PeaRoleType.HEAD, uses='_pass', port_ctrl=12345)
+    backend.put(kind='pea', entity_id='abc', record={'args': args, 'pids': [[1, 2]]})
+    backend.put(kind='pod', entity_id='abc', record={'args': {'head': args, 'peas': [args, args]}})
+    backend.put(kind='pea', entity_id='def', record={'pids': []})
+    backend.delete(kind='pea', entity_id='def')
+
+    records = SQLiteBackend(path=str(tmpdir / 'store.db')).load(kind='pea')
+    assert list(records) == ['abc']
+    assert records['abc']['args'] == args
+    assert records['abc']['args'].pea_role is PeaRoleType.HEAD
+    assert records['abc']['pids'] == [[1, 2]]
+    assert backend.load(kind='pod')['abc']['args'] == {'head': args, 'peas': [args, args]}
+
+
+def test_is_alive(process):
+    start_time = get_process_start_time(process.pid)
+    assert start_time is not None
+    assert is_alive(process.pid, start_time)
+    # another process got the same pid
+    assert not is_alive(process.pid, start_time + 1)
+    process.kill()
+    process.wait()
+    assert not is_alive(process.pid, start_time)
+
+
+def test_attached_context(process):
+    context = AttachedContext({'pids': [[process.pid, get_process_start_time(process.pid)]],
+                               'host': '0.0.0.0', 'port': 12345})
+    assert context.is_alive
+    assert context.port_expose == 12345
+    context.close(timeout=5)
+    assert process.wait(timeout=1) is not None
+    assert not context.is_alive
+    assert not AttachedContext({'pids': [[None, None]]}).is_alive
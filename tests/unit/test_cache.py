@@ -0,0 +1,78 @@
+import uuid
+
+from jina.clients.request import _build_doc
+from jina.enums import DataInputType
+
+from jinad.config import result_cache_config
+from jinad.cache import ResultCache, request_hash
+
+
+def _docs(*texts):
+    return [_build_doc(text, DataInputType.AUTO)[0].as_pb_object for text in texts]
+
+
+def test_request_hash():
+    assert request_hash('search', _docs('a', 'b'), top_k=3) == request_hash('search', _docs('a', 'b'), top_k=3)
+    assert request_hash('search', _docs('a', 'b'), top_k=3) != request_hash('search', _docs('a', 'b'), top_k=4)
+    assert request_hash('search', _docs('a', 'b'), top_k=3) != request_hash('search', _docs('b', 'a'), top_k=3)
+    assert request_hash('search', _docs('ab'), top_k=3) != request_hash('search', _docs('a', 'b'), top_k=3)
+
+
+def test_cache_get_put():
+    cache = ResultCache()
+    flow_id = uuid.uuid4()
+    assert cache.get(flow_id, 'key') is None
+    cache.put(flow_id, 'key', _docs('a'), generation=cache.generation(flow_id))
+    assert [d.text for d in cache.get(flow_id, 'key')] == ['a']
+    assert cache.get(uuid.uuid4(), 'key') is None
+    assert cache.stats()['entries'] == 1 and cache.stats()['bytes'] > 0
+
+
+def test_cache_ttl(monkeypatch):
+    monkeypatch.setattr(result_cache_config, 'RESULT_CACHE_TTL', -1)
+    cache = ResultCache()
+    flow_id = uuid.uuid4()
+    cache.put(flow_id, 'key', _docs('a'), generation=0)
+    assert cache.get(flow_id, 'key') is None
+    assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+
+
+def test_cache_bounds(monkeypatch):
+    monkeypatch.setattr(result_cache_config, 'RESULT_CACHE_MAX_ENTRIES', 2)
+    cache = ResultCache()
+    flow_id = uuid.uuid4()
+    for key in ('a', 'b', 'c'):
+        cache.put(flow_id, key, _docs(key), generation=0)
+        cache.get(flow_id, 'a')
+    assert [key for _, key in cache._entries] == ['c', 'a']
+
+    size = cache.stats()['bytes'] // 2
+    monkeypatch.setattr(result_cache_config, 'RESULT_CACHE_MAX_BYTES', size * 2 - 1)
+    cache.put(flow_id, 'd', _docs('d'), generation=0)
+    assert [key for _, key in cache._entries] == ['d']
+    cache.put(flow_id, 'e', _docs('e' * size * 2), generation=0)
+    assert cache.get(flow_id, 'e') is None
+
+
+def test_cache_invalidate():
+    cache = ResultCache()
+    flow_id, other_flow_id = uuid.uuid4(), uuid.uuid4()
+    cache.put(flow_id, 'key', _docs('a'), generation=0)
+    cache.put(other_flow_id, 'key', _docs('a'), generation=0)
+    generation = cache.generation(flow_id)
+    cache.invalidate(flow_id)
+    assert cache.get(flow_id, 'key') is None
+    assert cache.get(other_flow_id, 'key') is not None
+    # searched before the invalidation, hence not stored
+    cache.put(flow_id, 'key', _docs('a'), generation=generation)
+    assert cache.get(flow_id, 'key') is None
+
+
+def test_cache_forget():
+    cache = ResultCache()
+    flow_id = uuid.uuid4()
+    cache.invalidate(flow_id)
+    cache.put(flow_id, 'key', _docs('a'), generation=cache.generation(flow_id))
+    cache.forget(flow_id)
+    assert cache.get(flow_id, 'key') is None
+    assert not cache._generations
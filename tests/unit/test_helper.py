@@ -1,9 +1,15 @@
+from io import BytesIO
+
 import pytest
+from fastapi import UploadFile
 from jina import __default_host__
 from jina.enums import BetterEnum, RuntimeBackendType, PeaRoleType
 from argparse import ArgumentParser
 
-from jinad.helper import get_enum_defaults, handle_enums, pod_to_namespace, pea_to_namespace
+from jinad.config import upload_config
+from jinad.excepts import UploadTooLargeException
+from jinad.helper import get_enum_defaults, handle_enums, pod_to_namespace, pea_to_namespace, get_pod_levels, \
+    check_upload_size, get_spec_hash, get_upload_digests
 from jinad.models import PeaModel, SinglePodModel, ParallelPodModel
 
 
@@ -37,6 +43,18 @@ def test_handle_enums():
         handle_enums(args, parser)
 
 
+@pytest.mark.parametrize('pod_needs, levels', [
+    ({'pod1': {'gateway'}, 'pod2': {'pod1'}, 'gateway': {'pod2'}},
+     [['pod1'], ['pod2'], ['gateway']]),
+    ({'pod1': {'gateway'}, 'pod2': {'gateway'}, 'joiner': {'pod1', 'pod2'}, 'gateway': {'joiner'}},
+     [['pod1', 'pod2'], ['joiner'], ['gateway']]),
+    ({'pod1': {'pod2'}, 'pod2': {'pod1'}},
+     [['pod1', 'pod2']]),
+])
+def test_pod_levels(pod_needs, levels):
+    assert get_pod_levels(pod_needs) == levels
+
+
 def test_single_pod_to_namespace():
     pod_args = pod_to_namespace(
         SinglePodModel(
@@ -163,3 +181,29 @@ def test_pea_to_namespace():
     assert 'host' in pea_args
     # we explicitly set host to __default_host__
     assert pea_args.host == __default_host__
+
+
+@pytest.mark.parametrize('sizes, max_file_size, max_request_size, too_large', [
+    ([10, 20], 20, 30, False),
+    ([10, 21], 20, 100, True),
+    ([10, 20], 20, 29, True),
+])
+def test_check_upload_size(monkeypatch, sizes, max_file_size, max_request_size, too_large):
+    monkeypatch.setattr(upload_config, 'MAX_FILE_SIZE', max_file_size)
+    monkeypatch.setattr(upload_config, 'MAX_REQUEST_SIZE', max_request_size)
+    files = [UploadFile(f'{idx}.py', file=BytesIO(b'a' * size)) for idx, size in enumerate(sizes)]
+    if too_large:
+        with pytest.raises(UploadTooLargeException):
+            check_upload_size(files)
+    else:
+        check_upload_size(files)
+    assert all(current_file.file.tell() == 0 for current_file in files)
+
+
+def test_get_spec_hash():
+    config = '!Flow\npods:\n  pod1:\n    uses: pod.yml\n'
+    digests = get_upload_digests([UploadFile('pod.yml', file=BytesIO(b'!BaseExecutor'))])
+    assert get_spec_hash(config, digests) == get_spec_hash(config, {'pod.yml': digests['pod.yml']})
+    assert get_spec_hash(config, digests) != get_spec_hash(config, {'pod.yml': 'abc'})
+    assert get_spec_hash(config, digests) != get_spec_hash(config, {'pod1.yml': digests['pod.yml']})
+    assert get_spec_hash(config, {}) != get_spec_hash(config + ' ', {})
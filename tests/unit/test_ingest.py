@@ -0,0 +1,118 @@
+import json
+import uuid
+import asyncio
+
+import pytest
+from jina.helper import random_port
+
+from jinad.config import ingest_config, proxy_config
+from jinad.ingest import Ingest, IngestHub, build_docs, iter_lines, parse_line
+from jinad.proxy import ProxyException
+
+
+async def _chunks(*chunks, consumed=None):
+    for chunk in chunks:
+        if consumed is not None:
+            consumed.append(chunk)
+        yield chunk
+
+
+async def _collect(agen):
+    return [item async for item in agen]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines():
+    lines = await _collect(iter_lines(_chunks(b'{"text": "a"}\n{"te', b'xt": "b"}\n\nc', b''), max_line_bytes=100))
+    assert lines == [b'{"text": "a"}', b'{"text": "b"}', b'', b'c']
+    with pytest.raises(ValueError):
+        await _collect(iter_lines(_chunks(b'a' * 10, b'a' * 10), max_line_bytes=15))
+
+
+def test_parse_line():
+    assert parse_line(b'{"text": "a"}\r', 'ndjson') == {'text': 'a'}
+    assert parse_line(b'"a"', 'ndjson') == 'a'
+    assert parse_line(b'hello world', 'lines') == 'hello world'
+    assert parse_line(b'  ', 'lines') is None
+
+
+def test_build_docs():
+    docs = build_docs([b'{"text": "a"}', b' ', b'{"text": "b"}'], 'ndjson')
+    assert [doc.text for doc in docs] == ['a', 'b']
+    with pytest.raises(ValueError):
+        build_docs([b'{"text": '], 'ndjson')
+
+
+@pytest.mark.asyncio
+async def test_ingest(monkeypatch, gateway):
+    port, servicer = gateway
+    monkeypatch.setattr(ingest_config, 'INGEST_BATCH_SIZE', 3)
+    body = b''.join(json.dumps({'text': f'doc{i}'}).encode() + b'\n' for i in range(10))
+    ingest = Ingest(ingest_id=uuid.uuid4(), flow_id=uuid.uuid4())
+    await ingest.run(chunks=_chunks(body[:25], body[25:]), fmt='ndjson', host='localhost', port=port)
+    assert sorted(len(r.index.docs) for r in servicer.requests) == [1, 3, 3, 3]
+    assert sorted(d.text for r in servicer.requests for d in r.index.docs) == sorted(f'doc{i}' for i in range(10))
+    progress = ingest.progress()
+    assert progress['status'] == 'finished'
+    assert progress['docs'] == 10 and progress['batches'] == 4 and progress['in_flight'] == 0
+    assert progress['docs_per_sec'] > 0
+
+
+@pytest.mark.asyncio
+async def test_ingest_backpressure(monkeypatch, gateway):
+    port, servicer = gateway
+    monkeypatch.setattr(ingest_config, 'INGEST_BATCH_SIZE', 1)
+    monkeypatch.setattr(ingest_config, 'INGEST_MAX_INFLIGHT', 2)
+    servicer.release.clear()
+    consumed = []
+    ingest = Ingest(ingest_id=uuid.uuid4(), flow_id=uuid.uuid4())
+    task = asyncio.ensure_future(ingest.run(chunks=_chunks(*[b'doc\n'] * 20, consumed=consumed), fmt='lines',
+                                            host='localhost', port=port))
+    await asyncio.sleep(0.5)
+    # 2 batches in flight & the line waiting for a slot
+    assert len(consumed) == 3
+    assert ingest.progress()['in_flight'] == 2
+    servicer.release.set()
+    await task
+    assert ingest.docs == 20
+
+
+@pytest.mark.asyncio
+async def test_ingest_failed(monkeypatch):
+    monkeypatch.setattr(proxy_config, 'PROXY_TIMEOUT', 0.5)
+    ingest = Ingest(ingest_id=uuid.uuid4(), flow_id=uuid.uuid4())
+    with pytest.raises(ProxyException):
+        await ingest.run(chunks=_chunks(b'doc\n'), fmt='lines', host='localhost', port=random_port())
+    assert ingest.progress()['status'] == 'failed'
+
+
+@pytest.mark.asyncio
+async def test_ingest_hub(monkeypatch):
+    monkeypatch.setattr(ingest_config, 'INGEST_KEEP', 1)
+    hub = IngestHub()
+    ingest = Ingest(ingest_id=uuid.uuid4(), flow_id=uuid.uuid4())
+    assert await hub.wait(ingest.ingest_id, timeout=0.1) is None
+    waiting = asyncio.ensure_future(hub.wait(ingest.ingest_id, timeout=5))
+    await asyncio.sleep(0)
+    hub.register(ingest)
+    assert await waiting is ingest
+    with pytest.raises(KeyError):
+        hub.register(ingest)
+    assert hub.running() == 1
+
+    ingest.status = 'finished'
+    for _ in range(2):
+        hub.register(Ingest(ingest_id=uuid.uuid4(), flow_id=ingest.flow_id))
+        hub._ingests[next(reversed(hub._ingests))].status = 'finished'
+    assert len(hub._ingests) == 2
+    assert ingest.ingest_id not in hub._ingests
+
+
+@pytest.mark.asyncio
+async def test_ingest_updates(monkeypatch, gateway):
+    port, _ = gateway
+    ingest = Ingest(ingest_id=uuid.uuid4(), flow_id=uuid.uuid4())
+    task = asyncio.ensure_future(ingest.run(chunks=_chunks(b'a\nb\n'), fmt='lines', host='localhost', port=port))
+    updates = await _collect(ingest.updates(interval=0.01))
+    await task
+    assert updates[-1]['status'] == 'finished' and updates[-1]['docs'] == 2
@@ -1,4 +1,4 @@
-from jinad.main import get_app, jinad_config
+from jinad.main import get_app, jinad_config, fastapi_config
 
 
 def test_get_app_flow(monkeypatch, common_endpoints, flow_endpoints):
@@ -24,3 +24,18 @@ def test_get_app_all(monkeypatch, common_endpoints, pea_endpoints, pod_endpoints
     routes = [(route.name, route.path) for route in get_app().routes]
     assert sorted(routes) == \
         sorted(common_endpoints + pea_endpoints + pod_endpoints + flow_endpoints)
+
+
+STARTUP_BUDGET = 10
+
+
+def test_startup_within_budget():
+    """ Import of jinad till the first `/alive` response should stay within the budget """
+    import sys
+    import subprocess
+    script = ('import time; start = time.time(); '
+              'from fastapi.testclient import TestClient; from jinad.main import get_app; '
+              f'assert TestClient(get_app()).get("{fastapi_config.PREFIX}/alive").status_code == 200; '
+              'print(time.time() - start)')
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, check=True).stdout
+    assert float(output.decode().strip().splitlines()[-1]) < STARTUP_BUDGET
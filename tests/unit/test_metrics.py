@@ -0,0 +1,127 @@
+import json
+import time
+import uuid
+import asyncio
+
+import pytest
+
+from jinad.config import metrics_config, fastapi_config
+from jinad.api.endpoints import pod
+from jinad.metrics import Registry, Counter, Gauge, Histogram, LoopLagMonitor, Trace, event_loop_lag, \
+    operation_latency, operation_failures, current_stages, stage, track
+
+
+def test_render():
+    registry = Registry()
+    counter = Counter('test_total', 'counts "things"', labelnames=('kind',), registry=registry)
+    counter.inc(kind='a')
+    counter.inc(2, kind='a')
+    Gauge('test_size', 'size', callback=lambda: {(): 3}, registry=registry)
+    histogram = Histogram('test_seconds', 'latency', buckets=(0.1, 1), registry=registry)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    assert registry.render().splitlines() == [
+        '# HELP test_total counts \\"things\\"',
+        '# TYPE test_total counter',
+        'test_total{kind="a"} 3.0',
+        '# HELP test_size size',
+        '# TYPE test_size gauge',
+        'test_size 3.0',
+        '# HELP test_seconds latency',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{le="0.1"} 1.0',
+        'test_seconds_bucket{le="1.0"} 2.0',
+        'test_seconds_bucket{le="+Inf"} 3.0',
+        'test_seconds_sum 5.55',
+        'test_seconds_count 3.0',
+    ]
+    with pytest.raises(ValueError):
+        Counter('test_total', 'duplicate', registry=registry)
+    with pytest.raises(ValueError):
+        counter.inc(kind='a', other='b')
+
+
+def test_track():
+    class DummyStore:
+        @track('create')
+        def _create(self, fail=False):
+            if fail:
+                raise KeyError
+            return 'created'
+
+    store = DummyStore()
+    assert store._create() == 'created'
+    with pytest.raises(KeyError):
+        store._create(fail=True)
+    assert operation_latency.get(store='DummyStore', operation='create') == 2
+    assert operation_failures.get(store='DummyStore', operation='create', exception='KeyError') == 1
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor(monkeypatch):
+    monkeypatch.setattr(metrics_config, 'LOOP_LAG_INTERVAL', 0.01)
+    samples = event_loop_lag.get()
+    monitor = LoopLagMonitor()
+    monitor.start()
+    await asyncio.sleep(0.05)
+    time.sleep(0.2)
+    await asyncio.sleep(0.05)
+    monitor.stop()
+    assert event_loop_lag.get() > samples
+    assert event_loop_lag._values[()] >= 0.15
+
+
+def test_metrics_endpoint(fastapi_client):
+    response = fastapi_client.get(f'{fastapi_config.PREFIX}/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    for metric in ['jinad_store_size{store="InMemoryFlowStore"}', 'jinad_upload_bytes_total',
+                   'jinad_log_stream_clients', '# TYPE jinad_operation_duration_seconds histogram',
+                   '# TYPE jinad_event_loop_lag_seconds histogram']:
+        assert metric in response.text
+
+
+def test_trace(monkeypatch, tmpdir):
+    monkeypatch.setattr(metrics_config, 'TRACE_PATH', str(tmpdir / 'trace.jsonl'))
+    with stage('ignored'):
+        pass
+    assert current_stages() == {}
+
+    trace = Trace(name='flow.create', trace_id='abc')
+    with trace.activate():
+        with stage('load'):
+            time.sleep(0.01)
+        for _ in range(2):
+            with stage('start'):
+                time.sleep(0.01)
+        assert list(current_stages()) == ['load', 'start']
+    assert current_stages() == {}
+    assert trace.stages()['start'] >= 0.02
+    assert [timing.split(';')[0] for timing in trace.server_timing().split(', ')] == ['load', 'start', 'total']
+
+    trace.dump()
+    with open(metrics_config.TRACE_PATH) as fp:
+        spans = [json.loads(line) for line in fp]
+    assert [span['stage'] for span in spans] == ['load', 'start', 'start', 'total']
+    assert all(span['trace_id'] == 'abc' and span['name'] == 'flow.create' for span in spans)
+
+
+def test_server_timing(monkeypatch, tmpdir, fastapi_client):
+    monkeypatch.setattr(metrics_config, 'TRACE_PATH', str(tmpdir / 'trace.jsonl'))
+
+    def mock_delete(pod_id):
+        with stage('close'):
+            time.sleep(0.01)
+
+    monkeypatch.setattr(pod.pod_store, '_delete', mock_delete)
+    response = fastapi_client.delete(f'{fastapi_config.PREFIX}/pod', params={'pod_id': str(uuid.uuid1())})
+    assert response.status_code == 200
+    assert list(response.json()['stages']) == ['close']
+    assert response.headers['server-timing'].startswith('close;dur=')
+    assert 'total;dur=' in response.headers['server-timing']
+    with open(metrics_config.TRACE_PATH) as fp:
+        assert [json.loads(line)['name'] for line in fp] == [f'DELETE {fastapi_config.PREFIX}/pod'] * 2
+
+    response = fastapi_client.get(f'{fastapi_config.PREFIX}/alive')
+    assert 'server-timing' not in response.headers
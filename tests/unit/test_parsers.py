@@ -0,0 +1,29 @@
+import pytest
+
+from jinad.parsers import get_parser
+from jinad.helper import get_enum_types, pod_to_namespace, pea_to_namespace
+from jinad.models import PeaModel, SinglePodModel, ParallelPodModel
+
+
+@pytest.mark.parametrize('kind', ['flow', 'pod', 'pea'])
+def test_get_parser_cached(kind):
+    assert get_parser(kind) is get_parser(kind)
+    assert get_parser(kind) is not get_parser(kind, version='0.0.0')
+
+
+def test_get_parser_invalid_kind():
+    with pytest.raises(ValueError):
+        get_parser('blah')
+
+
+def test_to_namespace_uses_cached_tables():
+    pod_to_namespace(SinglePodModel())
+    pea_to_namespace(PeaModel())
+    parser_hits, enum_hits = get_parser.cache_info().hits, get_enum_types.cache_info().hits
+    pod_to_namespace(ParallelPodModel(head=SinglePodModel(),
+                                      tail=SinglePodModel(),
+                                      peas=[SinglePodModel(), SinglePodModel()]))
+    pea_to_namespace(PeaModel())
+    assert get_parser.cache_info().hits == parser_hits + 2
+    # one lookup for each of head, tail & 2 peas, one for the pea
+    assert get_enum_types.cache_info().hits == enum_hits + 5
@@ -0,0 +1,63 @@
+import time
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+
+import jinad.pool
+import jinad.store
+from jinad.artifacts import ArtifactStore
+from jinad.helper import get_spec_hash, get_upload_digests
+from jinad.pool import FlowPool, pool_requests
+from jinad.store import InMemoryFlowStore
+
+CONFIG = '!Flow\npods:\n  pod1:\n    uses: pod.yml\n'
+
+
+def pod_file(content=b'!BaseExecutor\nwith: {}'):
+    return UploadFile('pod.yml', file=BytesIO(content))
+
+
+def spec_hash(content=b'!BaseExecutor\nwith: {}'):
+    return get_spec_hash(CONFIG, get_upload_digests([pod_file(content)]))
+
+
+def wait_for_idle(pool, key, idle):
+    for _ in range(100):
+        if pool.templates()[key]['idle'] == idle and not pool.templates()[key]['filling']:
+            return
+        time.sleep(0.1)
+    raise TimeoutError(f'pool got {pool.templates()[key]} instead of {idle} idle Flows')
+
+
+@pytest.fixture
+def pool(monkeypatch, tmpdir):
+    store = ArtifactStore(root=str(tmpdir))
+    monkeypatch.setattr(jinad.store, 'artifact_store', store)
+    monkeypatch.setattr(jinad.pool, 'artifact_store', store)
+    return FlowPool(store=InMemoryFlowStore())
+
+
+def test_flow_pool(pool):
+    store = pool.store
+    assert pool.acquire(spec_hash()) is None
+    key = pool.register(CONFIG, [pod_file()], size=2)
+    assert key == spec_hash()
+    wait_for_idle(pool, key, idle=2)
+
+    hits, misses = pool_requests.get(result='hit'), pool_requests.get(result='miss')
+    assert pool.acquire(spec_hash(b'!BaseExecutor\nwith: {}\n')) is None
+    flow_id = pool.acquire(spec_hash())
+    assert flow_id in store._store
+    assert store._get_status(flow_id)['status'] == 'started'
+    assert store._get_status(flow_id)['template'] == key
+    assert pool_requests.get(result='hit') == hits + 1
+    assert pool_requests.get(result='miss') == misses + 1
+
+    wait_for_idle(pool, key, idle=2)
+    idle_flow_ids = set(pool._templates[key]['idle'])
+    pool.unregister(key)
+    assert not idle_flow_ids & set(store._store)
+    assert flow_id in store._store
+    store._delete(flow_id)
+    assert not pool.registered
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+import pytest
+from jina.helper import random_port
+
+from jinad.config import ping_config
+from jinad.probe import GatewayProbe
+
+
+@pytest.fixture
+def gateway_port():
+    # a gRPC server without any service answers the health check with `UNIMPLEMENTED`, like the gateway does
+    server = grpc.server(ThreadPoolExecutor(max_workers=1))
+    port = server.add_insecure_port('localhost:0')
+    server.start()
+    yield port
+    server.stop(None)
+
+
+def test_probe(monkeypatch, gateway_port):
+    probe = GatewayProbe()
+    result = probe.probe('localhost', gateway_port)
+    assert result['connected'] and not result['cached']
+    assert 0 < result['latency'] < ping_config.PING_TIMEOUT
+    assert probe.probe('localhost', gateway_port)['cached']
+
+    monkeypatch.setattr(ping_config, 'PING_TTL', 0)
+    result = probe.probe('localhost', gateway_port)
+    assert result['connected'] and not result['cached']
+    assert len(probe._channels) == 1
+    probe.close()
+
+
+def test_probe_not_connected(monkeypatch):
+    monkeypatch.setattr(ping_config, 'PING_TIMEOUT', 0.5)
+    probe = GatewayProbe()
+    assert not probe.probe('localhost', random_port())['connected']
+    probe.close()
+
+
+def test_probe_channels_evicted(monkeypatch, gateway_port):
+    monkeypatch.setattr(ping_config, 'PING_MAX_CHANNELS', 1)
+    monkeypatch.setattr(ping_config, 'PING_TIMEOUT', 0.5)
+    probe = GatewayProbe()
+    assert probe.probe('localhost', gateway_port)['connected']
+    probe.probe('localhost', random_port())
+    assert list(probe._channels) != [('localhost', gateway_port)]
+    assert len(probe._channels) == 1
+    assert not probe.probe('localhost', gateway_port)['cached']
+    probe.close()
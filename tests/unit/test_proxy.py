@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from jina.clients.request import _build_doc
+from jina.enums import DataInputType
+from jina.helper import random_port
+
+from jinad.config import proxy_config
+from jinad.proxy import FlowProxy, ProxyException
+
+
+def _docs(*texts):
+    return [_build_doc(text, DataInputType.AUTO)[0].as_pb_object for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_proxy_batches(monkeypatch, gateway):
+    port, servicer = gateway
+    monkeypatch.setattr(proxy_config, 'PROXY_BATCH_LATENCY', 0.05)
+    proxy = FlowProxy()
+    responses = await asyncio.gather(*[proxy.send(host='localhost', port=port, mode='search',
+                                                  docs=_docs(f'doc{i}', f'doc{i}-2'), top_k=5) for i in range(4)])
+    assert len(servicer.requests) == 1
+    assert servicer.requests[0].search.docs[0].text == 'doc0'
+    for i, docs in enumerate(responses):
+        assert [d.text for d in docs] == [f'doc{i}', f'doc{i}-2']
+        assert all(d.tags['batch'] == 8 for d in docs)
+    assert len(proxy._channels) == 1
+    proxy.close()
+
+
+@pytest.mark.asyncio
+async def test_proxy_batch_size(monkeypatch, gateway):
+    port, servicer = gateway
+    monkeypatch.setattr(proxy_config, 'PROXY_BATCH_LATENCY', 10)
+    monkeypatch.setattr(proxy_config, 'PROXY_BATCH_SIZE', 2)
+    proxy = FlowProxy()
+    responses = await asyncio.gather(*[proxy.send(host='localhost', port=port, mode='index',
+                                                  docs=_docs(f'doc{i}')) for i in range(4)])
+    assert [len(r.index.docs) for r in servicer.requests] == [2, 2]
+    assert [docs[0].text for docs in responses] == ['doc0', 'doc1', 'doc2', 'doc3']
+    proxy.close()
+
+
+@pytest.mark.asyncio
+async def test_proxy_keys_not_batched(monkeypatch, gateway):
+    port, servicer = gateway
+    monkeypatch.setattr(proxy_config, 'PROXY_BATCH_LATENCY', 0.05)
+    proxy = FlowProxy()
+    await asyncio.gather(proxy.send(host='localhost', port=port, mode='search', docs=_docs('a'), top_k=1),
+                         proxy.send(host='localhost', port=port, mode='search', docs=_docs('b'), top_k=2),
+                         proxy.send(host='localhost', port=port, mode='index', docs=_docs('c')))
+    assert len(servicer.requests) == 3
+    proxy.close()
+
+
+@pytest.mark.asyncio
+async def test_proxy_unbatched(monkeypatch, gateway):
+    port, servicer = gateway
+    monkeypatch.setattr(proxy_config, 'PROXY_BATCH_LATENCY', 0)
+    proxy = FlowProxy()
+    await asyncio.gather(*[proxy.send(host='localhost', port=port, mode='search', docs=_docs('a'))
+                           for _ in range(3)])
+    assert len(servicer.requests) == 3
+    proxy.close()
+
+
+@pytest.mark.asyncio
+async def test_proxy_not_connected(monkeypatch):
+    monkeypatch.setattr(proxy_config, 'PROXY_TIMEOUT', 0.5)
+    proxy = FlowProxy()
+    with pytest.raises(ProxyException):
+        await proxy.send(host='localhost', port=random_port(), mode='search', docs=_docs('a'))
+    proxy.close()
+
+
+def test_proxy_evicted_channel_in_use(monkeypatch):
+    monkeypatch.setattr(proxy_config, 'PROXY_MAX_CHANNELS', 1)
+    proxy = FlowProxy()
+    with proxy._channel('localhost', 1) as in_use:
+        closed = []
+        monkeypatch.setattr(in_use, 'close', lambda: closed.append(in_use))
+        with proxy._channel('localhost', 2):
+            pass
+        assert not closed
+    assert closed == [in_use]
+    assert list(proxy._channels) == [('localhost', 2)]
+    proxy.close()
@@ -0,0 +1,50 @@
+import os
+import uuid
+
+import pytest
+
+from jinad.backend import get_process_start_time
+from jinad.resources import ResourceSampler, read_process
+from jinad.store import pea_store
+
+
+def test_read_process(process):
+    usage = read_process(os.getpid(), get_process_start_time(os.getpid()))
+    assert usage['rss'] > 0 and usage['threads'] >= 1 and usage['fds'] > 0 and usage['ticks'] >= 0
+    assert read_process(process.pid, None)['threads'] == 1
+    assert read_process(process.pid, get_process_start_time(process.pid) + 1) is None
+    process.kill()
+    process.wait()
+    assert read_process(process.pid, None) is None
+
+
+def test_sampler(monkeypatch, process):
+    pea_id = uuid.uuid4()
+    start_time = get_process_start_time(process.pid)
+    monkeypatch.setitem(pea_store._store, pea_id, {'record': {'pids': [[process.pid, start_time], [None, None]]}})
+    sampler = ResourceSampler()
+
+    resources = sampler.get('pea', pea_id)
+    assert [p['pid'] for p in resources['processes']] == [process.pid]
+    assert resources['total']['cpu_percent'] is None
+    assert resources['total']['rss'] == resources['processes'][0]['rss'] > 0
+    assert sampler.metrics('rss') == {}
+
+    sampler.sample_all()
+    sampler.sample_all()
+    resources = sampler.get('pea', pea_id)
+    assert resources['total']['cpu_percent'] >= 0
+    assert sampler.metrics('threads') == {('pea', str(pea_id)): 1}
+
+    process.kill()
+    process.wait()
+    sampler.sample_all()
+    assert sampler.get('pea', pea_id)['processes'] == [{'pid': process.pid, 'alive': False}]
+    assert sampler.get('pea', pea_id)['total']['rss'] == 0
+    assert not sampler._ticks
+
+    pea_store._store.pop(pea_id)
+    sampler.sample_all()
+    assert sampler.metrics('rss') == {}
+    with pytest.raises(KeyError):
+        sampler.get('pea', pea_id)
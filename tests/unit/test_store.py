@@ -1,3 +1,7 @@
+import os
+import time
+import uuid
+from io import BytesIO
 from pathlib import Path
 from jina.peapods import Pod
 
@@ -9,8 +13,14 @@ from jina.enums import PodRoleType
 from jina.peapods.pods import BasePod
 from jina.parsers import set_pea_parser, set_pod_parser
 
+import jinad.store
+import jinad.helper
 from jinad.models import SinglePodModel
-from jinad.store import InMemoryPeaStore, InMemoryPodStore, InMemoryFlowStore
+from jinad.artifacts import ArtifactStore
+from jinad.backend import AttachedContext, SQLiteBackend, get_process_start_time
+from jinad.config import store_config
+from jinad.helper import create_meta_files_from_upload
+from jinad.store import InMemoryStore, InMemoryPeaStore, InMemoryPodStore, InMemoryFlowStore
 
 cur_dir = Path(__file__).parent
 
@@ -37,7 +47,21 @@ def test_flow_store(config):
         assert flow_id not in store._store.keys()
 
 
-def test_flow_store_with_files(tmpdir):
+@pytest.mark.parametrize('config', [flow_file_str(), pod_list()])
+def test_flow_store_parallel_start(monkeypatch, config):
+    monkeypatch.setattr(store_config, 'PARALLEL_START', True)
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_id, _, _ = store._create(config=config)
+        flow = store._store[flow_id]['flow']
+        assert 'gateway' in flow._pod_nodes
+        assert all(pod.peas for pod in flow._pod_nodes.values())
+        store._delete(flow_id)
+        assert flow_id not in store._store.keys()
+
+
+def test_flow_store_with_files(monkeypatch, tmpdir):
+    monkeypatch.setattr(jinad.store, 'artifact_store', ArtifactStore(root=str(tmpdir)))
     config = flow_file_str()
     file_yml = UploadFile(Path(tmpdir) / 'file1.yml')
     file_py = UploadFile(Path(tmpdir) / 'file1.py')
@@ -45,14 +69,27 @@ def test_flow_store_with_files(tmpdir):
     store = InMemoryFlowStore()
     with store._session():
         flow_id, _, _ = store._create(config=config, files=files)
-        assert Path(file_yml.filename).exists()
-        assert Path(file_py.filename).exists()
+        workspace = Path(store._store[flow_id]['workspace'])
+        assert (workspace / 'file1.yml').exists()
+        assert (workspace / 'file1.py').exists()
         assert flow_id in store._store.keys()
         assert isinstance(store._store[flow_id]['flow'], Flow)
         store._delete(flow_id)
         assert flow_id not in store._store.keys()
-        assert not Path(file_yml.filename).exists()
-        assert not Path(file_py.filename).exists()
+        assert not workspace.exists()
+
+
+def test_flow_store_with_files_uses_workspace(monkeypatch, tmpdir):
+    monkeypatch.setattr(jinad.store, 'artifact_store', ArtifactStore(root=str(tmpdir)))
+    files = [UploadFile('pod.yml', file=BytesIO(b'!BaseExecutor\nwith: {}'))]
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_id, _, _ = store._create(config=[SinglePodModel(pod_role=PodRoleType.POD, uses='pod.yml')],
+                                      files=files)
+        workspace = store._store[flow_id]['workspace']
+        pod = [pod for name, pod in store._store[flow_id]['flow']._pod_nodes.items() if name != 'gateway'][0]
+        assert pod.args.uses == os.path.join(workspace, 'pod.yml')
+        store._delete(flow_id)
 
 
 def test_pod_store():
@@ -66,6 +103,21 @@ def test_pod_store():
         assert pod_id not in store._store.keys()
 
 
+def test_pod_store_releases_uploads(monkeypatch, tmpdir):
+    artifact_store = ArtifactStore(root=str(tmpdir / 'workspace'))
+    monkeypatch.setattr(jinad.helper, 'artifact_store', artifact_store)
+    monkeypatch.chdir(tmpdir)
+    create_meta_files_from_upload(UploadFile('pod.yml', file=BytesIO(b'!BaseExecutor\nwith: {}')))
+    args = set_pod_parser().parse_args(['--uses', 'pod.yml'])
+    store = InMemoryPodStore()
+    with store._session():
+        pod_id = store._create(pod_arguments=args)
+        assert store._store[pod_id]['files'] == ['pod.yml']
+        store._delete(pod_id)
+    assert not os.path.lexists(tmpdir / 'pod.yml')
+    assert os.listdir(artifact_store.blobs_path) == []
+
+
 def test_pea_store():
     args = set_pea_parser().parse_args([])
     store = InMemoryPeaStore()
@@ -75,3 +127,270 @@ def test_pea_store():
         # assert isinstance(store._store[pea_id]['pea'], LocalRuntime)
         store._delete(pea_id)
         assert pea_id not in store._store.keys()
+
+
+def test_pod_store_many():
+    store = InMemoryPodStore()
+    with store._session():
+        results = store._create_many([set_pod_parser().parse_args(['--parallel', '2']),
+                                      set_pod_parser().parse_args([])])
+        assert [result['status'] for result in results] == ['started', 'started']
+        pod_ids = [result['pod_id'] for result in results]
+        assert [len(store._store[pod_id]['pod'].peas) for pod_id in pod_ids] == [4, 1]
+        assert [result['status'] for result in store._delete_many(pod_ids)] == ['deleted', 'deleted']
+
+
+def test_pea_store_many():
+    store = InMemoryPeaStore()
+    with store._session():
+        results = store._create_many([set_pea_parser().parse_args([]), {'log_id': 'abc'},
+                                      set_pea_parser().parse_args([])])
+        assert [result['status'] for result in results] == ['started', 'failed', 'started']
+        assert 'PeaStartException' in results[1]['detail']
+        pea_ids = [results[0]['pea_id'], results[2]['pea_id']]
+        assert all(pea_id in store._store for pea_id in pea_ids)
+
+        results = store._delete_many([*pea_ids, uuid.uuid4()])
+        assert [result['status'] for result in results] == ['deleted', 'deleted', 'not_found']
+        assert not any(pea_id in store._store for pea_id in pea_ids)
+
+
+def hanging_close(context):
+    time.sleep(60)
+
+
+def test_pea_store_close_deadline(monkeypatch):
+    monkeypatch.setattr(store_config, 'KILL_TIMEOUT', 1)
+    store = InMemoryPeaStore()
+    with store._session():
+        pea_id = store._create(pea_arguments=set_pea_parser().parse_args([]))
+        pea = store._store[pea_id]['pea']
+        monkeypatch.setattr(store, '_close', hanging_close)
+        start_time = time.time()
+        store._delete(pea_id, deadline=time.time() + 0.5)
+        assert time.time() - start_time < 2
+        assert pea_id not in store._store
+        pea.join(timeout=1)
+        assert not pea.is_alive()
+
+
+def test_pea_store_delete_all_parallel(monkeypatch):
+    store = InMemoryPeaStore()
+    with store._session():
+        for _ in range(3):
+            store._create(pea_arguments=set_pea_parser().parse_args([]))
+        close = store._close
+
+        def slow_close(context):
+            time.sleep(1)
+            close(context)
+
+        monkeypatch.setattr(store, '_close', slow_close)
+        start_time = time.time()
+        store._delete_all()
+        assert time.time() - start_time < 3
+        assert not store._store
+
+
+def test_flow_store_submit_delete():
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_id, _, _ = store._create(config=flow_file_str())
+        store._set_status(flow_id=flow_id, status='started')
+        store._submit_delete(flow_id=flow_id)
+        assert store._get_status(flow_id)['status'] == 'deleting'
+        # deleting it again doesn't queue another close
+        store._submit_delete(flow_id=flow_id)
+        for _ in range(100):
+            if flow_id not in store._status:
+                break
+            time.sleep(0.1)
+        assert flow_id not in store._store
+        with pytest.raises(KeyError):
+            store._submit_delete(flow_id=flow_id)
+
+
+@pytest.mark.parametrize('parallel_start', [False, True])
+def test_flow_store_submit(monkeypatch, parallel_start):
+    monkeypatch.setattr(store_config, 'PARALLEL_START', parallel_start)
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_id = store._submit(config=flow_file_str())
+        assert store._get_status(flow_id)['status'] in ('pending', 'starting', 'started')
+        for _ in range(100):
+            if store._get_status(flow_id)['status'] == 'started':
+                break
+            time.sleep(0.1)
+        flow_status = store._get_status(flow_id)
+        assert flow_status['status'] == 'started'
+        assert 'host' in flow_status and 'port' in flow_status
+        assert flow_status['timings']['pending'] <= flow_status['timings']['started']
+        assert set(flow_status['stages'].keys()) == {'queue', 'load', 'start'}
+        if parallel_start:
+            assert set(flow_status['pods'].keys()) == {'pod1', 'pod2', 'pod3', 'gateway'}
+        assert flow_id in store._store.keys()
+        store._remember(flow_id=flow_id, keys=['key:abc'])
+        assert store._find(['key:abc']) == flow_id
+        store._delete(flow_id)
+        assert flow_id not in store._store.keys()
+        assert store._find(['key:abc']) is None
+        with pytest.raises(KeyError):
+            store._get_status(flow_id)
+
+
+@pytest.mark.parametrize('parallel_start', [False, True])
+def test_flow_store_submit_concurrently(monkeypatch, parallel_start):
+    monkeypatch.setattr(store_config, 'PARALLEL_START', parallel_start)
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_ids = [store._submit(config=flow_file_str()) for _ in range(4)] + \
+                   [store._submit(config=pod_list())]
+        for _ in range(300):
+            if all(store._get_status(flow_id)['status'] in ('started', 'failed') for flow_id in flow_ids):
+                break
+            time.sleep(0.1)
+        try:
+            assert [store._get_status(flow_id)['status'] for flow_id in flow_ids] == ['started'] * len(flow_ids)
+        finally:
+            store._delete_many(flow_ids)
+
+
+def test_flow_store_submit_failure():
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_id = store._submit(config='!Flow\npods: [')
+        for _ in range(100):
+            if store._get_status(flow_id)['status'] == 'failed':
+                break
+            time.sleep(0.1)
+        flow_status = store._get_status(flow_id)
+        assert flow_status['status'] == 'failed'
+        assert 'FlowYamlParseException' in flow_status['detail']
+        assert 'load' in flow_status['stages']
+        assert flow_id not in store._store.keys()
+
+
+def test_flow_store_submit_with_files(monkeypatch, tmpdir):
+    artifact_store = ArtifactStore(root=str(tmpdir))
+    monkeypatch.setattr(jinad.store, 'artifact_store', artifact_store)
+    files = [UploadFile('pod.yml', file=BytesIO(b'!BaseExecutor\nwith: {}'))]
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_id = store._submit(config=[SinglePodModel(pod_role=PodRoleType.POD, uses='pod.yml')], files=files)
+        # like FastAPI does once the request is served
+        files[0].file.close()
+        for _ in range(100):
+            if store._get_status(flow_id)['status'] in ('started', 'failed'):
+                break
+            time.sleep(0.1)
+        assert store._get_status(flow_id)['status'] == 'started'
+        assert (Path(store._store[flow_id]['workspace']) / 'pod.yml').exists()
+        store._delete(flow_id)
+        assert not artifact_store._digests
+
+
+def test_flow_store_expire_failed(monkeypatch):
+    monkeypatch.setattr(store_config, 'FAILED_TTL', 60)
+    store = InMemoryFlowStore()
+    monkeypatch.setattr(store, '_status', {})
+    monkeypatch.setattr(store, '_idempotency_keys', {})
+    expired, failed = uuid.uuid1(), uuid.uuid1()
+    for flow_id in (expired, failed):
+        store._set_status(flow_id=flow_id, status='failed', detail='KeyError()')
+    store._status[expired]['timings']['failed'] -= 61
+    store._remember(flow_id=expired, keys=['key:abc'])
+
+    store._set_status(flow_id=uuid.uuid1(), status='pending')
+    with pytest.raises(KeyError):
+        store._get_status(expired)
+    assert 'key:abc' not in store._idempotency_keys
+    assert store._get_status(failed)['status'] == 'failed'
+
+
+@pytest.fixture
+def durable(monkeypatch, tmpdir):
+    monkeypatch.setattr(InMemoryStore, '_backend', SQLiteBackend(path=str(tmpdir / 'store.db')))
+
+
+def restart_jinad(store):
+    """ Forgets everything but the backend, like a new jinad process would """
+    store._store.clear()
+    if isinstance(store, InMemoryFlowStore):
+        store._status.clear()
+
+
+def test_flow_store_recover_attach(monkeypatch, durable):
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_id, host, port = store._create(config=flow_file_str())
+        flow = store._store[flow_id]['flow']
+        restart_jinad(store)
+        assert store._recover() == []
+        assert isinstance(store._store[flow_id]['flow'], AttachedContext)
+        assert store._get(flow_id) == (host, port, flow.yaml_spec)
+        assert store._get_status(flow_id)['recovered'] == 'attached'
+
+        store._delete(flow_id)
+        assert not any(pea.is_alive() for pod in flow._pod_nodes.values() for pea in pod.peas)
+        assert store._recover() == []
+        assert flow_id not in store._store
+
+
+@pytest.mark.parametrize('config', [flow_file_str(), pod_list()])
+def test_flow_store_recover_restart(monkeypatch, durable, config):
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_id, _, _ = store._create(config=config)
+        store._delete(flow_id, forget=False)
+        restart_jinad(store)
+        futures = store._recover()
+        assert len(futures) == 1
+        futures[0].result()
+        assert store._get_status(flow_id)['status'] == 'started'
+        assert store._get_status(flow_id)['recovered'] == 'restarted'
+        assert isinstance(store._store[flow_id]['flow'], Flow)
+        store._delete(flow_id)
+
+
+def test_pea_store_recover_restart(monkeypatch, durable):
+    store = InMemoryPeaStore()
+    with store._session():
+        pea_id = store._create(pea_arguments=set_pea_parser().parse_args([]))
+        store._delete(pea_id, forget=False)
+        restart_jinad(store)
+        for future in store._recover():
+            future.result()
+        assert pea_id in store._store
+        store._delete(pea_id)
+        assert store._recover() == []
+
+
+def test_flow_store_shared(monkeypatch, durable, process):
+    monkeypatch.setattr(InMemoryStore, '_shared', True)
+    store = InMemoryFlowStore()
+    with store._session():
+        flow_id, host, port = store._create(config=flow_file_str())
+        store._set_status(flow_id=flow_id, status='started', host=host, port=port)
+        store._remember(flow_id=flow_id, keys=['key:abc'])
+        # another worker knows the Flow only via the backend
+        entry = store._store.pop(flow_id)
+        store._status.pop(flow_id)
+        store._idempotency_keys.clear()
+        assert store._get(flow_id) == (host, port, entry['flow'].yaml_spec)
+        assert store._get_status(flow_id)['status'] == 'started'
+        assert store._find(['key:abc']) == flow_id
+
+        # Flows owned by a live worker don't get recovered by the others
+        entry['record']['owner'] = {'pid': process.pid, 'start_time': get_process_start_time(process.pid),
+                                    'address': ''}
+        store._backend.put(kind='flow', entity_id=flow_id, record=entry['record'])
+        assert store._recover() == []
+        assert flow_id not in store._store
+
+        store._store[flow_id] = entry
+        store._remember(flow_id=flow_id, keys=['key:abc'])
+        store._delete(flow_id)
+        with pytest.raises(KeyError):
+            store._get_status(flow_id)
+        assert store._find(['key:abc']) is None
+        assert store._lookup(flow_id) is None
@@ -0,0 +1,271 @@
+import os
+import json
+import asyncio
+from array import array
+
+import pytest
+
+from jinad.config import log_config
+from jinad.tailer import InotifyWatcher, PollingWatcher, LineIndex, LogHub, LogFilter, get_file_watcher, tail, \
+    get_line_index, parse_log_time, _libc
+
+
+def append(path, content):
+    with open(path, 'a') as fp:
+        fp.write(content)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('watcher_cls', [
+    pytest.param(InotifyWatcher, marks=pytest.mark.skipif(not _libc, reason='inotify is linux only')),
+    PollingWatcher
+])
+async def test_watcher(tmpdir, watcher_cls):
+    path = str(tmpdir / 'log.log')
+    append(path, '')
+    watcher = watcher_cls(path)
+    try:
+        assert not await watcher.wait(timeout=0.3)
+        asyncio.get_event_loop().call_later(0.1, append, path, 'line\n')
+        assert await watcher.wait(timeout=2)
+    finally:
+        watcher.close()
+
+
+def test_get_file_watcher_fallback(monkeypatch, tmpdir):
+    monkeypatch.setattr(log_config, 'INOTIFY', False)
+    assert isinstance(get_file_watcher(str(tmpdir)), PollingWatcher)
+
+
+@pytest.mark.asyncio
+async def test_tail_complete_lines(tmpdir):
+    path = str(tmpdir / 'log.log')
+    append(path, 'line 1\nline 2\nline')
+    loop = asyncio.get_event_loop()
+    loop.call_later(0.2, append, path, ' 3\n')
+    with open(path, 'rb') as fp:
+        frames = [lines async for lines in tail(fp, line_num_from=2, timeout=1)]
+    assert frames == [[(2, 'line 2\n')], [(3, 'line 3\n')], None]
+
+
+def write_lines(path, start, end):
+    append(path, ''.join(f'line {i}\n' for i in range(start, end + 1)))
+
+
+@pytest.mark.parametrize('line_number, skipped_lines', [
+    (0, 0), (1, 0), (3, 0), (4, 3), (7, 6), (10, 9), (12, 9), (100, 9)
+])
+def test_line_index_seek(tmpdir, line_number, skipped_lines):
+    path = str(tmpdir / 'log.log')
+    write_lines(path, 1, 11)
+    line_index = LineIndex(path, interval=3)
+    line_index.update()
+    assert line_index.lines == 11
+    with open(path, 'rb') as fp:
+        assert line_index.seek(fp, line_number) == skipped_lines
+        assert fp.readline() == f'line {skipped_lines + 1}\n'.encode()
+
+
+def test_line_index_incremental_and_persisted(tmpdir):
+    path = str(tmpdir / 'log.log')
+    write_lines(path, 1, 5)
+    append(path, 'line')
+    line_index = LineIndex(path, interval=2)
+    line_index.update()
+    assert list(line_index.offsets) == [0, 14, 28]
+    append(path, ' 6\n')
+    write_lines(path, 7, 9)
+    line_index.update()
+    assert line_index.lines == 9
+
+    reloaded = LineIndex(path, interval=2)
+    assert list(reloaded.offsets) == list(line_index.offsets)
+    with open(path, 'rb') as fp:
+        assert reloaded.seek(fp, 8) == 6
+        assert fp.readline() == b'line 7\n'
+
+
+@pytest.mark.parametrize('line_number, checkpoint', [
+    (0, 1), (1, 1), (4, 1), (5, 4), (7, 4), (8, 7), (11, 10), (100, 10)
+])
+def test_line_index_bisect(tmpdir, line_number, checkpoint):
+    path = str(tmpdir / 'log.log')
+    write_lines(path, 1, 11)
+    line_index = LineIndex(path, interval=3)
+    line_index.update()
+    with open(path, 'rb') as fp:
+        assert line_index.bisect(fp, before=lambda line: int(line.split()[1]) < line_number) == checkpoint
+
+
+def test_line_index_stale(tmpdir):
+    path = str(tmpdir / 'log.log')
+    write_lines(path, 1, 10)
+    LineIndex(path, interval=2).update()
+    # log got rotated
+    with open(path, 'w') as fp:
+        fp.write('line 1\n')
+    line_index = LineIndex(path, interval=2)
+    assert list(line_index.offsets) == [0]
+    line_index.update()
+    assert line_index.lines == 1
+
+
+def test_line_index_duplicate_writer(tmpdir):
+    path = str(tmpdir / 'log.log')
+    write_lines(path, 1, 10)
+    LineIndex(path, interval=2).update()
+    # offsets appended again by a second index of the same file
+    with open(path + '.idx', 'ab') as fp:
+        fp.write(array('Q', [4, 8]).tobytes())
+    line_index = LineIndex(path, interval=2)
+    assert list(line_index.offsets) == [0, 14, 28, 42, 56, 71]
+    assert os.path.getsize(path + '.idx') == 7 * 8
+
+
+def test_get_line_index(tmpdir):
+    path = str(tmpdir / 'log.log')
+    write_lines(path, 1, 10)
+    line_index = get_line_index(path)
+    assert get_line_index(path) is line_index
+    # dropped once the log file got removed
+    os.remove(path)
+    get_line_index(str(tmpdir / 'other.log'))
+    write_lines(path, 1, 10)
+    assert get_line_index(path) is not line_index
+
+
+@pytest.mark.asyncio
+async def test_tail_from_line(monkeypatch, tmpdir):
+    monkeypatch.setattr(log_config, 'INDEX_INTERVAL', 4)
+    path = str(tmpdir / 'log.log')
+    write_lines(path, 1, 20)
+    with open(path, 'rb') as fp:
+        frames = [lines async for lines in tail(fp, line_num_from=15, timeout=0.1)]
+    assert frames == [[(i, f'line {i}\n')] for i in range(15, 21)] + [None]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('max_lines, max_bytes, frame_sizes', [
+    (4, None, [4, 4, 2, 3]),
+    (100, 14, [2, 2, 2, 2, 2, 2, 1]),
+    (100, None, [10, 3]),
+])
+async def test_tail_batches(tmpdir, max_lines, max_bytes, frame_sizes):
+    path = str(tmpdir / 'log.log')
+    write_lines(path, 1, 10)
+    loop = asyncio.get_event_loop()
+    # lines written one after another within `max_latency` end up in the same frame
+    for idx, line_number in enumerate(range(11, 14)):
+        loop.call_later(0.2 + idx * 0.01, write_lines, path, line_number, line_number)
+    with open(path, 'rb') as fp:
+        frames = [lines async for lines in tail(fp, timeout=0.5, max_lines=max_lines, max_bytes=max_bytes,
+                                                  max_latency=0.2)]
+    assert frames[-1] is None
+    assert [len(lines) for lines in frames[:-1]] == frame_sizes
+    assert [line_number for lines in frames[:-1] for line_number, _ in lines] == list(range(1, 14))
+
+
+async def collect(subscriber, **kwargs):
+    return [lines async for lines in subscriber.frames(**kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_log_hub_shared_tailer(tmpdir):
+    path = str(tmpdir / 'log.log')
+    write_lines(path, 1, 3)
+    hub = LogHub()
+    subscribers = [hub.subscribe(path) for _ in range(3)]
+    assert hub.stats() == {'tailers': 1, 'subscribers': 3}
+
+    asyncio.get_event_loop().call_later(0.3, write_lines, path, 4, 6)
+    all_frames = await asyncio.gather(collect(subscribers[0], line_num_from=2, timeout=1),
+                                      collect(subscribers[1], line_num_from=5, timeout=1),
+                                      collect(subscribers[2], line_num_from=0, timeout=1, max_lines=10))
+    assert [line_number for lines in all_frames[0][:-1] for line_number, _ in lines] == [2, 3, 4, 5, 6]
+    assert [line_number for lines in all_frames[1][:-1] for line_number, _ in lines] == [5, 6]
+    assert all_frames[2] == [[(i, f'line {i}\n') for i in range(1, 4)],
+                             [(i, f'line {i}\n') for i in range(4, 7)],
+                             None]
+
+    tailer = hub._tailers[path]
+    for subscriber in subscribers:
+        hub.unsubscribe(subscriber)
+    await asyncio.wait([tailer], timeout=1)
+    assert tailer.cancelled()
+    assert hub.stats() == {'tailers': 0, 'subscribers': 0}
+
+
+@pytest.mark.asyncio
+async def test_log_hub_lagging_subscriber(monkeypatch, tmpdir):
+    monkeypatch.setattr(log_config, 'SUBSCRIBER_QUEUE_SIZE', 1)
+    monkeypatch.setattr(log_config, 'BATCH_LATENCY', 0)
+    path = str(tmpdir / 'log.log')
+    append(path, '')
+    hub = LogHub()
+    subscriber = hub.subscribe(path)
+    await asyncio.sleep(0.1)
+    for line_number in range(1, 6):
+        write_lines(path, line_number, line_number)
+        await asyncio.sleep(0.1)
+    assert subscriber.lagging
+    frames = await collect(subscriber, timeout=0.3)
+    assert [line_number for lines in frames[:-1] for line_number, _ in lines] == [1, 2, 3, 4, 5]
+    tailer = hub._tailers[path]
+    hub.unsubscribe(subscriber)
+    await asyncio.wait([tailer], timeout=1)
+
+
+def fluentd_line(message, level='INFO', name='pod0', time_str='2020-11-20T10:00:00+0000'):
+    record = {'host': 'blah', 'process': '1', 'type': level, 'name': name, 'message': message}
+    return f'{time_str}\tjina\t{json.dumps(record)}\n'
+
+
+@pytest.mark.parametrize('params, matches', [
+    ({}, None),
+    ({'level': 'warning'}, [False, True, True, False]),
+    ({'level': 'ERROR'}, [False, True, False, False]),
+    ({'name': 'pod1,pod2'}, [False, True, True, False]),
+    ({'regex': r'shard \d'}, [True, False, True, False]),
+    ({'since': '2020-11-20T10:00:01+00:00'}, [False, True, True, False]),
+    ({'since': '2020-11-20T10:00:01', 'until': 1605866401}, [False, True, False, False]),
+    ({'level': 'WARNING', 'name': 'pod2'}, [False, False, True, False]),
+])
+def test_log_filter(params, matches):
+    lines = [fluentd_line('shard 0 ready'),
+             fluentd_line('failed', level='ERROR', name='pod1', time_str='2020-11-20T10:00:01+0000'),
+             fluentd_line('shard 1 slow', level='WARNING', name='pod2', time_str='2020-11-20T10:00:02+0000'),
+             'not a fluentd line\n']
+    log_filter = LogFilter.from_params(params)
+    if matches is None:
+        assert log_filter is None
+    else:
+        assert [log_filter.match(line) for line in lines] == matches
+
+
+@pytest.mark.parametrize('params', [{'level': 'LOUD'}, {'regex': '('}, {'since': 'yesterday'},
+                                    {'level': 30}, {'level': ['INFO']}, {'regex': 1}, {'name': ['pod1']},
+                                    {'since': [1605866401]}, {'until': {'time': 1605866401}}, {'since': True}])
+def test_log_filter_invalid(params):
+    with pytest.raises(ValueError):
+        LogFilter.from_params(params)
+
+
+def test_parse_log_time():
+    assert parse_log_time(fluentd_line('ready', time_str='2020-11-20T10:00:01+0000')) == 1605866401
+    assert parse_log_time(fluentd_line('ready', time_str='2020-11-20T11:00:01+0100').encode()) == 1605866401
+    assert parse_log_time('not a fluentd line\n') is None
+
+
+@pytest.mark.asyncio
+async def test_log_hub_filtered(tmpdir):
+    path = str(tmpdir / 'log.log')
+    append(path, ''.join(fluentd_line(f'line {i}', level='ERROR' if i % 3 == 0 else 'INFO') for i in range(1, 7)))
+    hub = LogHub()
+    subscriber = hub.subscribe(path)
+    asyncio.get_event_loop().call_later(0.2, append, path, fluentd_line('line 7') + fluentd_line('line 9', 'ERROR'))
+    frames = await collect(subscriber, line_num_from=2, timeout=1, max_lines=10,
+                           log_filter=LogFilter(level='ERROR'))
+    assert [[line_number for line_number, _ in lines] for lines in frames[:-1]] == [[3, 6], [8]]
+    tailer = hub._tailers[path]
+    hub.unsubscribe(subscriber)
+    await asyncio.wait([tailer], timeout=1)
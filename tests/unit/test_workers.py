@@ -0,0 +1,68 @@
+import uuid
+import subprocess
+
+import pytest
+
+from jinad.config import server_config
+from jinad.backend import SQLiteBackend, get_process_start_time, get_worker
+from jinad.store import InMemoryStore, pea_store
+from jinad.workers import WorkerServer, forward, delete_from_owner
+
+
+@pytest.fixture
+def shared(monkeypatch, tmpdir):
+    monkeypatch.setattr(server_config, 'WORKER_PATH', str(tmpdir / 'workers'))
+    monkeypatch.setattr(InMemoryStore, '_backend', SQLiteBackend(path=str(tmpdir / 'store.db')))
+    monkeypatch.setattr(InMemoryStore, '_shared', True)
+
+
+@pytest.fixture
+async def worker_server(shared, monkeypatch):
+    deleted = []
+
+    def _delete(pea_id):
+        if pea_id in deleted:
+            raise KeyError(pea_id)
+        deleted.append(pea_id)
+
+    monkeypatch.setattr(pea_store, '_delete', _delete)
+    server = WorkerServer()
+    await server.start()
+    yield deleted
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_forward(worker_server):
+    pea_id = uuid.uuid4()
+    request = {'kind': 'pea', 'op': 'delete', 'id': str(pea_id)}
+    assert await forward(owner=get_worker(), request=request) == {'status': 'ok'}
+    assert worker_server == [pea_id]
+    assert await forward(owner=get_worker(), request=request) == {'status': 'not_found'}
+    reply = await forward(owner=get_worker(), request={**request, 'op': 'restart'})
+    assert reply['status'] == 'error'
+
+
+@pytest.mark.asyncio
+async def test_delete_from_owner(worker_server, process):
+    pea_id = uuid.uuid4()
+    assert not await delete_from_owner(store=pea_store, entity_id=pea_id)
+
+    # the owner is alive, `process` stands in for it while this process serves its socket
+    owner = {**get_worker(), 'pid': process.pid, 'start_time': get_process_start_time(process.pid)}
+    pea_store._backend.put(kind='pea', entity_id=pea_id, record={'pids': [], 'owner': owner})
+    assert await delete_from_owner(store=pea_store, entity_id=pea_id)
+    assert worker_server == [pea_id]
+
+
+@pytest.mark.asyncio
+async def test_delete_from_dead_owner(shared, process):
+    owner = subprocess.Popen(['true'])
+    owner.wait()
+    pea_id = uuid.uuid4()
+    pea_store._backend.put(kind='pea', entity_id=pea_id,
+                           record={'pids': [[process.pid, get_process_start_time(process.pid)]],
+                                   'owner': {'pid': owner.pid, 'start_time': None, 'address': ''}})
+    assert await delete_from_owner(store=pea_store, entity_id=pea_id)
+    assert process.wait(timeout=1) is not None
+    assert pea_store._lookup(pea_id) is None